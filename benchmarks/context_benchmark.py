@@ -0,0 +1,119 @@
+"""
+Reports chat request payload size and measured latency as a function of history
+length, for the full transcript versus the token-budgeted context window.
+
+Usage:
+    python -m benchmarks.context_benchmark [--lengths 10 100 1000 10000] [--prompt-ms-per-1k 40] [--live]
+
+Every request is sent through the app's Cohere client (stream_chat_text) and timed
+until the first text delta and until the end of the reply. By default it goes to the
+local service stub (benchmarks/service_stub.py), so the measurement covers building,
+serializing, sending and parsing the request, while the model itself is simulated:
+the stub waits --first-token-ms plus --prompt-ms-per-1k per thousand prompt tokens
+before the first token. With --live the requests go to the configured Cohere API
+instead (this uses API credits).
+
+Prints one JSON object per (history length, mode).
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from config import use_example_config
+use_example_config()  # Runs on a checkout without config/config.py unless --live is used
+from config import config
+from benchmarks.service_stub import ServiceStub, StubSettings
+
+SAMPLE_MESSAGES = [
+    ("user", "I had a really rough day at work, my manager criticised my report in front of everyone."),
+    ("assistant", "That sounds really hurtful. I'm here if you want to talk about it."),
+    ("user", "I just feel like nothing I do is good enough lately."),
+    ("assistant", "It's okay to feel that way sometimes. You are doing your best, and that matters."),
+    ("user", "My sister called though, that cheered me up a bit."),
+    ("assistant", "I'm glad she called. It's nice to have someone who lifts you up."),
+]
+SUMMARY = " ".join(["The user often feels undervalued at work and finds comfort in talking to their sister."] * 5)
+
+def make_history(length: int):
+    rng = random.Random(length)
+    return [{"role": role, "content": content}
+            for role, content in (rng.choice(SAMPLE_MESSAGES) for _ in range(length))]
+
+def build_request(history, mode: str, builder, system_message: str):
+    if mode == "window":
+        context = builder.build(history)
+        history = context.messages
+        system_message += f"\n\n    Summary of your earlier conversations with this user:\n    {context.summary}"
+    return [{"role": "system", "content": system_message}, *history, {"role": "user", "content": "Hi again."}]
+
+def time_request(client, messages) -> tuple:
+    """ Sends one chat request and returns (ms to the first text delta, ms to the end of the reply). """
+    from utils.AI_Response import stream_chat_text
+
+    started = time.perf_counter()
+    first_text_ms = None
+    for _ in stream_chat_text(client, messages):
+        if first_text_ms is None:
+            first_text_ms = 1000 * (time.perf_counter() - started)
+    return first_text_ms, 1000 * (time.perf_counter() - started)
+
+def run(args) -> None:
+    from main_utility.context_window import ContextBuilder, count_tokens
+    from utils.AI_Response import englishSystemMessage, co
+
+    builder = ContextBuilder(storage=None, summarize=None)
+    builder.summary = SUMMARY
+    service = "cohere" if args.live else "stub"
+
+    for length in args.lengths:
+        history = make_history(length)
+        for mode in ("full", "window"):
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                messages = build_request(history, mode, builder, englishSystemMessage)
+                payload = json.dumps({"model": "command-r-plus-08-2024", "messages": messages})
+            build_ms = 1000 * (time.perf_counter() - started) / args.repeat
+
+            timings = [time_request(co, messages) for _ in range(args.requests)]
+            first_text = [first for first, _ in timings if first is not None]
+            tokens = sum(count_tokens(message["content"]) for message in messages)
+            print(json.dumps({
+                "history_messages": length,
+                "mode": mode,
+                "service": service,
+                "sent_messages": len(messages),
+                "payload_bytes": len(payload.encode("utf-8")),
+                "prompt_tokens": tokens,
+                "build_ms": round(build_ms, 3),
+                "measured_first_text_ms": round(statistics.median(first_text), 1) if first_text else None,
+                "measured_request_ms": round(statistics.median(total for _, total in timings), 1),
+            }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--first-token-ms", type=float, default=300.0, help="stub: model latency before prefill")
+    parser.add_argument("--prompt-ms-per-1k", type=float, default=40.0, help="stub: prefill time per 1k prompt tokens")
+    parser.add_argument("--repeat", type=int, default=5, help="request builds averaged for build_ms")
+    parser.add_argument("--requests", type=int, default=3, help="requests sent per point; the median is reported")
+    parser.add_argument("--live", action="store_true", help="send the requests to the configured Cohere API")
+    args = parser.parse_args()
+
+    if args.live:
+        run(args)
+        return
+    settings = StubSettings(llm_first_token=args.first_token_ms / 1000,
+                            prompt_per_1k_tokens=args.prompt_ms_per_1k / 1000)
+    with ServiceStub(settings) as stub:
+        # The Cohere client reads these at import time, so set them before importing it
+        config.COHERE_BASE_URL = stub.url
+        config.COHERE_API = "benchmark"
+        run(args)
+
+if __name__ == "__main__":
+    main()
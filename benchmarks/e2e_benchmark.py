@@ -0,0 +1,166 @@
+"""
+End-to-end latency of the conversation engine, fully offline.
+
+Usage:
+    python -m benchmarks.e2e_benchmark [--turns 5] [--store sqlite|memory] [--max-first-audio-p95-ms 2500]
+
+Runs the real ConversationEngine (what handle_conversation runs) against stand-ins:
+a generated WAV file is played into background capture in real time, a fake
+recognizer transcribes each phrase from a script ("wake up", the questions,
+"sleep"), and a local HTTP stub answers the Cohere chat/embed and ElevenLabs TTS
+requests with configurable delay and jitter. Everything else, including the HTTP
+clients, sentence pipelining, the TTS cache and persistence, is the production code.
+Playback sleeps for the rendered audio's duration divided by --playback-speedup.
+
+Prints one JSON object per turn and a summary line with percentiles, throughput and
+the traced stage timings. With --max-first-audio-p95-ms the exit status is 1 when
+the p95 time to first audio exceeds the budget, so CI can fail on regressions.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Everything the app keeps under ~/.calmora (TTS cache, memory index, keyword
+# templates, traces) goes to a throwaway home, so runs are isolated and repeatable.
+os.environ["HOME"] = tempfile.mkdtemp(prefix="calmora-benchmark-")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from config import use_example_config
+use_example_config()  # Runs on a checkout without config/config.py; the stub replaces every credential used
+from config import config
+from benchmarks.fakes import FakeRecognizer, MemoryStorage, write_speech_script
+from benchmarks.service_stub import ServiceStub, StubSettings
+
+QUESTIONS = [
+    "i had a really long day at work",
+    "i can't stop thinking about the deadline",
+    "how do i switch off in the evening",
+    "my evenings have felt restless lately",
+    "thanks that helps a bit",
+]
+
+def percentile(samples, q: float):
+    ordered = sorted(sample for sample in samples if sample is not None)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def summarize(records, wall_seconds: float, stages: dict) -> dict:
+    summary = {"summary": True, "turns": len(records), "wall_s": round(wall_seconds, 2),
+               "turns_per_minute": round(len(records) / wall_seconds * 60, 2) if wall_seconds else None}
+    for key in ("first_text_ms", "first_audio_ms", "total_ms"):
+        samples = [record[key] for record in records]
+        summary[f"{key}_p50"] = percentile(samples, 0.50)
+        summary[f"{key}_p95"] = percentile(samples, 0.95)
+    summary["stages"] = stages
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=5, help="questions asked between waking and sleeping")
+    parser.add_argument("--store", choices=("sqlite", "memory"), default="sqlite")
+    parser.add_argument("--stt-delay", type=float, default=0.3)
+    parser.add_argument("--llm-first-token", type=float, default=0.4)
+    parser.add_argument("--llm-token", type=float, default=0.02)
+    parser.add_argument("--tts-latency", type=float, default=0.25)
+    parser.add_argument("--jitter", type=float, default=0.0, help="uniform noise added to every service delay")
+    parser.add_argument("--gap", type=float, default=4.0, help="seconds of silence after each phrase")
+    parser.add_argument("--playback-speedup", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-first-audio-p95-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    settings = StubSettings(llm_first_token=args.llm_first_token, llm_token=args.llm_token,
+                            tts_latency=args.tts_latency, jitter=args.jitter, seed=args.seed)
+    with ServiceStub(settings) as stub:
+        # The service clients read these at import time, so set them before importing the engine
+        config.COHERE_BASE_URL = stub.url
+        config.ELEVENLABS_BASE_URL = stub.url
+        config.COHERE_API = "benchmark"
+        config.elevenlab_api_keys_list = {"benchmark-key": "active"}
+        records, wall_seconds, stages = run_benchmark(args)
+
+    for record in records:
+        print(json.dumps(record))
+    summary = summarize(records, wall_seconds, stages)
+    print(json.dumps(summary))
+
+    if len(records) < args.turns:
+        print(f"Only {len(records)} of {args.turns} turns completed.", file=sys.stderr)
+        sys.exit(1)
+    budget = args.max_first_audio_p95_ms
+    if budget is not None and (summary["first_audio_ms_p95"] is None or summary["first_audio_ms_p95"] > budget):
+        print(f"p95 time to first audio {summary['first_audio_ms_p95']} ms exceeds {budget} ms.", file=sys.stderr)
+        sys.exit(1)
+
+def run_benchmark(args):
+    from main_utility.audio_frames import probe_stream
+    from main_utility.capture import BackgroundCapture, WavFileSource
+    from main_utility.conversation_engine import ConversationEngine
+    from main_utility.listening import ListeningSession
+    from main_utility.storage import SQLiteStorage
+    from main_utility.tracing import tracer
+    from main_utility.wake_word import WAKE_PHRASE, SLEEP_PHRASE
+
+    questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(args.turns)]
+    script = [WAKE_PHRASE, *questions, SLEEP_PHRASE]
+    wav_path = os.path.join(os.environ["HOME"], "script.wav")
+    duration = write_speech_script(wav_path, len(script), gap_seconds=args.gap, seed=args.seed)
+
+    recognizer = FakeRecognizer(script, delay=args.stt_delay)
+    capture = BackgroundCapture(WavFileSource(wav_path, realtime=True))
+    session = ListeningSession(capture=capture, backend=recognizer)
+    storage = MemoryStorage() if args.store == "memory" else SQLiteStorage(os.path.join(os.environ["HOME"], "bench.db"))
+    storage.setup()
+    storage.save_language('en')
+
+    def play(audio) -> None:
+        info = probe_stream(audio)
+        time.sleep((info.duration if info else 0.0) / args.playback_speedup)
+
+    records = []
+
+    def on_turn(turn) -> None:
+        metadata = turn.metadata or {}
+        total_ms = metadata.get("total_ms")
+        records.append({
+            "turn_id": metadata.get("turn_id"),
+            "first_text_ms": metadata.get("first_text_ms"),
+            "first_audio_ms": metadata.get("first_audio_ms"),
+            "total_ms": total_ms,
+            "reply_chars": len(turn.assistant_content),
+            "chars_per_s": round(len(turn.assistant_content) / (total_ms / 1000), 1) if total_ms else None,
+            "interrupted": metadata.get("interrupted"),
+        })
+
+    # The WAV source cannot hear playback, so phrases scripted to overlap a reply are kept
+    engine = ConversationEngine(storage, continuous_capture=True, play=play, session=session,
+                                barge_in=False, prefetch=None, on_turn=on_turn, drop_echo=False)
+
+    async def drive():
+        task = asyncio.create_task(engine.run())
+        deadline = time.monotonic() + duration + 60
+        # The script ends with a long enough gap for the last reply; stop once it has been played out
+        while not (capture.finished and recognizer.remaining == 0) and time.monotonic() < deadline:
+            if task.done():
+                break
+            await asyncio.sleep(0.2)
+        engine.stop()
+        await task
+
+    started_at = time.monotonic()
+    try:
+        with contextlib.redirect_stdout(sys.stderr):  # The engine prints every reply; keep stdout to JSON
+            asyncio.run(drive())
+    finally:
+        storage.close()
+    return records, time.monotonic() - started_at, tracer.summary()
+
+if __name__ == "__main__":
+    main()
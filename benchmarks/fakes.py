@@ -0,0 +1,203 @@
+"""
+Offline stand-ins for the cloud services, for benchmarks.
+"""
+import json
+import math
+import random
+import struct
+import threading
+import time
+import wave
+from types import SimpleNamespace
+from typing import List, Optional, Sequence, Tuple
+import speech_recognition as sr
+from main_utility.capture import SAMPLE_RATE
+from main_utility.chatHistory import ChatTurn
+from main_utility.recognizers import RecognizerBackend
+from main_utility.storage import Storage, Row, DEFAULT_LANGUAGE, DEFAULT_USER_ID
+
+DEFAULT_REPLY = (
+    "I'm really sorry you had such a long day. It sounds exhausting, and it makes sense that you feel drained. "
+    "Do you want to tell me what made it so hard? I'm here, and we can take it slowly. "
+    "Sometimes just saying it out loud helps a little."
+)
+
+class MockStreamingChat:
+    """
+    Imitates cohere.ClientV2 chat() and chat_stream() with configurable timing.
+
+    The reply is split into word tokens; the first one arrives after first_token_delay
+    seconds and every following one after token_delay (plus up to jitter) seconds.
+    """
+
+    def __init__(self, reply: str = DEFAULT_REPLY, first_token_delay: float = 0.4,
+                 token_delay: float = 0.02, jitter: float = 0.0, seed: int = 0):
+        self.reply = reply
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.jitter = jitter
+        self._random = random.Random(seed)
+
+    def _tokens(self):
+        words = self.reply.split(" ")
+        return [word + " " for word in words[:-1]] + words[-1:]
+
+    def _sleep(self, seconds: float) -> None:
+        time.sleep(seconds + self._random.uniform(0, self.jitter))
+
+    def chat_stream(self, model, messages):
+        self._sleep(self.first_token_delay)
+        for index, token in enumerate(self._tokens()):
+            if index:
+                self._sleep(self.token_delay)
+            yield SimpleNamespace(
+                type="content-delta",
+                delta=SimpleNamespace(message=SimpleNamespace(content=SimpleNamespace(text=token))),
+            )
+        yield SimpleNamespace(type="message-end")
+
+    def chat(self, model, messages):
+        self._sleep(self.first_token_delay + self.token_delay * (len(self._tokens()) - 1))
+        return SimpleNamespace(message=SimpleNamespace(content=[SimpleNamespace(text=self.reply)]))
+
+class FakeTTS:
+    """
+    Imitates ElevenLabs rendering and playback time.
+
+    fetch() takes base_latency plus per_char seconds per character and returns fake
+    audio bytes; play() sleeps for the audio's speaking duration.
+    """
+
+    def __init__(self, base_latency: float = 0.25, per_char: float = 0.002,
+                 speaking_rate: float = 15.0, jitter: float = 0.0, seed: int = 0):
+        self.base_latency = base_latency
+        self.per_char = per_char
+        self.speaking_rate = speaking_rate  # characters per second of speech
+        self.jitter = jitter
+        self.requests = 0
+        self._random = random.Random(seed)
+
+    def fetch(self, text: str, lang: str = 'en') -> bytes:
+        self.requests += 1
+        time.sleep(self.base_latency + self.per_char * len(text) + self._random.uniform(0, self.jitter))
+        return text.encode("utf-8")
+
+    def play(self, audio: bytes) -> None:
+        time.sleep(len(audio) / self.speaking_rate)
+
+class FakeRecognizer(RecognizerBackend):
+    """
+    Speech-to-text stand-in that returns scripted transcripts in order, one per phrase.
+
+    Each call takes `delay` seconds; once the script is used up every phrase is
+    reported as not understood.
+    """
+
+    name = "fake"
+
+    def __init__(self, transcripts: Sequence[str], delay: float = 0.3, confidence: float = 0.95):
+        super().__init__()
+        self.transcripts = list(transcripts)
+        self.delay = delay
+        self.confidence = confidence
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self) -> int:
+        with self._lock:
+            return len(self.transcripts)
+
+    def _recognize(self, audio: sr.AudioData):
+        time.sleep(self.delay)
+        with self._lock:
+            if not self.transcripts:
+                raise sr.UnknownValueError()
+            return self.transcripts.pop(0), self.confidence
+
+class MemoryStorage(Storage):
+    """ Storage kept in process memory, for runs that should not touch any database. """
+
+    name = "memory"
+
+    def __init__(self):
+        self.messages = {}  # record_id -> [(seq, role, content)]
+        self.turns: List[Tuple[int, int, Optional[str], Optional[str]]] = []  # (record_id, user_seq, language, metadata)
+        self.summaries = {}
+        self.languages = {}  # user_id -> language code
+        self._lock = threading.Lock()
+
+    def setup(self) -> None:
+        with self._lock:
+            self.languages.setdefault(DEFAULT_USER_ID, DEFAULT_LANGUAGE)
+
+    def load_messages(self, record_id: int, limit: Optional[int], before_seq: Optional[int]) -> List[Row]:
+        with self._lock:
+            rows = [row for row in self.messages.get(record_id, []) if before_seq is None or row[0] < before_seq]
+        return rows if limit is None else rows[max(0, len(rows) - limit):]
+
+    def load_message_range(self, record_id: int, after_seq: int, before_seq: int, limit: int) -> List[Row]:
+        with self._lock:
+            rows = [row for row in self.messages.get(record_id, []) if after_seq < row[0] < before_seq]
+        return rows[:limit]
+
+    def append_message(self, record_id: int, role: str, content: str) -> None:
+        with self._lock:
+            rows = self.messages.setdefault(record_id, [])
+            rows.append((len(rows) + 1, role, content))
+
+    def save_turn(self, turn: ChatTurn) -> None:
+        with self._lock:
+            rows = self.messages.setdefault(turn.record_id, [])
+            user_seq = len(rows) + 1
+            rows.append((user_seq, "user", turn.user_content))
+            rows.append((user_seq + 1, "assistant", turn.assistant_content))
+            self.turns.append((turn.record_id, user_seq, turn.language,
+                               json.dumps(turn.metadata) if turn.metadata else None))
+
+    def load_summary(self, record_id: int) -> Optional[Tuple[str, int]]:
+        with self._lock:
+            return self.summaries.get(record_id)
+
+    def save_summary(self, record_id: int, summary: str, through_seq: int) -> None:
+        with self._lock:
+            self.summaries[record_id] = (summary, through_seq)
+
+    def load_language(self, user_id: int = DEFAULT_USER_ID) -> Optional[str]:
+        with self._lock:
+            return self.languages.get(user_id)
+
+    def save_language(self, language: str, user_id: int = DEFAULT_USER_ID) -> None:
+        with self._lock:
+            self.languages[user_id] = language
+
+def write_speech_script(path: str, phrases: int, phrase_seconds: float = 0.8, gap_seconds: float = 3.0,
+                        lead_seconds: float = 1.0, amplitude: int = 6000, seed: int = 0) -> float:
+    """
+    Writes a 16 kHz mono WAV of `phrases` voice-like bursts separated by quiet gaps.
+
+    The bursts are noisy tones loud enough for the capture VAD to cut each one out as
+    an utterance; what they "say" comes from a FakeRecognizer's script.
+
+    Returns:
+        float: Length of the recording in seconds.
+    """
+    generator = random.Random(seed)
+    samples = []
+
+    def silence(seconds: float) -> None:
+        samples.extend(int(generator.gauss(0, 30)) for _ in range(int(seconds * SAMPLE_RATE)))
+
+    silence(lead_seconds)
+    for index in range(phrases):
+        frequency = 180 + 40 * (index % 4)
+        for i in range(int(phrase_seconds * SAMPLE_RATE)):
+            value = amplitude * math.sin(2 * math.pi * frequency * i / SAMPLE_RATE) + generator.gauss(0, amplitude / 6)
+            samples.append(max(-32768, min(32767, int(value))))
+        silence(gap_seconds)
+
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(struct.pack(f'<{len(samples)}h', *samples))
+    return len(samples) / SAMPLE_RATE
@@ -0,0 +1,121 @@
+"""
+Regenerates the speech fixtures of the wake word benchmark.
+
+Usage:
+    pip install espeakng-loader
+    python -m benchmarks.make_wake_word_fixtures
+
+The fixtures are spoken by the espeak-ng synthesizer so they can be rebuilt
+anywhere: keyword templates for "wake up" and "sleep" at a few speaking rates
+and pitches, standing in for a user's enrollment recordings, and two streams in
+the same voice, one with both phrases said between ordinary sentences and one
+with only sentences and sound-alike words. Everything is written as 16 kHz
+16-bit mono WAV with a little background noise.
+"""
+import ctypes
+import os
+import numpy as np
+from benchmarks.wake_word_benchmark import FIXTURES_DIR, write_wav
+from main_utility.capture import SAMPLE_RATE
+from main_utility.wake_word import WAKE_PHRASE, SLEEP_PHRASE
+
+VOICE = "en-us+m3"
+AUDIO_OUTPUT_SYNCHRONOUS = 2
+ESPEAK_RATE, ESPEAK_PITCH = 1, 3
+NOISE_AMPLITUDE = 40
+
+# (words per minute, pitch) of each enrollment recording
+TEMPLATE_TAKES = [(150, 45), (170, 50), (190, 55)]
+
+# Said in the stream with the phrases as (text, seconds of silence after it)
+WITH_KEYWORDS = [
+    ("I had a really long day at work today.", 1.5),
+    (WAKE_PHRASE, 1.2),
+    ("Can you tell me something nice?", 2.0),
+    ("It has been raining since the morning.", 1.0),
+    (SLEEP_PHRASE, 1.5),
+    ("Never mind, I changed my mind.", 1.0),
+    (WAKE_PHRASE, 1.2),
+    ("I think I will go for a walk later.", 1.0),
+    (SLEEP_PHRASE, 1.5),
+]
+
+# Sound-alike words and ordinary sentences that must not wake the assistant
+WITHOUT_KEYWORDS = [
+    ("I had a really long day at work today.", 1.5),
+    ("make up", 1.2),
+    ("Can you tell me something nice?", 2.0),
+    ("sweep", 1.2),
+    ("It has been raining since the morning.", 1.0),
+    ("break up", 1.2),
+    ("cheap", 1.2),
+    ("I think I will go for a walk later.", 1.0),
+    ("take off", 1.5),
+]
+
+class Espeak:
+    """ Synthesizes text to 16 kHz samples with the espeak-ng library bundled in espeakng-loader. """
+
+    def __init__(self, voice: str = VOICE):
+        try:
+            import espeakng_loader
+        except ImportError:
+            raise SystemExit("The fixtures are synthesized with espeak-ng: pip install espeakng-loader")
+        self._lib = ctypes.CDLL(espeakng_loader.get_library_path())
+        data_path = espeakng_loader.get_data_path()
+        self._rate = self._lib.espeak_Initialize(AUDIO_OUTPUT_SYNCHRONOUS, 0,
+                                                 os.path.dirname(data_path).encode(), 0)
+        if self._rate <= 0:
+            raise RuntimeError("espeak-ng failed to initialise.")
+        self._lib.espeak_SetVoiceByName(voice.encode())
+        self._chunks = []
+        callback_type = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.POINTER(ctypes.c_short), ctypes.c_int, ctypes.c_void_p)
+        self._callback = callback_type(self._collect)
+        self._lib.espeak_SetSynthCallback(self._callback)
+
+    def _collect(self, wav, count, events) -> int:
+        if wav and count > 0:
+            self._chunks.append(np.ctypeslib.as_array(wav, shape=(count,)).copy())
+        return 0
+
+    def say(self, text: str, rate: int = 170, pitch: int = 50) -> np.ndarray:
+        self._lib.espeak_SetParameter(ESPEAK_RATE, rate, 0)
+        self._lib.espeak_SetParameter(ESPEAK_PITCH, pitch, 0)
+        self._chunks = []
+        encoded = text.encode()
+        self._lib.espeak_Synth(encoded, len(encoded) + 1, 0, 0, 0, 0, None, None)
+        samples = np.concatenate(self._chunks).astype(np.float64)
+        # Resample to the capture rate and trim the synthesizer's leading and trailing silence
+        times = np.arange(int(len(samples) * SAMPLE_RATE / self._rate)) * self._rate / SAMPLE_RATE
+        samples = np.interp(times, np.arange(len(samples)), samples)
+        voiced = np.flatnonzero(np.abs(samples) > 200)
+        return samples[voiced[0]:voiced[-1] + 1] if len(voiced) else samples
+
+def silence(seconds: float) -> np.ndarray:
+    return np.zeros(int(seconds * SAMPLE_RATE))
+
+def with_noise(samples: np.ndarray, rng: np.random.Generator) -> list:
+    noisy = samples + rng.normal(0, NOISE_AMPLITUDE, len(samples))
+    return np.clip(np.round(noisy), -32768, 32767).astype(np.int16).tolist()
+
+def main():
+    rng = np.random.default_rng(7)
+    espeak = Espeak()
+
+    for label in (WAKE_PHRASE, SLEEP_PHRASE):
+        directory = os.path.join(FIXTURES_DIR, "templates", label)
+        os.makedirs(directory, exist_ok=True)
+        for n, (rate, pitch) in enumerate(TEMPLATE_TAKES):
+            take = np.concatenate([silence(0.1), espeak.say(label, rate, pitch), silence(0.1)])
+            write_wav(os.path.join(directory, f"{n}.wav"), with_noise(take, rng))
+
+    for name, script in (("with_keywords", WITH_KEYWORDS), ("without_keywords", WITHOUT_KEYWORDS)):
+        parts = [silence(1.0)]
+        for text, pause in script:
+            # Every phrase in the stream is said a little differently from the templates
+            parts += [espeak.say(text, int(rng.integers(155, 186)), int(rng.integers(44, 57))), silence(pause)]
+        write_wav(os.path.join(FIXTURES_DIR, f"{name}.wav"), with_noise(np.concatenate(parts), rng))
+    print(f"Wrote the wake word fixtures to {FIXTURES_DIR}.")
+
+if __name__ == "__main__":
+    main()
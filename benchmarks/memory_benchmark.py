@@ -0,0 +1,80 @@
+"""
+Measures recall and search latency of the long-term memory index.
+
+Usage:
+    python -m benchmarks.memory_benchmark [--sizes 10000 100000 1000000] [--dim 384] [--nprobe 4 8 16]
+
+Vectors are synthetic: messages are drawn around a few thousand random "topic"
+directions, and each query is a noisy copy of a stored message. Recall@k is the
+share of the exact top-k that the IVF search also returns. Prints one JSON
+object per (size, search mode).
+"""
+import argparse
+import json
+import time
+import numpy as np
+from main_utility.memory_index import IVFIndex, VectorIndex, normalize
+
+def add_noise(rng, vectors: np.ndarray, noise: float) -> np.ndarray:
+    """ Adds isotropic noise with an expected norm of `noise` to unit vectors. """
+    scale = noise / np.sqrt(vectors.shape[1])
+    return normalize(vectors + scale * rng.standard_normal(vectors.shape, dtype=np.float32))
+
+def synthetic_vectors(rng, count: int, topics: np.ndarray, noise: float) -> np.ndarray:
+    return add_noise(rng, topics[rng.integers(len(topics), size=count)], noise)
+
+def percentile_ms(samples, q: float) -> float:
+    return round(float(np.percentile(samples, q)) * 1000, 3)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--spread", type=float, default=0.8, help="noise norm of messages around their topic")
+    parser.add_argument("--query-noise", type=float, default=0.3, help="noise norm of queries around their target")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    topics = normalize(rng.standard_normal((2000, args.dim), dtype=np.float32))
+
+    for size in args.sizes:
+        index = IVFIndex(args.dim, train_size=min(size, 20000), capacity=size)
+        started = time.perf_counter()
+        for start in range(0, size, 50000):
+            count = min(50000, size - start)
+            index.add(np.arange(start, start + count), synthetic_vectors(rng, count, topics, noise=args.spread))
+        if index.centroids is None or index._trained_at < size:
+            index.train()
+        build_s = time.perf_counter() - started
+
+        targets = rng.integers(size, size=args.queries)
+        queries = add_noise(rng, index.vectors[targets], args.query_noise)
+
+        exact, exact_times = [], []
+        for query in queries:
+            started = time.perf_counter()
+            exact.append({seq for seq, _ in VectorIndex.search(index, query, args.k)})
+            exact_times.append(time.perf_counter() - started)
+        print(json.dumps({"size": size, "mode": "exact", "recall": 1.0,
+                          "p50_ms": percentile_ms(exact_times, 50), "p95_ms": percentile_ms(exact_times, 95),
+                          "build_s": round(build_s, 2), "memory_mb": round(index.vectors.nbytes / 2 ** 20, 1)}))
+
+        for nprobe in args.nprobe:
+            index.nprobe = nprobe
+            found, times = 0, []
+            for query, truth in zip(queries, exact):
+                started = time.perf_counter()
+                result = index.search(query, args.k)
+                times.append(time.perf_counter() - started)
+                found += len(truth & {seq for seq, _ in result})
+            print(json.dumps({"size": size, "mode": f"ivf nprobe={nprobe}", "clusters": len(index.centroids),
+                              "recall": round(found / sum(len(truth) for truth in exact), 4),
+                              "p50_ms": percentile_ms(times, 50), "p95_ms": percentile_ms(times, 95)}))
+        del index
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Load test of the multi-session conversation server.
+
+Usage:
+    python -m benchmarks.server_load_test [--sessions 50] [--concurrency 20] [--turns 3] [--store sqlite|memory]
+    python -m benchmarks.server_load_test --url http://127.0.0.1:8765 [--sessions 50]
+
+Every simulated client opens a session, wakes the assistant, asks --turns questions,
+puts it to sleep and ends the session; --concurrency clients run at once. Without
+--url the server runs in-process against the local service stub (see
+benchmarks/service_stub.py), so the test needs no network or API keys.
+
+Latencies are measured by the client, from sending a turn to receiving its first
+"text" event, its first "audio" event and its "done" event. Prints one JSON summary
+line with sessions/s, turns/s and p50/p95/p99 latencies; the exit status is 1 if any
+turn failed or the p95 time to first audio exceeds --max-first-audio-p95-ms.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+# An in-process server keeps its data (database, TTS cache, memory) in a throwaway home
+os.environ["HOME"] = tempfile.mkdtemp(prefix="calmora-load-test-")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from config import use_example_config
+use_example_config()  # Runs on a checkout without config/config.py; the stub replaces every credential used
+from config import config
+from benchmarks.fakes import MemoryStorage, DEFAULT_REPLY
+from benchmarks.service_stub import ServiceStub, StubSettings
+
+QUESTIONS = [
+    "i had a really long day at work",
+    "i can't stop thinking about the deadline",
+    "how do i switch off in the evening",
+    "my evenings have felt restless lately",
+]
+
+async def request(host: str, port: int, method: str, path: str, user_id: int, body: bytes = b""):
+    """
+    Sends one request and yields (arrival time, event) for every JSON line of the response.
+
+    Non-streamed responses yield a single event; error statuses raise RuntimeError.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nX-User-Id: {user_id}\r\n"
+                      f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if headers.get("transfer-encoding") != "chunked":
+            data = await reader.readexactly(int(headers.get("content-length", 0)))
+            if status >= 400:
+                raise RuntimeError(f"{method} {path}: {status} {data.decode('utf-8', 'replace')}")
+            yield time.monotonic(), json.loads(data) if data else None
+            return
+        buffer = b""
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            if size == 0:
+                return
+            buffer += await reader.readexactly(size)
+            await reader.readexactly(2)
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                yield time.monotonic(), json.loads(line)
+    finally:
+        writer.close()
+
+async def turn(host: str, port: int, session_id: str, user_id: int, text: str, with_audio: bool) -> dict:
+    path = f"/sessions/{session_id}/turns" + ("" if with_audio else "?audio=0")
+    sent_at = time.monotonic()
+    result = {"first_text_ms": None, "first_audio_ms": None, "total_ms": None, "error": None}
+    async for arrived_at, event in request(host, port, "POST", path, user_id, json.dumps({"text": text}).encode()):
+        elapsed = round((arrived_at - sent_at) * 1000, 1)
+        kind = event.get("event")
+        if kind in ("text", "prompt") and result["first_text_ms"] is None:
+            result["first_text_ms"] = elapsed
+        if (kind == "audio" or (kind == "prompt" and "audio" in event)) and result["first_audio_ms"] is None:
+            result["first_audio_ms"] = elapsed
+        if kind == "error":
+            result["error"] = event.get("message")
+        if kind == "done":
+            result["total_ms"] = elapsed
+    if result["total_ms"] is None and result["error"] is None:
+        result["error"] = "stream ended without a done event"
+    return result
+
+async def client(host: str, port: int, number: int, turns: int, with_audio: bool, results: list, errors: list) -> None:
+    session_id = f"load-{number}"
+    user_id = 1000 + number
+    try:
+        await turn(host, port, session_id, user_id, "wake up", with_audio)
+        for index in range(turns):
+            result = await turn(host, port, session_id, user_id, QUESTIONS[(number + index) % len(QUESTIONS)],
+                                with_audio)
+            if result["first_text_ms"] is None and not result["error"]:
+                result["error"] = "no reply"  # e.g. the session was asleep
+            if result["error"]:
+                errors.append(f"{session_id}: {result['error']}")
+            else:
+                results.append(result)
+        await turn(host, port, session_id, user_id, "sleep", with_audio)
+        async for _ in request(host, port, "DELETE", f"/sessions/{session_id}", user_id):
+            pass
+    except (OSError, RuntimeError, ValueError) as e:
+        errors.append(f"session {session_id}: {e}")
+
+async def run_clients(host: str, port: int, args) -> tuple:
+    results, errors = [], []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def limited(number: int) -> None:
+        async with semaphore:
+            await client(host, port, number, args.turns, not args.no_audio, results, errors)
+
+    started_at = time.monotonic()
+    await asyncio.gather(*(limited(number) for number in range(args.sessions)))
+    wall_seconds = time.monotonic() - started_at
+    stats = None
+    async for _, stats in request(host, port, "GET", "/stats", 0):
+        pass
+    return results, errors, wall_seconds, stats
+
+def percentiles(samples) -> dict:
+    ordered = sorted(sample for sample in samples if sample is not None)
+    if not ordered:
+        return {"p50": None, "p95": None, "p99": None}
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
+
+def start_local_server(args):
+    """ Starts the service stub and an in-process server on free ports; returns (server, stub). """
+    stub = ServiceStub(StubSettings(llm_first_token=args.llm_first_token, llm_token=args.llm_token,
+                                    tts_latency=args.tts_latency, jitter=args.jitter, seed=args.seed)).start()
+    # The service clients read these at import time, so set them before importing the server
+    config.COHERE_BASE_URL = stub.url
+    config.ELEVENLABS_BASE_URL = stub.url
+    config.COHERE_API = "load-test"
+    # Keys are capped at CHARACTER_LIMIT characters each, so register enough stub keys for the whole run
+    characters = args.sessions * (args.turns + 2) * (len(DEFAULT_REPLY) + 100)
+    config.elevenlab_api_keys_list = {f"load-test-key-{i}": "active" for i in range(characters // 9000 + 1)}
+    from main_utility.conversation_server import ConversationServer
+    from main_utility.storage import SQLiteStorage
+
+    storage = MemoryStorage() if args.store == "memory" else SQLiteStorage(os.path.join(os.environ["HOME"], "load.db"))
+    storage.setup()
+    server = ConversationServer(storage, host="127.0.0.1", port=0, memory=not args.no_memory)
+    threading.Thread(target=asyncio.run, args=(server.serve(),), name="conversation-server", daemon=True).start()
+    if not server.ready.wait(30):
+        raise RuntimeError("The conversation server did not start.")
+    return server, stub
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="test a running server instead of an in-process one")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=20, help="sessions running at once")
+    parser.add_argument("--turns", type=int, default=3, help="questions per session")
+    parser.add_argument("--no-audio", action="store_true", help="ask for text only")
+    parser.add_argument("--store", choices=("sqlite", "memory"), default="sqlite")
+    parser.add_argument("--no-memory", action="store_true", help="disable long-term memory on the in-process server")
+    parser.add_argument("--llm-first-token", type=float, default=0.4)
+    parser.add_argument("--llm-token", type=float, default=0.02)
+    parser.add_argument("--tts-latency", type=float, default=0.25)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-first-audio-p95-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    server = stub = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        server, stub = start_local_server(args)
+        host, port = "127.0.0.1", server.port
+    try:
+        results, errors, wall_seconds, stats = asyncio.run(run_clients(host, port, args))
+    finally:
+        if server is not None:
+            server.stop()
+            stub.stop()
+
+    completed_sessions = args.sessions - len({error.split(":")[0] for error in errors if error.startswith("session ")})
+    summary = {
+        "sessions": args.sessions,
+        "concurrency": args.concurrency,
+        "turns": len(results),
+        "errors": len(errors),
+        "wall_s": round(wall_seconds, 2),
+        "sessions_per_s": round(completed_sessions / wall_seconds, 3),
+        "turns_per_s": round(len(results) / wall_seconds, 3),
+        "first_text_ms": percentiles(result["first_text_ms"] for result in results),
+        "first_audio_ms": percentiles(result["first_audio_ms"] for result in results),
+        "total_ms": percentiles(result["total_ms"] for result in results),
+        "server": stats,
+    }
+    print(json.dumps(summary))
+    for error in errors[:10]:
+        print(f"Error: {error}", file=sys.stderr)
+
+    budget = args.max_first_audio_p95_ms
+    p95 = summary["first_audio_ms"]["p95"]
+    if errors or (budget is not None and (p95 is None or p95 > budget)):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Local HTTP stand-in for the Cohere and ElevenLabs APIs, for offline benchmarks.
+
+Serves the endpoints the app calls, with configurable latency and jitter:
+
+    POST /v2/chat                       Cohere chat, streamed as server-sent events when "stream" is set
+    POST /v2/embed                      Cohere embeddings (deterministic pseudo-random vectors)
+    POST /v1/text-to-speech/<voice_id>  ElevenLabs TTS; returns silent MP3 frames as long as the speech would be
+    GET  /v1/user                       ElevenLabs quota
+
+Point the app at it with COHERE_BASE_URL and ELEVENLABS_BASE_URL in config.
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from benchmarks.fakes import DEFAULT_REPLY
+
+# One MPEG-1 Layer III frame: 128 kbps, 44.1 kHz, mono, no padding; all-zero side info decodes as silence
+MP3_FRAME_HEADER = b"\xff\xfb\x90\xc0"
+MP3_FRAME_BYTES = 417
+MP3_FRAME_SECONDS = 1152 / 44100
+SILENT_MP3_FRAME = MP3_FRAME_HEADER + bytes(MP3_FRAME_BYTES - len(MP3_FRAME_HEADER))
+
+def silent_mp3(seconds: float) -> bytes:
+    """ Returns a valid MP3 stream of silence lasting about `seconds`. """
+    return SILENT_MP3_FRAME * max(2, round(seconds / MP3_FRAME_SECONDS))
+
+class StubSettings:
+    """
+    Timing of the stubbed services, in seconds.
+
+    Every delay gets up to `jitter` seconds of uniform random noise added. Chat
+    requests wait prompt_per_1k_tokens per thousand prompt tokens (~4 bytes each)
+    before the first token, like a model's prefill.
+    """
+
+    def __init__(self, reply: str = DEFAULT_REPLY, llm_first_token: float = 0.4, llm_token: float = 0.02,
+                 tts_latency: float = 0.25, tts_per_char: float = 0.002, speaking_rate: float = 15.0,
+                 embed_latency: float = 0.05, embed_dim: int = 384, jitter: float = 0.0, seed: int = 0,
+                 prompt_per_1k_tokens: float = 0.0):
+        self.reply = reply
+        self.llm_first_token = llm_first_token
+        self.llm_token = llm_token
+        self.tts_latency = tts_latency
+        self.tts_per_char = tts_per_char
+        self.speaking_rate = speaking_rate  # characters per second of rendered speech
+        self.prompt_per_1k_tokens = prompt_per_1k_tokens
+        self.embed_latency = embed_latency
+        self.embed_dim = embed_dim
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sleep(self, seconds: float) -> None:
+        with self._lock:
+            noise = self._random.uniform(0, self.jitter)
+        time.sleep(seconds + noise)
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    settings: StubSettings = None  # Set on the subclass created by ServiceStub
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+    def do_GET(self):
+        if self.path == "/v1/user":
+            self._send_json({"subscription": {"character_count": 0, "character_limit": 1_000_000}})
+        else:
+            self._send_json({"detail": "not found"}, status=404)
+
+    def do_POST(self):
+        body = self._read_json()
+        if self.path == "/v2/chat":
+            if body.get("stream"):
+                self._stream_chat(body)
+            else:
+                self._chat(body)
+        elif self.path == "/v2/embed":
+            self._embed(body)
+        elif self.path.startswith("/v1/text-to-speech/"):
+            self._text_to_speech(body)
+        else:
+            self._send_json({"detail": "not found"}, status=404)
+
+    def _chat(self, body):
+        settings = self.settings
+        settings.sleep(self._prefill(body) + settings.llm_first_token
+                       + settings.llm_token * len(settings.reply.split(" ")))
+        self._send_json({
+            "id": "stub", "finish_reason": "COMPLETE",
+            "message": {"role": "assistant", "content": [{"type": "text", "text": settings.reply}]},
+        })
+
+    def _stream_chat(self, body):
+        settings = self.settings
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        settings.sleep(self._prefill(body) + settings.llm_first_token)
+        words = settings.reply.split(" ")
+        for index, word in enumerate(words):
+            if index:
+                settings.sleep(settings.llm_token)
+            text = word if index == len(words) - 1 else word + " "
+            event = {"type": "content-delta", "index": 0, "delta": {"message": {"content": {"text": text}}}}
+            if not self._send_event("content-delta", event):
+                return  # The client closed the stream
+        self._send_event("message-end", {"type": "message-end", "delta": {"finish_reason": "COMPLETE"}})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _prefill(self, body) -> float:
+        prompt_bytes = 0
+        for message in body.get("messages", []):
+            content = message.get("content") or ""
+            if isinstance(content, list):
+                content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+            prompt_bytes += len(str(content).encode("utf-8"))
+        return self.settings.prompt_per_1k_tokens * prompt_bytes / 4 / 1000
+
+    def _embed(self, body):
+        settings = self.settings
+        settings.sleep(settings.embed_latency)
+        vectors = []
+        for text in body.get("texts", []):
+            # Same text, same vector: seeded from the text's digest
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+            generator = random.Random(seed)
+            vectors.append([generator.gauss(0, 1) for _ in range(settings.embed_dim)])
+        self._send_json({"id": "stub", "embeddings": {"float": vectors}, "texts": body.get("texts", []),
+                         "response_type": "embeddings_by_type"})
+
+    def _text_to_speech(self, body):
+        settings = self.settings
+        text = body.get("text", "")
+        settings.sleep(settings.tts_latency + settings.tts_per_char * len(text))
+        audio = silent_mp3(len(text) / settings.speaking_rate)
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(len(audio)))
+        self.end_headers()
+        self.wfile.write(audio)
+
+    def _send_event(self, name: str, data: dict) -> bool:
+        payload = f"event: {name}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+        try:
+            self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+            self.wfile.flush()
+            return True
+        except (BrokenPipeError, ConnectionResetError):
+            return False
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, data: dict, status: int = 200):
+        payload = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+class ServiceStub:
+    """
+    Runs the stub server on a background thread; use as a context manager.
+
+    Args:
+        settings (StubSettings): Service timings.
+        port (int): Port to listen on; 0 picks a free one.
+    """
+
+    def __init__(self, settings: Optional[StubSettings] = None, port: int = 0):
+        self.settings = settings or StubSettings()
+        handler = type("BoundStubHandler", (StubHandler,), {"settings": self.settings})
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "ServiceStub":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="service-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
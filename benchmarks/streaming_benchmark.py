@@ -0,0 +1,61 @@
+"""
+Compares time to first audio of the pipelined (streaming) reply path against the
+blocking one, using a mock Cohere client and fake TTS.
+
+Usage:
+    python -m benchmarks.streaming_benchmark [--turns 5] [--speaking-rate 200]
+
+Playback is sped up with --speaking-rate (characters per second) so the run stays short;
+it does not affect time to first audio. Prints one JSON object per mode.
+"""
+import argparse
+import json
+import statistics
+import time
+from main_utility.speech_pipeline import SpeechPipeline
+from utils.AI_Response import stream_and_speak
+from benchmarks.fakes import MockStreamingChat, FakeTTS
+
+MESSAGES = [{"role": "user", "content": "I had a really long day."}]
+
+def run_pipelined(client: MockStreamingChat, tts: FakeTTS) -> float:
+    ended_at = time.monotonic()
+    pipeline = SpeechPipeline('en', started_at=ended_at, fetch=tts.fetch, play=tts.play)
+    stream_and_speak(client, MESSAGES, 'en', pipeline=pipeline)
+    return pipeline.time_to_first_audio
+
+def run_blocking(client: MockStreamingChat, tts: FakeTTS) -> float:
+    ended_at = time.monotonic()
+    reply = client.chat(model=None, messages=MESSAGES).message.content[0].text
+    audio = tts.fetch(reply)
+    time_to_first_audio = time.monotonic() - ended_at
+    tts.play(audio)
+    return time_to_first_audio
+
+def summarize(mode: str, samples) -> dict:
+    return {
+        "mode": mode,
+        "turns": len(samples),
+        "ttfa_ms_mean": round(1000 * statistics.mean(samples), 1),
+        "ttfa_ms_min": round(1000 * min(samples), 1),
+        "ttfa_ms_max": round(1000 * max(samples), 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--first-token-delay", type=float, default=0.4)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--tts-latency", type=float, default=0.25)
+    parser.add_argument("--speaking-rate", type=float, default=200.0)
+    args = parser.parse_args()
+
+    client = MockStreamingChat(first_token_delay=args.first_token_delay, token_delay=args.token_delay)
+    tts = FakeTTS(base_latency=args.tts_latency, speaking_rate=args.speaking_rate)
+
+    for mode, run in (("blocking", run_blocking), ("pipelined", run_pipelined)):
+        samples = [run(client, tts) for _ in range(args.turns)]
+        print(json.dumps(summarize(mode, samples)))
+
+if __name__ == "__main__":
+    main()
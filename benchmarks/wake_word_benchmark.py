@@ -0,0 +1,140 @@
+"""
+Measures the CPU cost and detections of the on-device keyword spotter.
+
+Usage:
+    python -m benchmarks.wake_word_benchmark
+    python -m benchmarks.wake_word_benchmark --templates ~/.calmora/keywords --streams recordings/*.wav
+    python -m benchmarks.wake_word_benchmark --synthetic
+
+By default the spotter scans the speech fixtures in benchmarks/fixtures/wake_word:
+templates for "wake up" and "sleep", a stream that says each of them twice between
+ordinary sentences, and a stream of sentences and sound-alike words that should
+produce no detections. They are synthesized speech; see make_wake_word_fixtures.py.
+--templates points at a directory laid out like the spotter's keyword store
+(<label>/<n>.wav); --streams are 16-bit mono recordings to scan. --synthetic
+generates sine-chirp stand-ins for both, which only exercises the pipeline.
+Prints one JSON object per stream plus a summary line.
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import random
+import struct
+import tempfile
+import time
+import wave
+from main_utility.capture import WavFileSource, EnergyVAD, SAMPLE_RATE
+from main_utility.wake_word import KeywordSpotter
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "wake_word")
+
+def write_wav(path: str, samples) -> None:
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(struct.pack(f'<{len(samples)}h', *samples))
+
+def chirp(seconds: float, start_hz: float, end_hz: float, amplitude: int = 6000):
+    count = int(seconds * SAMPLE_RATE)
+    phase = 0.0
+    samples = []
+    for i in range(count):
+        phase += 2 * math.pi * (start_hz + (end_hz - start_hz) * i / count) / SAMPLE_RATE
+        samples.append(int(amplitude * math.sin(phase)))
+    return samples
+
+def noise(seconds: float, amplitude: int = 60):
+    return [random.randint(-amplitude, amplitude) for _ in range(int(seconds * SAMPLE_RATE))]
+
+def make_synthetic_fixtures(directory: str):
+    """ Writes keyword templates and a 60 s stream with keywords, distractors and silence. """
+    random.seed(7)
+    keywords = {"wake up": (300, 900), "sleep": (900, 300)}
+    for label, (start_hz, end_hz) in keywords.items():
+        os.makedirs(os.path.join(directory, "templates", label))
+        for n in range(2):
+            write_wav(os.path.join(directory, "templates", label, f"{n}.wav"), chirp(0.6 + 0.05 * n, start_hz, end_hz))
+
+    stream = []
+    while len(stream) < 60 * SAMPLE_RATE:
+        stream += noise(random.uniform(1, 4))
+        choice = random.random()
+        if choice < 0.3:
+            stream += chirp(random.uniform(0.55, 0.7), *keywords["wake up"])
+        elif choice < 0.5:
+            stream += chirp(random.uniform(0.55, 0.7), *keywords["sleep"])
+        else:
+            stream += chirp(random.uniform(0.3, 2.0), random.uniform(200, 2000), random.uniform(200, 2000))
+    stream_path = os.path.join(directory, "stream.wav")
+    write_wav(stream_path, stream)
+    return os.path.join(directory, "templates"), [stream_path]
+
+def run_stream(spotter: KeywordSpotter, path: str) -> dict:
+    source = WavFileSource(path)
+    vad = EnergyVAD()
+    source.open()
+    frames = []
+    try:
+        while True:
+            frame = source.read()
+            if not frame:
+                break
+            frames.append(frame)
+    finally:
+        source.close()
+
+    detections = {}
+    spotter.detections.queue.clear()
+    checked_before = spotter.segments_checked
+    cpu_started, wall_started = time.process_time(), time.perf_counter()
+    for frame in frames:
+        spotter.process_frame(frame, vad.is_speech(frame))
+        while not spotter.detections.empty():
+            label = spotter.detections.get_nowait().label
+            detections[label] = detections.get(label, 0) + 1
+    cpu_seconds = time.process_time() - cpu_started
+    wall_seconds = time.perf_counter() - wall_started
+
+    audio_seconds = sum(len(frame) for frame in frames) / (source.sample_rate * source.sample_width)
+    return {
+        "stream": path,
+        "audio_seconds": round(audio_seconds, 3),
+        "cpu_seconds": round(cpu_seconds, 4),
+        "cpu_ms_per_audio_second": round(1000 * cpu_seconds / audio_seconds, 3),
+        "real_time_factor": round(wall_seconds / audio_seconds, 5),
+        "segments_checked": spotter.segments_checked - checked_before,
+        "detections": detections,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--templates", default=os.path.join(FIXTURES_DIR, "templates"),
+                        help="Keyword template directory (<label>/<n>.wav).")
+    parser.add_argument("--streams", nargs="*", default=sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.wav"))),
+                        help="Recordings to scan.")
+    parser.add_argument("--synthetic", action="store_true", help="Generate templates and a stream.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        templates, streams = args.templates, args.streams
+        if args.synthetic:
+            templates, streams = make_synthetic_fixtures(scratch)
+        if not templates or not streams:
+            parser.error("pass --templates and --streams, or --synthetic")
+
+        spotter = KeywordSpotter(SAMPLE_RATE)
+        spotter.load_templates(templates)
+        results = [run_stream(spotter, path) for path in streams]
+        for result in results:
+            print(json.dumps(result))
+
+        audio = sum(result["audio_seconds"] for result in results)
+        cpu = sum(result["cpu_seconds"] for result in results)
+        print(json.dumps({"summary": True, "audio_seconds": round(audio, 3),
+                          "cpu_ms_per_audio_second": round(1000 * cpu / audio, 3)}))
+
+if __name__ == "__main__":
+    main()
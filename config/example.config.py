@@ -7,6 +7,15 @@ DB_HOST="your_db_host" # generally localhost
 DB_USER="your_db_user" # generally root
 DB_PASSWORD="your_db_password"
 DB_NAME="mikasha_ai"
+DB_POOL_SIZE = 5 # connections shared by the conversation, the chat writer and the summary thread
+
+# "mysql" uses the server above; "sqlite" keeps everything in a local file at SQLITE_PATH
+# and needs no database server.
+STORAGE_BACKEND = "mysql"
+SQLITE_PATH = "~/.calmora/calmora.db"
+
+# Number of relevant older messages recalled from long-term memory on every turn.
+MEMORY_TOP_K = 3
 
 elevenlab_api_keys_list = {
   # list of your elevenlab api keys and their status as there is limited number of requests you can make to the api so you might need multiple keys but it is against the terms of service to use multiple keys at the same time so try to use single key at a time
@@ -14,30 +23,48 @@ elevenlab_api_keys_list = {
   "your_api_key" : "inactive",
 }
 
-def GET_ELEVENLAB_API_KEY():
-    for key, status in elevenlab_api_keys_list.items():
-        # Skip any keys that are already marked as "inactive"
-        if status == "inactive":
-            continue
-
-        url = "https://api.elevenlabs.io/v1/user"
-        headers = {
-            "xi-api-key": key
-        }
-
-        response = requests.get(url, headers=headers)
-
-        if response.status_code == 200:
-            parsed_response = response.json()
-
-            # Assuming the response contains 'character_count' field
-            if parsed_response['subscription']['character_count'] < 9000:
-                return key  # Return the first working API key with character count under the limit
-            else:
-                # Mark the key as "Discarded" if character count exceeds 9000
-                elevenlab_api_keys_list[key] = "inactive"
-        else:
-            # If there's an error, mark this key as "Discarded"
-            elevenlab_api_keys_list[key] = "inactive"
-            
+# Speech-to-text engines. With more than one, every phrase is sent to all of them at once
+# and the first confident transcript wins. "vosk" runs offline (pip install vosk) and needs
+# a model directory at VOSK_MODEL_PATH.
+SPEECH_BACKENDS = ["google"]
+VOSK_MODEL_PATH = "model"
+
+# Record from the microphone the whole time, so anything said while the assistant is speaking
+# or thinking is queued for the next turn. With keyword recordings in ~/.calmora/keywords
+# (one folder of 16 kHz WAV files per phrase, e.g. "wake up" and "sleep"), the wake phrase is
+# then spotted on-device.
+CONTINUOUS_CAPTURE = False
+
+# Stop speaking as soon as the user talks over a reply. Keeps the microphone open while the
+# assistant speaks; phrases heard during playback are only answered if they triggered the
+# interruption, but headphones or a speaker with echo cancellation still work best.
+BARGE_IN = False
+
+# "earcons" plays short local tones for listening, "didn't catch that", timeout and error
+# states; "spoken" says those prompts with the TTS voice instead.
+PROMPT_VERBOSITY = "earcons"
+
+# Lines kept in the GUI log window; older lines are removed as new ones arrive.
+LOG_SCROLLBACK_LINES = 5000
+
+# Per-stage latency spans are appended here as JSON lines; set to None to keep them in memory only.
+TRACE_FILE = "~/.calmora/traces.jsonl"
+
+# Service endpoints. Leave unset for the public APIs; point them at a proxy or at a local
+# stub (see benchmarks/service_stub.py) for testing.
+# COHERE_BASE_URL = "https://api.cohere.com"
+# ELEVENLABS_BASE_URL = "https://api.elevenlabs.io"
+
+# Address of the headless conversation server (python server.py).
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+
+# Outbound HTTP (ElevenLabs): keep-alive connections kept per host, and seconds without data
+# from the server before a request is abandoned and retried.
+HTTP_POOL_SIZE = 32
+HTTP_READ_TIMEOUT = 30
+
+# Key selection, local quota tracking and rotation on rejected requests are handled by
+# main_utility/api_keys.py, which refreshes each key's usage from the API in the background.
+
 # Add your own API keys and other sensitive information to this file.
\ No newline at end of file
@@ -1,28 +1,102 @@
 import tkinter as tk
 from tkinter import scrolledtext
 import logging
+import queue
 import threading
 import time
 from main_utility.listening import listen
 from main_utility.speaking import speak
 from main_utility.ai_model_conversation import handle_conversation
-from main_utility.database import setup_database
+from main_utility.storage import open_storage
+from main_utility.tracing import tracer
 from contextlib import closing
+from config import config
+
+LOG_POLL_MS = 100  # How often the Tk main loop moves queued log records into the widget
+LOG_BATCH_SIZE = 500  # Records inserted per tick at most; the rest wait for the next one
+LOG_QUEUE_SIZE = 10000  # Records waiting for the GUI; further records are dropped and counted
+LOG_SCROLLBACK_LINES = getattr(config, "LOG_SCROLLBACK_LINES", 5000)
+CONTINUOUS_CAPTURE = getattr(config, "CONTINUOUS_CAPTURE", False)  # Record in the background the whole time
+TRACE_PANEL_REFRESH_MS = 1000
 
 # Custom Logging Handler to append logs to Tkinter Text widget
 class TkinterLoggingHandler(logging.Handler):
-    def __init__(self, text_widget, log_level):
-        super().__init__()
+    """
+    Logging handler that shows records in a Tk text widget without touching Tk from other threads.
+
+    emit() only formats the record and puts it on a bounded queue, so it is safe to
+    call from any thread. drain() runs on the Tk main loop every LOG_POLL_MS: it
+    inserts the queued records in one batch, folds consecutive repeats of the same
+    message into one line, and trims the oldest lines beyond max_lines. Records that
+    arrive while the queue is full are dropped and counted in `dropped`.
+    """
+
+    def __init__(self, text_widget, log_level, max_lines: int = LOG_SCROLLBACK_LINES,
+                 queue_size: int = LOG_QUEUE_SIZE, on_drop=None):
+        super().__init__(level=log_level)
         self.text_widget = text_widget
         self.log_level = log_level  # Specify log level to filter
+        self.max_lines = max_lines
+        self.on_drop = on_drop  # Called on the Tk thread with the drop count whenever it changes
+        self.records = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self._reported_drops = 0
+        self._drop_lock = threading.Lock()
 
     def emit(self, record):
         # Only display logs of the specified level or higher
-        if record.levelno >= self.log_level:
-            log_message = self.format(record)  # Format the log message
-            self.text_widget.insert("end", log_message + '\n')  # Insert into the text widget
+        if record.levelno < self.log_level:
+            return
+        try:
+            self.records.put_nowait((record.getMessage(), self.format(record)))
+        except queue.Full:
+            with self._drop_lock:
+                self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def start(self):
+        """ Starts draining the queue on the Tk main loop. Call from the Tk thread. """
+        self.text_widget.after(LOG_POLL_MS, self.drain)
+
+    def drain(self):
+        """ Moves queued records into the widget. Runs on the Tk thread and reschedules itself. """
+        lines = []
+        last_message, repeats = None, 0
+        for _ in range(LOG_BATCH_SIZE):
+            try:
+                message, log_message = self.records.get_nowait()
+            except queue.Empty:
+                break
+            if message == last_message:
+                repeats += 1
+                continue
+            if repeats:
+                lines[-1] += f" (repeated {repeats} more times)"
+            lines.append(log_message)
+            last_message, repeats = message, 0
+        if repeats:
+            lines[-1] += f" (repeated {repeats} more times)"
+
+        if lines:
+            self.text_widget.insert("end", "\n".join(lines) + "\n")  # Insert into the text widget
+            self._trim()
             self.text_widget.yview("end")  # Auto-scroll to the bottom
 
+        with self._drop_lock:
+            dropped = self.dropped
+        if dropped != self._reported_drops and self.on_drop is not None:
+            self._reported_drops = dropped
+            self.on_drop(dropped)
+        self.text_widget.after(LOG_POLL_MS, self.drain)
+
+    def _trim(self):
+        # The widget always ends with an empty line after the last newline
+        line_count = int(self.text_widget.index("end-1c").split(".")[0]) - 1
+        excess = line_count - self.max_lines
+        if excess > 0:
+            self.text_widget.delete("1.0", f"{excess + 1}.0")
+
 # Main GUI class
 class CalmoraGUI(tk.Tk):
     def __init__(self):
@@ -33,9 +107,18 @@ class CalmoraGUI(tk.Tk):
         self.geometry("1920x1080")
 
         # Create ScrolledText widget to display logs
-        self.log_text = scrolledtext.ScrolledText(self, width=230, height=50, wrap=tk.WORD)
+        self.log_text = scrolledtext.ScrolledText(self, width=180, height=50, wrap=tk.WORD)
         self.log_text.grid(row=0, column=0, padx=10, pady=10)
 
+        # Live latency percentiles of every traced stage
+        self.trace_panel = tk.Label(self, text="", justify=tk.LEFT, anchor="nw", font=("Courier", 10))
+        self.trace_panel.grid(row=0, column=1, padx=10, pady=10, sticky="n")
+        self.after(TRACE_PANEL_REFRESH_MS, self.refresh_trace_panel)
+
+        # Stays empty unless log records have to be dropped
+        self.dropped_label = tk.Label(self, text="", fg="red")
+        self.dropped_label.grid(row=3, column=0)
+
         # Set up logging configuration
         self.setup_logging()
 
@@ -54,9 +137,24 @@ class CalmoraGUI(tk.Tk):
         self.logger.setLevel(logging.DEBUG)
 
         # Create the custom logging handler with the log level filter (INFO level and above)
-        handler = TkinterLoggingHandler(self.log_text, logging.INFO)  # Only show INFO and higher logs
+        handler = TkinterLoggingHandler(self.log_text, logging.INFO, on_drop=self.show_dropped_logs)  # Only show INFO and higher logs
         handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))  # Optional format
         self.logger.addHandler(handler)
+        handler.start()
+
+    def show_dropped_logs(self, count):
+        """ Shows how many log records were dropped because the GUI could not keep up. """
+        self.dropped_label.config(text=f"{count} log records dropped during log storms")
+
+    def refresh_trace_panel(self):
+        """ Redraws the latency summary and schedules the next refresh. """
+        rows = [f"{'stage':<18}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"]
+        for name, stats in tracer.summary().items():
+            if stats["count"]:
+                rows.append(f"{name:<18}{stats['count']:>7}{stats['p50_ms']:>9.0f}{stats['p95_ms']:>9.0f}"
+                            f"{stats['p99_ms']:>9.0f}")
+        self.trace_panel.config(text="\n".join(rows))
+        self.after(TRACE_PANEL_REFRESH_MS, self.refresh_trace_panel)
 
     def start_listening(self):
         """Start listening and handle conversation."""
@@ -77,15 +175,15 @@ class CalmoraGUI(tk.Tk):
 
     def listen_and_respond(self):
         """Integrate the real listening and speaking logic."""
-        db, cursor = self.initialize_database()
-        if not db or not cursor:
+        storage = self.initialize_database()
+        if not storage:
             self.logger.error("Database initialization failed.")
             return
         
-        with closing(db), closing(cursor):
+        with closing(storage):
             try:
                 # Call handle_conversation without 'user_input' as an argument since it's handled internally
-                handle_conversation(db, cursor)
+                handle_conversation(storage, continuous_capture=CONTINUOUS_CAPTURE)
 
             except Exception as e:
                 self.logger.exception("An error occurred during the conversation handling.")
@@ -93,17 +191,17 @@ class CalmoraGUI(tk.Tk):
                 self.logger.info("Conversation loop ended.")
 
     def initialize_database(self):
-        """ Initializes the database. """
+        """ Opens the configured storage backend (MySQL or SQLite). """
         try:
-            db, cursor = setup_database()
-            if not all([db, cursor]):
-                self.logger.error("Failed to connect to the database.")
-                return None, None
-            self.logger.info("Database connection established.")
-            return db, cursor
+            storage = open_storage()
+            if not storage:
+                self.logger.error("Failed to open the database.")
+                return None
+            self.logger.info(f"{storage.name} storage ready.")
+            return storage
         except Exception as e:
             self.logger.exception("An error occurred while initializing the database.")
-            return None, None
+            return None
 
 # Main function to initialize the Tkinter GUI and start the application
 def main():
@@ -0,0 +1,167 @@
+import logging
+import threading
+import requests
+from typing import Dict, Optional
+from config import config
+from config.config import elevenlab_api_keys_list
+from main_utility.http_client import http_client
+from main_utility.tracing import span
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+ELEVENLABS_BASE_URL = getattr(config, "ELEVENLABS_BASE_URL", "https://api.elevenlabs.io")
+USER_URL = f"{ELEVENLABS_BASE_URL}/v1/user"
+CHARACTER_LIMIT = 9000  # Stop using a key once this many characters have been used
+REFRESH_INTERVAL = 300  # Seconds between background quota refreshes
+REJECTED_STATUS_CODES = (401, 429)
+
+class ElevenLabsKeysExhausted(RuntimeError):
+    """ Raised when no ElevenLabs API key has quota left. """
+
+class KeyState:
+    """ Locally tracked quota of a single API key. """
+
+    def __init__(self, key: str, enabled: bool):
+        self.key = key
+        self.enabled = enabled  # Keys marked "inactive" in the config are never used
+        self.active = True
+        self.character_count = 0
+        self.character_limit = CHARACTER_LIMIT
+
+    @property
+    def remaining(self) -> int:
+        return self.character_limit - self.character_count
+
+class ElevenLabsKeyManager:
+    """
+    Selects the ElevenLabs API key for each TTS request without a network round trip.
+
+    The active key is cached in memory and its usage is tracked locally from the
+    length of every text sent. Real quotas are re-read from /v1/user on a background
+    thread, and a key is rotated out as soon as the TTS endpoint rejects it.
+    """
+
+    def __init__(self, keys: Dict[str, str], refresh_interval: float = REFRESH_INTERVAL):
+        self._states = [KeyState(key, status != "inactive") for key, status in keys.items()]
+        self._active: Optional[KeyState] = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._refresh_thread = None
+        self.refresh_interval = refresh_interval
+
+    @property
+    def key_count(self) -> int:
+        return len(self._states)
+
+    def get_key(self) -> str:
+        """
+        Returns the key to use for the next request.
+
+        Returns:
+            str: An API key with quota left.
+
+        Raises:
+            ElevenLabsKeysExhausted: If every key is inactive or out of characters.
+        """
+        self.start()
+        with span("tts.key"), self._lock:
+            if self._active is None or not self._usable(self._active):
+                self._active = next((state for state in self._states if self._usable(state)), None)
+                if self._active is None:
+                    raise ElevenLabsKeysExhausted("All ElevenLabs API keys are exhausted or inactive.")
+                logging.info(f"Rotated to ElevenLabs key ending in {self._active.key[-4:]}.")
+            return self._active.key
+
+    def record_usage(self, key: str, characters: int) -> None:
+        """
+        Adds the characters of a successful request to the key's local usage.
+
+        Args:
+            key (str): Key the request was made with.
+            characters (int): Length of the text that was synthesised.
+        """
+        with self._lock:
+            state = self._find(key)
+            if state:
+                state.character_count += characters
+
+    def report_rejection(self, key: str, status_code: int) -> None:
+        """
+        Takes a key out of rotation after the TTS endpoint rejected it.
+
+        The key comes back on the next background refresh if its quota allows.
+
+        Args:
+            key (str): Key the request was made with.
+            status_code (int): HTTP status returned by the TTS endpoint.
+        """
+        with self._lock:
+            state = self._find(key)
+            if state:
+                state.active = False
+                if self._active is state:
+                    self._active = None
+        logging.warning(f"ElevenLabs key ending in {key[-4:]} rejected with status {status_code}; rotating.")
+
+    def refresh(self) -> None:
+        """ Re-reads the character usage of every key from the API. """
+        for state in [state for state in self._states if state.enabled]:
+            try:
+                response = http_client.get(USER_URL, headers={"xi-api-key": state.key})
+            except requests.RequestException as e:
+                logging.warning(f"Failed to refresh ElevenLabs quota: {e}")
+                continue
+
+            usage = None
+            if response.status_code == 200:
+                # An unexpected body must not end the refresh thread; the key keeps its last known usage
+                try:
+                    subscription = response.json()['subscription']
+                    usage = (int(subscription['character_count']),
+                             min(CHARACTER_LIMIT, int(subscription.get('character_limit', CHARACTER_LIMIT))))
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    logging.warning(f"Unexpected ElevenLabs usage response for key ending in {state.key[-4:]}: {e!r}")
+                    continue
+
+            with self._lock:
+                if usage is not None:
+                    state.character_count, state.character_limit = usage
+                    state.active = True
+                elif response.status_code == 401:
+                    state.active = False
+                if self._active is state and not self._usable(state):
+                    self._active = None
+
+    def start(self) -> None:
+        """ Starts the background refresh thread if it is not running yet. """
+        if self._refresh_thread is not None:
+            return
+        with self._lock:
+            if self._refresh_thread is None:
+                self._refresh_thread = threading.Thread(target=self._refresh_loop, daemon=True)
+                self._refresh_thread.start()
+
+    def stop(self) -> None:
+        """ Stops the background refresh thread. """
+        self._stop_event.set()
+
+    def _refresh_loop(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception:
+                logging.exception("Failed to refresh ElevenLabs quota.")
+            self._stop_event.wait(self.refresh_interval)
+
+    def _find(self, key: str) -> Optional[KeyState]:
+        return next((state for state in self._states if state.key == key), None)
+
+    @staticmethod
+    def _usable(state: KeyState) -> bool:
+        return state.enabled and state.active and state.remaining > 0
+
+key_manager = ElevenLabsKeyManager(elevenlab_api_keys_list)
@@ -0,0 +1,113 @@
+import io
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List
+
+BUFFER_POOL_SIZE = 4  # Buffers kept for reuse; more can be borrowed, the extras are just not kept
+INITIAL_BUFFER_BYTES = 256 * 1024  # ~16 s of speech at 128 kbps
+MAX_POOLED_BUFFER_BYTES = 4 * 1024 * 1024  # Unusually large buffers are dropped instead of pooled
+
+class BufferPool:
+    """
+    A small pool of reusable bytearrays for downloaded audio.
+
+    A bytearray keeps its allocation when it is cleared, so after the first few
+    replies the download path stops allocating: every reply is read into a buffer
+    that already has room for it.
+    """
+
+    def __init__(self, size: int = BUFFER_POOL_SIZE, initial_bytes: int = INITIAL_BUFFER_BYTES,
+                 max_buffer_bytes: int = MAX_POOLED_BUFFER_BYTES):
+        self.size = size
+        self.initial_bytes = initial_bytes
+        self.max_buffer_bytes = max_buffer_bytes
+        self._free: List[bytearray] = []
+        self._lock = threading.Lock()
+        self.allocations = 0
+        self.reuses = 0
+
+    def acquire(self) -> bytearray:
+        """ Returns an empty buffer, reusing a pooled one when available. """
+        with self._lock:
+            if self._free:
+                self.reuses += 1
+                return self._free.pop()
+            self.allocations += 1
+        buffer = bytearray(self.initial_bytes)
+        buffer.clear()  # Keeps the allocation, drops the contents
+        return buffer
+
+    def release(self, buffer: bytearray) -> None:
+        """ Returns a buffer to the pool. No view of it may be in use any more. """
+        try:
+            buffer.clear()
+        except BufferError:
+            return  # Still exported through a memoryview; let it be garbage collected
+        with self._lock:
+            if len(self._free) < self.size and buffer.__alloc__() <= self.max_buffer_bytes:
+                self._free.append(buffer)
+
+    @contextmanager
+    def borrow(self) -> Iterator[bytearray]:
+        """ Context manager form of acquire() and release(). """
+        buffer = self.acquire()
+        try:
+            yield buffer
+        finally:
+            self.release(buffer)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"allocations": self.allocations, "reuses": self.reuses, "free": len(self._free)}
+
+class BufferReader(io.RawIOBase):
+    """
+    Read-only, seekable file object over a bytes-like object, without copying it.
+
+    io.BytesIO copies a bytearray or memoryview it is given; pygame only needs
+    read/seek/tell, so this serves them straight from a memoryview of the buffer.
+    Close the reader before the buffer is modified or released.
+    """
+
+    def __init__(self, data):
+        super().__init__()
+        self._view = memoryview(data).cast("B")
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        count = min(len(target), len(self._view) - self._position)
+        if count <= 0:
+            return 0
+        target[:count] = self._view[self._position:self._position + count]
+        self._position += count
+        return count
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = len(self._view) + offset
+        else:
+            raise ValueError(f"invalid whence ({whence})")
+        if position < 0:
+            raise ValueError("negative seek position")
+        self._position = position
+        return position
+
+    def tell(self) -> int:
+        return self._position
+
+    def close(self) -> None:
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+audio_buffers = BufferPool()
@@ -0,0 +1,230 @@
+from typing import Iterator, List, NamedTuple, Optional
+
+# Bitrate tables in kbps, indexed by the 4-bit bitrate index of the frame header.
+# Index 0 is "free format" and index 15 is invalid, both are rejected.
+BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+SAMPLE_RATES = {
+    1: (44100, 48000, 32000),    # MPEG-1
+    2: (22050, 24000, 16000),    # MPEG-2
+    25: (11025, 12000, 8000),    # MPEG-2.5
+}
+
+ID3V2_HEADER_SIZE = 10
+MIN_VALID_FRAMES = 2  # A single header-like byte pattern is easy to hit by chance; a chain is not
+
+class FrameHeader(NamedTuple):
+    """ Decoded fields of a single MPEG audio frame header. """
+    version: int
+    layer: int
+    bitrate: int
+    sample_rate: int
+    padding: int
+    frame_length: int
+    samples: int
+
+    @property
+    def duration(self) -> float:
+        """ Playback duration of the frame in seconds. """
+        return self.samples / self.sample_rate
+
+def parse_frame_header(data, offset: int = 0) -> Optional[FrameHeader]:
+    """
+    Parses the 4-byte MPEG audio frame header at the given offset.
+
+    Args:
+        data: Bytes-like object containing the audio stream.
+        offset (int): Position of the candidate frame sync.
+
+    Returns:
+        FrameHeader: The decoded header, or None if the bytes are not a valid header.
+    """
+    if offset + 4 > len(data):
+        return None
+
+    b1, b2, b3 = data[offset + 1], data[offset + 2], data[offset + 3]
+    if data[offset] != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+
+    version_bits = (b1 >> 3) & 0x03
+    layer_bits = (b1 >> 1) & 0x03
+    bitrate_index = (b2 >> 4) & 0x0F
+    sample_rate_index = (b2 >> 2) & 0x03
+    padding = (b2 >> 1) & 0x01
+
+    if version_bits == 0b01 or layer_bits == 0b00:
+        return None
+    if bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    # Emphasis value 2 is reserved
+    if b3 & 0x03 == 0b10:
+        return None
+
+    version = {0b00: 25, 0b10: 2, 0b11: 1}[version_bits]
+    layer = 4 - layer_bits
+    bitrate = BITRATES[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][sample_rate_index]
+
+    if layer == 1:
+        samples = 384
+        frame_length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 576 if layer == 3 and version != 1 else 1152
+        frame_length = (samples // 8) * bitrate // sample_rate + padding
+
+    return FrameHeader(version, layer, bitrate, sample_rate, padding, frame_length, samples)
+
+def id3v2_tag_size(data) -> Optional[int]:
+    """
+    Returns the total size of a leading ID3v2 tag.
+
+    Args:
+        data: Bytes-like object starting at the beginning of the stream.
+
+    Returns:
+        int: Size of the tag in bytes (0 if there is no tag), or None if more data is needed to tell.
+    """
+    if len(data) < 3:
+        return None if bytes(data) == b"ID3"[:len(data)] else 0
+    if bytes(data[:3]) != b"ID3":
+        return 0
+    if len(data) < ID3V2_HEADER_SIZE:
+        return None
+
+    # Tag size is a 28-bit "synchsafe" integer (7 bits per byte)
+    size = 0
+    for byte in data[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = ID3V2_HEADER_SIZE if data[5] & 0x10 else 0
+    return ID3V2_HEADER_SIZE + size + footer
+
+class FrameSplitter:
+    """
+    Incrementally splits a byte stream into whole MPEG audio frames.
+
+    Bytes can be fed in arbitrarily sized chunks, as they arrive from the network.
+    A leading ID3v2 tag is skipped, and garbage between frames is dropped by
+    re-synchronising on the next valid frame header.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._tag_skipped = False
+        self.frames = 0
+        self.skipped_bytes = 0
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """
+        Adds a chunk of stream data and returns every frame it completed.
+
+        Args:
+            chunk (bytes): Next piece of the audio stream.
+
+        Returns:
+            List[bytes]: Complete frames, in stream order.
+        """
+        self._buffer.extend(chunk)
+        return list(self._drain())
+
+    def _drain(self) -> Iterator[bytes]:
+        buffer = self._buffer
+
+        if not self._tag_skipped:
+            tag_size = id3v2_tag_size(buffer)
+            if tag_size is None or tag_size > len(buffer):
+                return
+            del buffer[:tag_size]
+            self.skipped_bytes += tag_size
+            self._tag_skipped = True
+
+        position = 0
+        while True:
+            sync = buffer.find(b"\xff", position)
+            if sync < 0:
+                self.skipped_bytes += len(buffer) - position
+                position = len(buffer)
+                break
+            if sync + 4 > len(buffer):
+                self.skipped_bytes += sync - position
+                position = sync
+                break
+
+            header = parse_frame_header(buffer, sync)
+            if header is None:
+                self.skipped_bytes += sync + 1 - position
+                position = sync + 1
+                continue
+            if sync + header.frame_length > len(buffer):
+                self.skipped_bytes += sync - position
+                position = sync
+                break
+
+            self.skipped_bytes += sync - position
+            end = sync + header.frame_length
+            self.frames += 1
+            yield bytes(buffer[sync:end])
+            position = end
+
+        del buffer[:position]
+
+def iter_frames(data) -> Iterator[FrameHeader]:
+    """
+    Walks every frame header in a complete in-memory MPEG audio stream.
+
+    Args:
+        data: Bytes-like object holding the whole stream.
+
+    Yields:
+        FrameHeader: Each frame header in order.
+    """
+    offset = id3v2_tag_size(data) or 0
+    while offset + 4 <= len(data):
+        header = parse_frame_header(data, offset)
+        if header is None:
+            offset += 1
+            continue
+        yield header
+        offset += header.frame_length
+
+class StreamInfo(NamedTuple):
+    """ Summary of a complete in-memory MPEG audio stream. """
+    frames: int
+    duration: float
+    audio_bytes: int  # Bytes covered by whole frames, excluding tags and trailing data
+
+def probe_stream(data, min_frames: int = MIN_VALID_FRAMES) -> Optional[StreamInfo]:
+    """
+    Checks that data is a playable MPEG audio stream by walking its frame headers.
+
+    Frames must follow each other back to back from the start (after an optional
+    ID3v2 tag); the walk stops at the first byte that is not a valid header, such
+    as an ID3v1 trailer or a truncated last frame.
+
+    Args:
+        data: Bytes-like object holding the whole stream.
+        min_frames (int): Minimum number of chained frames for the stream to count as audio.
+
+    Returns:
+        StreamInfo: Frame count and duration, or None if the data is not valid audio.
+    """
+    offset = id3v2_tag_size(data) or 0
+    start = offset
+    frames = 0
+    duration = 0.0
+    while True:
+        header = parse_frame_header(data, offset)
+        if header is None or offset + header.frame_length > len(data):
+            break
+        frames += 1
+        duration += header.duration
+        offset += header.frame_length
+    if frames < min_frames:
+        return None
+    return StreamInfo(frames, duration, offset - start)
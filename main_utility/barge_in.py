@@ -0,0 +1,76 @@
+import logging
+import threading
+import time
+from typing import Callable, Optional
+from config import config
+from main_utility.capture import EnergyVAD, frame_rms
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+BARGE_IN = getattr(config, "BARGE_IN", False)
+BARGE_IN_FRAMES = 6  # ~180 ms of sustained speech before the reply is cut off
+BARGE_IN_ENERGY_RATIO = 1.5  # Speech must be this much louder than the VAD threshold, so echo rarely triggers it
+
+class BargeInDetector:
+    """
+    Watches the capture stream while the assistant is replying and fires when the user talks over it.
+
+    Registered as a BackgroundCapture frame listener. Between arm() and disarm() every
+    frame the VAD marks as speech is also checked against a raised energy threshold
+    (the assistant's own voice leaking into the microphone is usually quieter than the
+    user); after min_frames consecutive loud speech frames on_barge_in is called once,
+    with the time.monotonic() of the first of them. The frames themselves keep flowing
+    into the capture's segmenter, so the interrupting phrase is still recognized.
+
+    Args:
+        vad (EnergyVAD): The capture's detector, whose threshold tracks the room.
+        on_barge_in: Called on the capture thread as on_barge_in(onset_at); must return quickly.
+        min_frames (int): Consecutive loud speech frames needed to fire.
+        energy_ratio (float): Multiplier on the VAD threshold while armed.
+    """
+
+    def __init__(self, vad: EnergyVAD, on_barge_in: Callable[[float], None], min_frames: int = BARGE_IN_FRAMES,
+                 energy_ratio: float = BARGE_IN_ENERGY_RATIO):
+        self.vad = vad
+        self.on_barge_in = on_barge_in
+        self.min_frames = min_frames
+        self.energy_ratio = energy_ratio
+        self.detections = 0
+        self._armed = threading.Event()
+        self._run = 0
+        self._onset_at: Optional[float] = None
+
+    @property
+    def armed(self) -> bool:
+        return self._armed.is_set()
+
+    def arm(self) -> None:
+        """ Starts watching; call when a reply begins. """
+        self._run = 0
+        self._onset_at = None
+        self._armed.set()
+
+    def disarm(self) -> None:
+        """ Stops watching; call when the reply has been played or cancelled. """
+        self._armed.clear()
+
+    def process_frame(self, frame: bytes, is_speech: bool) -> None:
+        """ Frame listener for BackgroundCapture. """
+        if not self._armed.is_set():
+            return
+        if not is_speech or frame_rms(frame) < self.vad.threshold * self.energy_ratio:
+            self._run = 0
+            self._onset_at = None
+            return
+        if self._run == 0:
+            self._onset_at = time.monotonic()
+        self._run += 1
+        if self._run >= self.min_frames:
+            self._armed.clear()  # Fire once per reply
+            self.detections += 1
+            logging.info("User started speaking over the reply.")
+            self.on_barge_in(self._onset_at)
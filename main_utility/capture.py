@@ -0,0 +1,371 @@
+import array
+import logging
+import math
+import queue
+import sys
+import threading
+import time
+import wave
+from collections import deque
+from typing import Callable, List, NamedTuple, Optional
+import speech_recognition as sr
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2  # 16-bit PCM
+FRAME_SAMPLES = 480  # 30 ms frames at 16 kHz
+RING_BUFFER_SECONDS = 10
+PRE_ROLL_FRAMES = 10  # Audio kept from before speech onset so first syllables are not clipped
+SPEECH_START_FRAMES = 3
+SPEECH_END_FRAMES = 25  # ~750 ms of silence ends an utterance
+MAX_UTTERANCE_SECONDS = 30
+UTTERANCE_QUEUE_SIZE = 8
+
+def frame_rms(frame: bytes) -> float:
+    """
+    Computes the root-mean-square energy of a 16-bit little-endian PCM frame.
+
+    Args:
+        frame (bytes): Raw PCM samples.
+
+    Returns:
+        float: RMS energy of the frame.
+    """
+    samples = array.array('h', frame[:len(frame) - len(frame) % 2])
+    if not samples:
+        return 0.0
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+
+class MicrophoneSource:
+    """ Reads fixed-size PCM frames from the default (or given) microphone. """
+
+    def __init__(self, device_index: Optional[int] = None, sample_rate: int = SAMPLE_RATE,
+                 frame_samples: int = FRAME_SAMPLES):
+        self.sample_rate = sample_rate
+        self.sample_width = SAMPLE_WIDTH
+        self.frame_samples = frame_samples
+        self._microphone = sr.Microphone(device_index=device_index, sample_rate=sample_rate, chunk_size=frame_samples)
+        self._source = None
+
+    def open(self) -> None:
+        self._source = self._microphone.__enter__()
+        self.sample_width = self._source.SAMPLE_WIDTH
+
+    def read(self) -> bytes:
+        return self._source.stream.read(self.frame_samples)
+
+    def close(self) -> None:
+        if self._source is not None:
+            self._microphone.__exit__(None, None, None)
+            self._source = None
+
+class WavFileSource:
+    """
+    Reads PCM frames from a WAV file, so capture can run without a microphone.
+
+    With realtime=True frames are paced at the file's sample rate, like a live device.
+    read() returns b"" once the file is exhausted.
+    """
+
+    def __init__(self, path: str, frame_samples: int = FRAME_SAMPLES, realtime: bool = False):
+        self.path = path
+        self.frame_samples = frame_samples
+        self.realtime = realtime
+        self._wav = None
+        self._next_frame_at = 0.0
+        with wave.open(path, 'rb') as wav:
+            if wav.getnchannels() != 1 or wav.getsampwidth() != SAMPLE_WIDTH:
+                raise ValueError(f"{path} must be 16-bit mono PCM.")
+            self.sample_rate = wav.getframerate()
+            self.sample_width = wav.getsampwidth()
+
+    def open(self) -> None:
+        self._wav = wave.open(self.path, 'rb')
+        self._next_frame_at = time.monotonic()
+
+    def read(self) -> bytes:
+        if self.realtime:
+            delay = self._next_frame_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._next_frame_at += self.frame_samples / self.sample_rate
+        return self._wav.readframes(self.frame_samples)
+
+    def close(self) -> None:
+        if self._wav is not None:
+            self._wav.close()
+            self._wav = None
+
+class Utterance(NamedTuple):
+    """ A segment of speech cut out of the capture stream. """
+    audio: sr.AudioData
+    started_at: float
+    ended_at: float
+
+class EnergyVAD:
+    """
+    Energy-based voice activity detector with an adaptive noise floor.
+
+    A frame is speech when its RMS exceeds both min_energy and the tracked noise
+    floor times ratio. The noise floor follows non-speech frames with an
+    exponential moving average, so the detector adapts to a changing room.
+    """
+
+    def __init__(self, min_energy: float = 300.0, ratio: float = 3.0, adaptation: float = 0.05):
+        self.min_energy = min_energy
+        self.ratio = ratio
+        self.adaptation = adaptation
+        self.noise_floor = None
+
+    @property
+    def threshold(self) -> float:
+        if self.noise_floor is None:
+            return self.min_energy
+        return max(self.min_energy, self.noise_floor * self.ratio)
+
+    def is_speech(self, frame: bytes) -> bool:
+        """
+        Classifies a frame and updates the noise floor if it is not speech.
+
+        Args:
+            frame (bytes): Raw PCM samples.
+
+        Returns:
+            bool: True if the frame contains speech.
+        """
+        energy = frame_rms(frame)
+        speech = energy > self.threshold
+        if not speech:
+            if self.noise_floor is None:
+                self.noise_floor = energy
+            else:
+                self.noise_floor += self.adaptation * (energy - self.noise_floor)
+        return speech
+
+class UtteranceSegmenter:
+    """
+    Cuts a stream of frames into utterances using voice activity decisions.
+
+    An utterance starts after start_frames consecutive speech frames (plus pre-roll)
+    and ends after end_frames consecutive silent frames, or when it reaches max_frames.
+    """
+
+    def __init__(self, start_frames: int = SPEECH_START_FRAMES, end_frames: int = SPEECH_END_FRAMES,
+                 max_frames: int = 1000, pre_roll_frames: int = PRE_ROLL_FRAMES):
+        self.start_frames = start_frames
+        self.end_frames = end_frames
+        self.max_frames = max_frames
+        self._pre_roll = deque(maxlen=pre_roll_frames + start_frames)
+        self._frames: List[bytes] = []
+        self._speech_run = 0
+        self._silence_run = 0
+        self.in_speech = False
+
+    def feed(self, frame: bytes, is_speech: bool) -> Optional[bytes]:
+        """
+        Adds a frame and returns the PCM of an utterance once one is complete.
+
+        Args:
+            frame (bytes): Raw PCM samples.
+            is_speech (bool): Voice activity decision for the frame.
+
+        Returns:
+            bytes: PCM data of the finished utterance, or None.
+        """
+        if not self.in_speech:
+            self._pre_roll.append(frame)
+            self._speech_run = self._speech_run + 1 if is_speech else 0
+            if self._speech_run >= self.start_frames:
+                self.in_speech = True
+                self._frames = list(self._pre_roll)
+                self._pre_roll.clear()
+                self._silence_run = 0
+            return None
+
+        self._frames.append(frame)
+        self._silence_run = 0 if is_speech else self._silence_run + 1
+        if self._silence_run >= self.end_frames or len(self._frames) >= self.max_frames:
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[bytes]:
+        """ Ends the current utterance, if any, and returns its PCM data. """
+        if not self.in_speech:
+            return None
+        # Trim the trailing silence that ended the utterance
+        frames = self._frames[:len(self._frames) - self._silence_run] if self._silence_run else self._frames
+        self._frames = []
+        self._speech_run = 0
+        self._silence_run = 0
+        self.in_speech = False
+        return b"".join(frames)
+
+class BackgroundCapture:
+    """
+    Captures audio continuously on a background thread and queues finished utterances.
+
+    Every frame is kept in a ring buffer holding the last RING_BUFFER_SECONDS of audio,
+    classified by the VAD and fed to the segmenter. Completed utterances are pushed
+    onto a bounded queue (dropping the oldest when full), so speech is not lost while
+    the assistant is talking or waiting on the language model.
+
+    Frame listeners (for example a wake-word detector) receive every frame together
+    with its voice activity decision.
+
+    Without echo cancellation the assistant's own voice is captured too. The
+    conversation engine drops utterances that lie entirely inside its playback, but
+    continuous capture still works best with headphones.
+    """
+
+    def __init__(self, source=None, vad: Optional[EnergyVAD] = None, queue_size: int = UTTERANCE_QUEUE_SIZE):
+        self.source = source if source is not None else MicrophoneSource()
+        self.vad = vad if vad is not None else EnergyVAD()
+        frame_seconds = self.source.frame_samples / self.source.sample_rate
+        self.segmenter = UtteranceSegmenter(max_frames=int(MAX_UTTERANCE_SECONDS / frame_seconds))
+        self.ring_buffer = deque(maxlen=int(RING_BUFFER_SECONDS / frame_seconds))
+        self.utterances = queue.Queue(maxsize=queue_size)
+        self.frames_read = 0
+        self.dropped_utterances = 0
+        self._frame_listeners: List[Callable[[bytes, bool], None]] = []
+        self._stop_event = threading.Event()
+        self._finished = threading.Event()
+        self._thread = None
+        self._utterance_started_at = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def add_frame_listener(self, listener: Callable[[bytes, bool], None]) -> None:
+        """
+        Registers a callback invoked on the capture thread for every frame.
+
+        Args:
+            listener: Called as listener(frame, is_speech). It must return quickly.
+        """
+        self._frame_listeners.append(listener)
+
+    def remove_frame_listener(self, listener: Callable[[bytes, bool], None]) -> None:
+        self._frame_listeners.remove(listener)
+
+    def start(self) -> None:
+        """ Opens the source and starts the capture thread. """
+        if self._thread is not None:
+            return
+        self.source.open()
+        self._stop_event.clear()
+        self._finished.clear()
+        self._thread = threading.Thread(target=self._run, name="background-capture", daemon=True)
+        self._thread.start()
+        logging.info("Background capture started.")
+
+    def stop(self) -> None:
+        """ Stops the capture thread and closes the source. """
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        self.source.close()
+        logging.info("Background capture stopped.")
+
+    @property
+    def finished(self) -> bool:
+        """ True once the source is exhausted (file sources) or capture was stopped. """
+        return self._finished.is_set()
+
+    def next_utterance(self, timeout: Optional[float] = None) -> Utterance:
+        """
+        Waits for the next captured utterance.
+
+        Args:
+            timeout (float, optional): Maximum wait time in seconds.
+
+        Returns:
+            Utterance: The oldest queued utterance.
+
+        Raises:
+            sr.WaitTimeoutError: If no utterance arrives in time, or the source is exhausted.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = 0.1 if deadline is None else min(0.1, deadline - time.monotonic())
+            if wait <= 0:
+                raise sr.WaitTimeoutError("listening timed out while waiting for an utterance")
+            try:
+                return self.utterances.get(timeout=wait)
+            except queue.Empty:
+                if self.finished and self.utterances.empty():
+                    raise sr.WaitTimeoutError("capture source is exhausted")
+
+    def clear(self) -> None:
+        """ Discards every queued utterance. """
+        while True:
+            try:
+                self.utterances.get_nowait()
+            except queue.Empty:
+                return
+
+    def _run(self) -> None:
+        try:
+            while not self._stop_event.is_set():
+                frame = self.source.read()
+                if not frame:
+                    break
+                self.process_frame(frame)
+            self._emit(self.segmenter.flush())
+        except Exception:
+            logging.exception("Background capture failed.")
+        finally:
+            self._finished.set()
+
+    def process_frame(self, frame: bytes) -> None:
+        """
+        Runs one frame through the ring buffer, VAD, listeners and segmenter.
+
+        Args:
+            frame (bytes): Raw PCM samples.
+        """
+        self.frames_read += 1
+        self.ring_buffer.append(frame)
+        is_speech = self.vad.is_speech(frame)
+
+        for listener in self._frame_listeners:
+            try:
+                listener(frame, is_speech)
+            except Exception:
+                logging.exception("Frame listener failed.")
+
+        was_in_speech = self.segmenter.in_speech
+        pcm = self.segmenter.feed(frame, is_speech)
+        if self.segmenter.in_speech and not was_in_speech:
+            self._utterance_started_at = time.monotonic()
+        self._emit(pcm)
+
+    def _emit(self, pcm: Optional[bytes]) -> None:
+        if not pcm:
+            return
+        audio = sr.AudioData(pcm, self.source.sample_rate, self.source.sample_width)
+        utterance = Utterance(audio, self._utterance_started_at or time.monotonic(), time.monotonic())
+        while True:
+            try:
+                self.utterances.put_nowait(utterance)
+                break
+            except queue.Full:
+                try:
+                    self.utterances.get_nowait()
+                    self.dropped_utterances += 1
+                    logging.warning("Utterance queue full; dropped the oldest utterance.")
+                except queue.Empty:
+                    pass
+        logging.info(f"Captured utterance of {len(pcm) / (self.source.sample_rate * self.source.sample_width):.2f}s.")
@@ -1,6 +1,8 @@
-import json
 import logging
-from typing import List, Dict, Optional
+import queue
+import threading
+from typing import Callable, List, Dict, NamedTuple, Optional
+from main_utility.tracing import traced
 
 # Configure logging
 logging.basicConfig(
@@ -9,75 +11,204 @@ logging.basicConfig(
 )
 
 CHAT_HISTORY_ID = 1
+MESSAGES_TABLE = "chat_messages"
+TURNS_TABLE = "chat_turns"
+SUMMARIES_TABLE = "chat_summaries"
+HISTORY_LIMIT = 200  # Most recent messages loaded per turn
+WRITE_QUEUE_SIZE = 64
 
-def load_chat_history(cursor, table: str, record_id: int = 1) -> List[Dict[str, str]]:
+class ChatTurn(NamedTuple):
+    """ One exchange between the user and the assistant, persisted as a unit. """
+    user_content: str
+    assistant_content: str
+    record_id: int = CHAT_HISTORY_ID
+    language: Optional[str] = None
+    metadata: Optional[dict] = None
+
+def load_chat_history(storage, record_id: int = 1, limit: Optional[int] = HISTORY_LIMIT,
+                      before_seq: Optional[int] = None, with_seq: bool = False) -> List[Dict[str, str]]:
     """
-    Loads the chat history from a specified table and record ID.
-    
+    Loads a range of a conversation's messages, oldest first.
+
     Args:
-        cursor: Database cursor to execute SQL queries.
-        table (str): Table name to fetch history from.
-        record_id (int): Record ID to identify the chat history entry.
+        storage (Storage): Storage backend to read from.
+        record_id (int): Conversation ID.
+        limit (int, optional): Maximum number of (most recent) messages to load; None loads everything.
+        before_seq (int, optional): Only load messages with a sequence number below this one.
+        with_seq (bool): Include each message's sequence number under "seq".
 
     Returns:
-        List[Dict[str, str]]: Parsed chat history as a list of dictionary entries.
+        List[Dict[str, str]]: Messages as {"role", "content"} dictionaries.
     """
     try:
-        query = f"SELECT history FROM {table} WHERE id = %s"
-        cursor.execute(query, (record_id,))
-        result = cursor.fetchone()
-        
-        if result is None or not result[0]:
-            logging.info(f"No chat history found in {table} for record ID {record_id}.")
+        rows = storage.load_messages(record_id, limit, before_seq)
+
+        if not rows:
+            logging.info(f"No chat history found in {storage.name} storage for conversation {record_id}.")
             return []
-        
-        return json.loads(result[0])
-    
+
+        return [to_message(row, with_seq) for row in rows]
+
     except Exception as e:
-        logging.exception(f"Failed to load chat history from {table}.")
+        logging.exception(f"Failed to load chat history from {storage.name} storage.")
         return []
 
-def add_chat_entry(role: str, content: str, db, cursor, table: str, record_id: int = 1):
+def load_chat_range(storage, record_id: int, after_seq: int, before_seq: int, limit: int) -> List[Dict]:
+    """
+    Loads the oldest messages between two sequence numbers (exclusive), oldest first.
+
+    Args:
+        storage (Storage): Storage backend to read from.
+        record_id (int): Conversation ID.
+        after_seq (int): Load messages with a sequence number above this one.
+        before_seq (int): Load messages with a sequence number below this one.
+        limit (int): Maximum number of messages to load.
+
+    Returns:
+        List[Dict]: Messages with "seq", "role" and "content".
+    """
+    rows = storage.load_message_range(record_id, after_seq, before_seq, limit)
+    return [to_message(row, with_seq=True) for row in rows]
+
+def to_message(row, with_seq: bool = False) -> Dict:
+    """ Converts a (seq, role, content) row to a chat message dictionary. """
+    seq, role, content = row
+    message = {"role": role, "content": content}
+    if with_seq:
+        message["seq"] = seq
+    return message
+
+def load_summary(storage, record_id: int = CHAT_HISTORY_ID):
+    """
+    Loads the rolling summary of a conversation.
+
+    Args:
+        storage (Storage): Storage backend to read from.
+        record_id (int): Conversation ID.
+
+    Returns:
+        tuple: (summary text, sequence number of the last summarized message), or ("", 0) if none exists.
+    """
+    try:
+        result = storage.load_summary(record_id)
+        return (result[0], result[1]) if result else ("", 0)
+    except Exception as e:
+        logging.exception(f"Failed to load summary for conversation {record_id}.")
+        return "", 0
+
+def save_summary(storage, summary: str, through_seq: int, record_id: int = CHAT_HISTORY_ID) -> None:
+    """
+    Stores the rolling summary of a conversation.
+
+    Args:
+        storage (Storage): Storage backend to write to.
+        summary (str): Summary of every message up to through_seq.
+        through_seq (int): Sequence number of the last summarized message.
+        record_id (int): Conversation ID.
+    """
+    storage.save_summary(record_id, summary, through_seq)
+
+@traced("persist")
+def add_chat_entry(role: str, content: str, storage, record_id: int = 1):
     """
-    Adds a new chat entry to the specified chat history table.
-    
+    Appends a message to a conversation.
+
     Args:
         role (str): The role of the participant (e.g., "user", "assistant").
         content (str): The content of the chat message.
-        db: Database connection object.
-        cursor: Database cursor to execute SQL queries.
-        table (str): Table name to update history.
-        record_id (int): Record ID to identify the chat history entry.
+        storage (Storage): Storage backend to write to.
+        record_id (int): Conversation ID.
     """
     try:
-        # Load existing history
-        query = f"SELECT history FROM {table} WHERE id = %s"
-        cursor.execute(query, (record_id,))
-        result = cursor.fetchone()
-        
-        parsed_history = json.loads(result[0]) if result and result[0] else []
-        
-        # Add new entry to history
-        new_entry = {"role": role, "content": content}
-        parsed_history.append(new_entry)
-        
-        # Update history back in the database
-        update_query = f"""
-            UPDATE {table}
-            SET history = %s
-            WHERE id = %s;
-        """
-        cursor.execute(update_query, (json.dumps(parsed_history), record_id))
-        db.commit()
-        
-        logging.info(f"New chat entry added to {table} for record ID {record_id}.")
-    
+        storage.append_message(record_id, role, content)
+        logging.info(f"New chat entry added to {storage.name} storage for conversation {record_id}.")
+
+    except Exception as e:
+        logging.exception(f"Failed to add chat entry to {storage.name} storage.")
+
+@traced("persist")
+def save_chat_turn(turn: ChatTurn, storage) -> bool:
+    """
+    Saves both messages of a turn and its metadata in a single transaction.
+
+    Args:
+        turn (ChatTurn): The exchange to save.
+        storage (Storage): Storage backend to write to.
+
+    Returns:
+        bool: True if the turn was committed.
+    """
+    try:
+        storage.save_turn(turn)
+        logging.info(f"Chat turn saved for conversation {turn.record_id}.")
+        return True
+
     except Exception as e:
-        logging.exception(f"Failed to add chat entry to {table}.")
+        logging.exception(f"Failed to save chat turn for conversation {turn.record_id}.")
+        return False
+
+class ChatWriter:
+    """
+    Write-behind persistence of chat turns on a background thread.
+
+    Turns are queued (blocking the caller only when max_pending turns are already
+    waiting) and saved with save_chat_turn. close() flushes the queue. A turn that
+    fails to save is handed to the on_failure callback it was submitted with.
+
+    Args:
+        storage (Storage): Storage backend to write to.
+    """
+
+    def __init__(self, storage, max_pending: int = WRITE_QUEUE_SIZE):
+        self._storage = storage
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="chat-writer", daemon=True)
+        self.written = 0
+        self.failed = 0
+        self._thread.start()
+
+    def submit(self, turn: ChatTurn, on_failure: Optional[Callable[[ChatTurn], None]] = None) -> None:
+        """
+        Queues a turn for saving.
+
+        Args:
+            turn (ChatTurn): The exchange to save.
+            on_failure (callable, optional): Called with the turn, on the writer thread, if it is not saved.
+        """
+        self._queue.put((turn, on_failure))
+
+    def flush(self) -> None:
+        """ Waits until every queued turn has been saved. """
+        self._queue.join()
+
+    def close(self) -> None:
+        """ Saves the remaining turns and stops the writer thread. """
+        self._queue.put(None)
+        self._thread.join()
+        logging.info(f"Chat writer closed; {self.written} turns written, {self.failed} failed.")
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                turn, on_failure = item
+                if save_chat_turn(turn, self._storage):
+                    self.written += 1
+                    continue
+                self.failed += 1
+                if on_failure is not None:
+                    try:
+                        on_failure(turn)
+                    except Exception as e:
+                        logging.error(f"Chat writer failure callback raised: {e}")
+            finally:
+                self._queue.task_done()
 
 # Usage examples
-def load_main_chat_history(cursor) -> List[Dict[str, str]]:
-    return load_chat_history(cursor, "chat_history", CHAT_HISTORY_ID)
+def load_main_chat_history(storage) -> List[Dict[str, str]]:
+    return load_chat_history(storage, CHAT_HISTORY_ID)
 
-def add_main_chat_entry(role: str, content: str, db, cursor):
-    add_chat_entry(role, content, db, cursor, "chat_history", CHAT_HISTORY_ID)
\ No newline at end of file
+def add_main_chat_entry(role: str, content: str, storage):
+    add_chat_entry(role, content, storage, CHAT_HISTORY_ID)
@@ -0,0 +1,136 @@
+import logging
+import threading
+from functools import lru_cache
+from typing import Callable, Dict, List, NamedTuple, Optional
+from main_utility.chatHistory import load_chat_range, load_summary, save_summary, CHAT_HISTORY_ID
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+CONTEXT_TOKEN_BUDGET = 1500  # Tokens of recent history sent verbatim
+SUMMARY_BATCH = 40  # Messages folded into the summary per background update
+MIN_UNSUMMARIZED = 6  # Older messages that must pile up before the summary is updated
+MESSAGE_OVERHEAD_TOKENS = 4  # Role and separators added per message
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    """
+    Estimates the number of tokens in a text.
+
+    Uses ~4 UTF-8 bytes per token, which tracks the Cohere tokenizer closely enough
+    for budgeting in both English and Hindi. Results are cached per message text.
+
+    Args:
+        text (str): Message content.
+
+    Returns:
+        int: Estimated token count.
+    """
+    return max(1, len(text.encode("utf-8")) // 4) + MESSAGE_OVERHEAD_TOKENS
+
+class Context(NamedTuple):
+    """ What a chat request should carry instead of the full transcript. """
+    messages: List[Dict[str, str]]
+    summary: str
+    history_tokens: int
+    first_seq: Optional[int] = None  # seq of the oldest verbatim message, if the history carried seqs
+
+class ContextBuilder:
+    """
+    Keeps the most recent history verbatim within a token budget and folds older
+    messages into a stored rolling summary.
+
+    build() is cheap and runs on the conversation thread. When enough messages have
+    fallen out of the verbatim window without being summarized, a background thread
+    (through the thread-safe storage) loads up to SUMMARY_BATCH of them, asks the
+    summarizer to merge them into the previous summary and stores the result.
+
+    Args:
+        storage (Storage): Storage backend holding the messages and the summary.
+        summarize: Called as summarize(previous_summary, messages) and returns the new summary.
+    """
+
+    def __init__(self, storage, summarize: Callable[[str, List[Dict]], str],
+                 record_id: int = CHAT_HISTORY_ID, budget_tokens: int = CONTEXT_TOKEN_BUDGET):
+        self._storage = storage
+        self._summarize = summarize
+        self.record_id = record_id
+        self.budget_tokens = budget_tokens
+        self.summary = ""
+        self.through_seq = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def load(self) -> None:
+        """ Reads the stored summary once. """
+        if not self._loaded:
+            self.summary, self.through_seq = load_summary(self._storage, self.record_id)
+            self._loaded = True
+
+    def build(self, history: List[Dict]) -> Context:
+        """
+        Selects the recent messages to send verbatim and schedules summarization of older ones.
+
+        Args:
+            history (list): Recent messages, oldest first, each with "seq", "role" and "content".
+
+        Returns:
+            Context: Verbatim messages (without "seq"), the current summary and their token count.
+        """
+        recent = []
+        used = 0
+        for message in reversed(history):
+            tokens = count_tokens(message["content"])
+            if recent and used + tokens > self.budget_tokens:
+                break
+            recent.append(message)
+            used += tokens
+        recent.reverse()
+
+        first_seq = recent[0].get("seq") if recent else None
+        if first_seq is not None:
+            self._schedule_summary(first_seq)
+
+        with self._lock:
+            summary = self.summary
+        messages = [{"role": message["role"], "content": message["content"]} for message in recent]
+        return Context(messages, summary, used, first_seq)
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """ Waits for a running summary update to finish. """
+        worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+
+    def _schedule_summary(self, window_start_seq: int) -> None:
+        with self._lock:
+            if window_start_seq - 1 - self.through_seq < MIN_UNSUMMARIZED:
+                return
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(
+                target=self._update_summary, args=(window_start_seq,), name="context-summary", daemon=True
+            )
+            self._worker.start()
+
+    def _update_summary(self, window_start_seq: int) -> None:
+        try:
+            messages = load_chat_range(self._storage, self.record_id, self.through_seq, window_start_seq, SUMMARY_BATCH)
+            if not messages:
+                return
+
+            summary = self._summarize(self.summary, messages)
+            if not summary:
+                return
+            through_seq = messages[-1]["seq"]
+            save_summary(self._storage, summary, through_seq, self.record_id)
+
+            with self._lock:
+                self.summary, self.through_seq = summary, through_seq
+            logging.info(f"Rolling summary updated through message {through_seq}.")
+        except Exception:
+            logging.exception("Failed to update the rolling conversation summary.")
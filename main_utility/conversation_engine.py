@@ -0,0 +1,546 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, NamedTuple, Optional
+import speech_recognition as sr
+from utils.AI_Response import summarize_conversation, embed_texts, co
+from main_utility.chatHistory import ChatTurn, ChatWriter
+from main_utility.context_window import ContextBuilder
+from main_utility.session_state import SessionState
+from main_utility.memory_index import MemoryIndex
+from main_utility.language import get_or_select_language
+from main_utility.listening import ListeningSession
+from main_utility.capture import BackgroundCapture
+from main_utility.speaking import (fetch_audio, play_audio_bytes, play_sound, stop_playback, get_cached_audio,
+                                   prewarm_cache, prefetcher)
+from main_utility.prefetch import PrefetchScheduler, PreparedAudio
+from main_utility.speech_pipeline import SentenceSplitter, MAX_PENDING_AUDIO
+from main_utility.wake_word import KeywordSpotter, WAKE_PHRASE, SLEEP_PHRASE
+from main_utility.barge_in import BargeInDetector, BARGE_IN
+from main_utility.earcons import earcons, is_spoken, PROMPT_EARCONS
+from main_utility.http_client import http_client
+from main_utility.reply_stream import ChatStream, in_thread, prepare_messages
+from main_utility.tracing import current_turn, new_turn_id, span, tracer
+from main_utility import prompts
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+STAGE_QUEUE_SIZE = 2  # Captured phrases and transcripts waiting for the next stage
+MAX_PENDING_SENTENCES = 8
+TURN_QUEUE_SIZE = 16
+POLL_SECONDS = 1  # Blocking waits wake up this often so the engine can stop and check timeouts
+PHRASE_TIME_LIMIT = 30
+SESSION_TIMEOUT = 3600  # Seconds of inactivity before the assistant goes back to sleep
+ENGINE_THREADS = 12  # Blocking calls (microphone, network, playback, database) run on these
+# A phrase captured while the assistant was speaking is taken for its own voice unless barge-in fired
+# during it. Playback windows closer together than this are merged, and a phrase ending this long after
+# playback stopped still counts as inside it (the segmenter's closing silence plus room reverberation).
+ECHO_TAIL_SECONDS = 1.0
+BARGE_IN_SLACK = 0.5  # Barge-in onsets up to this long before a phrase started belong to it
+
+class Heard(NamedTuple):
+    """ A transcribed phrase on its way to the dialog stage. """
+    text: str
+    ended_at: float
+    prompt: Optional[str] = None  # Prompt to speak instead, e.g. when recognition failed
+    turn_id: Optional[str] = None
+
+class TurnTimer:
+    """ Timestamps of one reply, relative to the end of the user's speech. """
+
+    def __init__(self, started_at: float, turn_id: Optional[str] = None):
+        self.started_at = started_at
+        self.id = turn_id or new_turn_id()
+        self.first_text = None
+        self.first_audio = None
+
+    def mark(self, name: str) -> None:
+        if getattr(self, name) is None:
+            setattr(self, name, time.monotonic() - self.started_at)
+
+class Speech(NamedTuple):
+    """ A sentence (or its audio) on its way to playback, tagged with the reply it belongs to. """
+    generation: int
+    payload: Any = None  # Sentence text before TTS, audio bytes after; None marks the end of a reply
+    done: Optional[asyncio.Future] = None  # Resolved once everything before it has been played
+    turn: Optional[TurnTimer] = None
+
+class ConversationEngine:
+    """
+    Runs the conversation as concurrent asyncio stages connected by bounded queues:
+
+        capture -> STT -> dialog/LLM -> TTS fetch -> playback
+                                     -> persistence
+
+    Blocking work (the microphone, recognizers, Cohere, ElevenLabs, pygame and the
+    database) runs on the engine's thread pool, so sentence N+1 is rendered while
+    sentence N plays and the reply is saved while the user is already speaking.
+    Full queues make the faster stage wait for the slower one (backpressure).
+
+    interrupt() cancels the reply in progress: the LLM stream is abandoned, queued
+    sentences and audio are dropped and playback stops. Every item carries the
+    generation of the reply it belongs to, so late results of a cancelled reply are
+    discarded. With barge_in, a BargeInDetector on the capture stream calls it as soon
+    as the user talks over a reply.
+
+    With continuous capture the microphone also hears the assistant. Phrases captured
+    entirely while a reply, prompt or cue was playing are dropped as echo, unless
+    barge-in fired during them; without barge-in, talking over the assistant is
+    therefore ignored rather than answered.
+
+    Stages and the blocking calls behind them are traced (main_utility.tracing): spans
+    of one user phrase share a turn ID, and stage_stats() returns their latency
+    percentiles.
+
+    Args:
+        storage (Storage): Storage backend for history, settings and memory.
+        continuous_capture (bool): Record in the background the whole time instead of
+            only while the assistant is idle; enables on-device wake phrase spotting.
+        write_behind (bool): Save turns on a background writer thread.
+        barge_in (bool): Interrupt the reply when the user starts talking over it.
+            Needs the microphone open during replies, so it implies continuous_capture.
+        prefetch (PrefetchScheduler): Prepares the prompts likely to be spoken next; None disables it.
+        on_turn: Called on the event loop with every finished (or interrupted) ChatTurn.
+        drop_echo (bool): Drop phrases captured during playback; disable for capture sources
+            that cannot hear the assistant, such as a WAV file.
+    """
+
+    def __init__(self, storage, continuous_capture: bool = False, write_behind: bool = False,
+                 chat_client=None, fetch: Callable[[str, str], Optional[bytes]] = fetch_audio,
+                 play: Callable[[bytes], None] = play_audio_bytes, stop: Callable[[], None] = stop_playback,
+                 session: Optional[ListeningSession] = None, spotter: Optional[KeywordSpotter] = None,
+                 memory: Optional[MemoryIndex] = None, barge_in: bool = BARGE_IN,
+                 prefetch: Optional[PrefetchScheduler] = prefetcher,
+                 on_turn: Optional[Callable[[ChatTurn], None]] = None, drop_echo: bool = True):
+        self.storage = storage
+        self.continuous = continuous_capture
+        self.chat_client = chat_client or co
+        self.fetch = fetch
+        self.play = play
+        self.stop_playback = stop
+        self.prefetch = prefetch
+        self.on_turn = on_turn
+        self.drop_echo = drop_echo
+        self.writer = ChatWriter(storage) if write_behind else None
+        self.memory = memory if memory is not None else MemoryIndex(storage, embed_texts)
+        self.state = SessionState(storage, writer=self.writer, memory=self.memory)
+        self.context_builder = ContextBuilder(storage, summarize_conversation)
+
+        if barge_in and not continuous_capture and session is None:
+            logging.info("Barge-in needs the microphone open while replying; enabling continuous capture.")
+            continuous_capture = self.continuous = True
+        capture = BackgroundCapture() if continuous_capture and session is None else None
+        self.session = session or ListeningSession(capture=capture)
+        self.spotter = spotter
+        if self.spotter is None and self.session.capture is not None:
+            self.spotter = KeywordSpotter(self.session.capture.source.sample_rate)
+            if self.spotter.load_templates():
+                self.session.capture.add_frame_listener(self.spotter.process_frame)
+            else:
+                logging.info("No keyword templates enrolled; wake phrase will be checked in the cloud.")
+                self.spotter = None
+
+        self.barge_in = None
+        if barge_in and self.session.capture is not None:
+            self.barge_in = BargeInDetector(self.session.capture.vad, self.request_interrupt)
+            self.session.capture.add_frame_listener(self.barge_in.process_frame)
+
+        self.language = None
+        self.awake = False
+        self.awake_since = 0.0
+        self.last_active_time = time.time()
+        self.interruptions = 0
+        self.echo_dropped = 0
+        self._playback_windows = deque(maxlen=32)  # (start, end) of recent playback, merged when back to back
+        self._playing_since: Optional[float] = None
+        self._barge_in_onsets = deque(maxlen=8)
+        self._generation = 0
+        self._reply_task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Event] = None
+
+    # ---- Control -------------------------------------------------------------
+
+    async def run(self) -> None:
+        """ Runs every stage until stop() is called or a stage fails. """
+        self._loop = asyncio.get_running_loop()
+        self._loop.set_default_executor(ThreadPoolExecutor(ENGINE_THREADS, thread_name_prefix="engine"))
+        self._stopped = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.audio_in = asyncio.Queue(STAGE_QUEUE_SIZE)
+        self.heard = asyncio.Queue(STAGE_QUEUE_SIZE)
+        self.sentences = asyncio.Queue(MAX_PENDING_SENTENCES)
+        self.audio_out = asyncio.Queue(MAX_PENDING_AUDIO)
+        self.turns = asyncio.Queue(TURN_QUEUE_SIZE)
+
+        # Render the spoken fixed prompts in the background so they play without a network round trip;
+        # prompts played as earcons are never rendered
+        spoken = [(text, lang) for text, lang in prompts.STATIC_PHRASES if is_spoken(text)]
+        threading.Thread(target=prewarm_cache, args=(spoken,), daemon=True).start()
+        self.memory.start()
+        self.language = await in_thread(get_or_select_language, self.storage, self.state)
+        self._expect_next()
+        await in_thread(self.context_builder.load)
+        await in_thread(self.session.open)
+
+        stages = [self._capture_stage(), self._stt_stage(), self._dialog_stage(), self._tts_stage(),
+                  self._playback_stage(), self._persist_stage()]
+        if self.spotter is not None:
+            stages.append(self._wake_stage())
+        tasks = [asyncio.create_task(stage) for stage in stages]
+        stopped = asyncio.create_task(self._stopped.wait())
+        try:
+            done, _ = await asyncio.wait([stopped, *tasks], return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task is not stopped:
+                    task.result()  # Re-raises the failure of a stage
+        finally:
+            for task in [stopped, *tasks]:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self._drain_turns()
+            await in_thread(self._shutdown)
+
+    def stop(self) -> None:
+        """ Asks a running engine to stop. Safe to call from any thread. """
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+    def interrupt(self, onset_at: Optional[float] = None) -> None:
+        """
+        Cancels the reply in progress. Must run on the engine's event loop.
+
+        Args:
+            onset_at (float, optional): time.monotonic() when the user started speaking over
+                the reply; the time from it until playback has stopped is logged.
+        """
+        self._generation += 1
+        if self._reply_task is not None and not self._reply_task.done():
+            self._reply_task.cancel()
+        for stage_queue in (self.sentences, self.audio_out):
+            while not stage_queue.empty():
+                item = stage_queue.get_nowait()
+                if item.done is not None and not item.done.done():
+                    item.done.set_result(None)
+        self.stop_playback()
+        self.interruptions += 1
+        if onset_at is not None:
+            self._barge_in_onsets.append(onset_at)  # Its phrase is a request, not echo
+        if onset_at is None:
+            logging.info("Reply interrupted.")
+            return
+        latency = time.monotonic() - onset_at
+        tracer.record("barge_in", latency)
+        logging.info(f"Reply interrupted by the user; speech onset to silence {latency * 1000:.0f} ms.")
+
+    def request_interrupt(self, onset_at: Optional[float] = None) -> None:
+        """ interrupt() for callers on other threads, e.g. a VAD frame listener. """
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self.interrupt, onset_at)
+
+    def stage_stats(self) -> Dict[str, dict]:
+        """ Returns the latency percentiles of every traced stage. """
+        return tracer.summary()
+
+    # ---- Stages --------------------------------------------------------------
+
+    async def _capture_stage(self) -> None:
+        while True:
+            if not self.continuous:
+                await self._idle.wait()  # An open microphone would record the assistant itself
+            try:
+                audio = await in_thread(self.session.capture_audio, POLL_SECONDS, PHRASE_TIME_LIMIT)
+            except sr.WaitTimeoutError:
+                continue
+            ended_at = self.session.last_speech_ended_at or time.monotonic()
+            if self.continuous and self.drop_echo and self._heard_own_voice(self.session.last_speech_started_at, ended_at):
+                self.echo_dropped += 1
+                logging.info("Dropped a phrase captured during playback as the assistant's own voice.")
+                continue
+            if not self.continuous:
+                self._idle.clear()
+            await self.audio_in.put((audio, ended_at))
+
+    async def _stt_stage(self) -> None:
+        while True:
+            audio, ended_at = await self.audio_in.get()
+            if self.spotter is not None and not self.awake:
+                continue  # Asleep with an on-device spotter: only the wake stage listens
+            turn_id = new_turn_id()  # Every span of this phrase's turn carries the ID
+            current_turn.set(turn_id)
+            text, prompt = "", None
+            with span("stage.stt"):
+                try:
+                    result = await in_thread(self.session.backend.recognize, audio)
+                    text = result.text.lower()
+                    logging.info(f"Recognized command: {text}")
+                except sr.UnknownValueError:
+                    logging.warning("Speech recognition could not understand the audio.")
+                    prompt = prompts.NOT_UNDERSTOOD
+                except sr.RequestError:
+                    logging.error("Speech recognition service is unavailable.")
+                    prompt = prompts.RECOGNITION_UNAVAILABLE
+            await self.heard.put(Heard(text, ended_at, prompt, turn_id))
+
+    async def _wake_stage(self) -> None:
+        while True:
+            detection = await in_thread(self.spotter.wait_for, WAKE_PHRASE, POLL_SECONDS)
+            if detection is None or self.awake:
+                continue
+            try:
+                result = await in_thread(self.session.backend.recognize, detection.audio)
+            except (sr.UnknownValueError, sr.RequestError):
+                logging.info("Wake phrase detection was not confirmed.")
+                continue
+            # The wake phrase was also queued as an utterance; it is not a request
+            self.session.capture.clear()
+            await self.heard.put(Heard(result.text.lower(), detection.detected_at))
+
+    async def _dialog_stage(self) -> None:
+        while True:
+            try:
+                heard = await asyncio.wait_for(self.heard.get(), POLL_SECONDS)
+            except asyncio.TimeoutError:
+                await self._check_session_timeout()
+                continue
+            try:
+                await self._check_session_timeout()
+                await self._handle(heard)
+            except Exception:
+                logging.exception("An error occurred during the conversation handling.")
+                await self._say(prompts.GENERIC_ERROR)
+            finally:
+                self._idle.set()
+
+    async def _tts_stage(self) -> None:
+        while True:
+            item = await self.sentences.get()
+            if item.payload is None or item.generation != self._generation:
+                await self.audio_out.put(item)  # End markers (and stale ones) still resolve in order
+                continue
+            current_turn.set(item.turn.id if item.turn is not None else None)
+            with span("stage.tts"):
+                audio = await in_thread(self.fetch, item.payload, self.language)
+            if audio and item.generation == self._generation:
+                await self.audio_out.put(item._replace(payload=audio))
+
+    async def _playback_stage(self) -> None:
+        while True:
+            item = await self.audio_out.get()
+            if item.payload is not None and item.generation == self._generation:
+                current_turn.set(item.turn.id if item.turn is not None else None)
+                if item.turn is not None and item.turn.first_audio is None:
+                    item.turn.mark("first_audio")
+                    tracer.record("first_audio", item.turn.first_audio)
+                with span("stage.playback"):
+                    self._playback_began(time.monotonic())
+                    try:
+                        if isinstance(item.payload, PreparedAudio):
+                            await in_thread(play_sound, item.payload.sound)
+                        else:
+                            await in_thread(self.play, item.payload)
+                    except Exception:
+                        logging.exception("Failed to play speech audio.")
+                    finally:
+                        self._playback_ended(time.monotonic())
+            if item.done is not None and not item.done.done():
+                item.done.set_result(None)
+
+    async def _persist_stage(self) -> None:
+        while True:
+            turn = await self.turns.get()
+            current_turn.set((turn.metadata or {}).get("turn_id"))
+            with span("stage.persist"):
+                try:
+                    await in_thread(self.state.save_turn, turn)
+                except Exception:
+                    logging.exception("Failed to save the chat turn.")
+
+    # ---- Dialog --------------------------------------------------------------
+
+    async def _handle(self, heard: Heard) -> None:
+        if heard.prompt and self.awake:
+            await self._say(heard.prompt)
+        if not heard.text:
+            return
+
+        # Listen only for the wake-up command while asleep
+        if not self.awake:
+            if WAKE_PHRASE in heard.text:
+                self.awake = True
+                self.awake_since = heard.ended_at
+                self.last_active_time = time.time()
+                logging.info("Assistant awakened by user.")
+                await self._say(prompts.GREETING)
+                self._expect_next()
+            return
+
+        if heard.ended_at <= self.awake_since:
+            return  # Spoken before the assistant woke up, e.g. the wake phrase itself
+
+        if SLEEP_PHRASE in heard.text:
+            await self._go_to_sleep(prompts.GOODBYE)
+            logging.info("Assistant put to sleep by user.")
+            return
+
+        self._reply_task = asyncio.create_task(self._reply(heard.text, heard.ended_at, heard.turn_id))
+        if self.barge_in is not None:
+            self.barge_in.arm()
+        try:
+            await self._reply_task
+        except asyncio.CancelledError:
+            if not self._reply_task.cancelled():
+                raise  # The dialog stage itself is being cancelled
+        finally:
+            self._reply_task = None
+            if self.barge_in is not None:
+                self.barge_in.disarm()
+        self.last_active_time = time.time()  # Reset active time after each response
+
+    async def _reply(self, user_input: str, ended_at: float, turn_id: Optional[str] = None) -> None:
+        generation = self._generation
+        turn = TurnTimer(ended_at, turn_id)
+        current_turn.set(turn.id)  # The reply runs in its own task, so this only tags its spans
+        messages = await prepare_messages(self.state, self.context_builder, self.memory, user_input, self.language)
+
+        started_at = time.monotonic()
+        chat = ChatStream(self.chat_client, messages)
+        splitter = SentenceSplitter()
+        parts = []
+        interrupted = False
+        try:
+            async for delta in chat:
+                if not parts:
+                    turn.mark("first_text")
+                    tracer.record("llm.first_text", time.monotonic() - started_at)
+                parts.append(delta)
+                for sentence in splitter.feed(delta):
+                    await self.sentences.put(Speech(generation, sentence, turn=turn))
+
+            remainder = splitter.flush()
+            if remainder:
+                await self.sentences.put(Speech(generation, remainder, turn=turn))
+            done = self._loop.create_future()
+            await self.sentences.put(Speech(generation, None, done, turn))
+            await done
+        except asyncio.CancelledError:
+            interrupted = True
+            raise
+        finally:
+            chat.close()
+            response_text = "".join(parts)
+            if response_text:
+                print("Mikasha:", response_text)
+                finished = ChatTurn(user_input, response_text, language=self.language, metadata={
+                    "first_text_ms": round(turn.first_text * 1000) if turn.first_text else None,
+                    "first_audio_ms": round(turn.first_audio * 1000) if turn.first_audio else None,
+                    "total_ms": round((time.monotonic() - ended_at) * 1000),
+                    "interrupted": interrupted,
+                    "turn_id": turn.id,
+                })
+                await self._save_turn(finished)
+                if self.on_turn is not None:
+                    self.on_turn(finished)
+            tracer.record("turn", time.monotonic() - ended_at, interrupted=interrupted)
+            logging.info(
+                f"Turn finished{' (interrupted)' if interrupted else ''}: end of speech to first text "
+                f"{(turn.first_text or 0) * 1000:.0f} ms, to first audio {(turn.first_audio or 0) * 1000:.0f} ms."
+            )
+
+    async def _save_turn(self, turn: ChatTurn) -> None:
+        # A full queue makes the reply wait for the persistence stage (backpressure) instead of writing
+        # on the event loop; shielded, so interrupting the reply again cannot drop the turn
+        if self.turns.full():
+            logging.warning("Persistence queue full; waiting for the database.")
+        await asyncio.shield(self.turns.put(turn))
+
+    async def _say(self, text: str) -> None:
+        """ Plays a fixed prompt through the playback stage and waits until it has been heard. """
+        if not is_spoken(text):
+            started_at = time.monotonic()
+            length = earcons.play(PROMPT_EARCONS[text])  # Local tone; nothing to fetch or wait for
+            if length:
+                self._playback_began(started_at)
+                self._playback_ended(started_at + length)
+            return
+        lang = self.language or 'en'
+        audio = self.prefetch.take(text, lang) if self.prefetch is not None else None
+        if audio is None:
+            audio = await in_thread(get_cached_audio, text, lang)
+        if not audio:
+            return
+        done = self._loop.create_future()
+        await self.audio_out.put(Speech(self._generation, audio, done))
+        await done
+
+    async def _go_to_sleep(self, prompt: str) -> None:
+        self.awake = False
+        if self.spotter is not None:
+            self.spotter.clear()  # Drop keywords spotted while awake
+        await self._say(prompt)
+        self._expect_next()
+
+    def _expect_next(self) -> None:
+        # Asleep, the next prompt is the greeting; awake, it is a goodbye or a request to repeat
+        if self.prefetch is None:
+            return
+        if self.awake:
+            expected = (prompts.GOODBYE, prompts.NOT_UNDERSTOOD, prompts.GENERIC_ERROR, prompts.SESSION_EXPIRED)
+        else:
+            expected = (prompts.GREETING,)
+        self.prefetch.expect((text, self.language or 'en') for text in expected if is_spoken(text))
+
+    async def _check_session_timeout(self) -> None:
+        if self.awake and time.time() - self.last_active_time > SESSION_TIMEOUT:
+            await self._go_to_sleep(prompts.SESSION_EXPIRED)
+            logging.info("Session expired due to inactivity.")
+
+    # ---- Echo ----------------------------------------------------------------
+
+    def _playback_began(self, at: float) -> None:
+        if self._playback_windows and at - self._playback_windows[-1][1] <= ECHO_TAIL_SECONDS:
+            at = self._playback_windows.pop()[0]  # Sentences of one reply form one window
+        self._playing_since = at
+
+    def _playback_ended(self, at: float) -> None:
+        if self._playing_since is not None:
+            self._playback_windows.append((self._playing_since, at))
+            self._playing_since = None
+
+    def _heard_own_voice(self, started_at: Optional[float], ended_at: float) -> bool:
+        """ True if a phrase lies entirely inside a playback window and no barge-in fired during it. """
+        if started_at is None:
+            return False
+        if any(started_at - BARGE_IN_SLACK <= onset <= ended_at for onset in self._barge_in_onsets):
+            return False
+        windows = list(self._playback_windows)
+        if self._playing_since is not None:
+            windows.append((self._playing_since, float("inf")))
+        return any(start <= started_at and ended_at <= end + ECHO_TAIL_SECONDS for start, end in windows)
+
+    # ---- Helpers -------------------------------------------------------------
+
+    async def _drain_turns(self) -> None:
+        while not self.turns.empty():
+            await in_thread(self.state.save_turn, self.turns.get_nowait())
+
+    def _shutdown(self) -> None:
+        self.session.close()
+        if self.writer is not None:
+            self.writer.close()  # Flush turns still waiting to be written
+        self.memory.close()
+        if self.prefetch is not None:
+            logging.info(f"Prompt prefetch stats: {self.prefetch.stats()}")
+        logging.info(f"Engine stopped; {self.interruptions} interruptions, {self.echo_dropped} phrases dropped "
+                     f"as echo; stage timings: {self.stage_stats()}")
+        logging.info(f"Session cache stats: {self.state.cache_stats()}; memory: {self.memory.stats()}")
+        logging.info(f"HTTP client stats: {http_client.stats()}")
@@ -0,0 +1,515 @@
+import asyncio
+import base64
+import io
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Callable, Dict, NamedTuple, Optional
+from urllib.parse import parse_qs, urlsplit
+import speech_recognition as sr
+from config import config
+from utils.AI_Response import summarize_conversation, embed_texts, co
+from main_utility.chatHistory import ChatTurn, ChatWriter
+from main_utility.context_window import ContextBuilder
+from main_utility.session_state import SessionState
+from main_utility.memory_index import MemoryIndex
+from main_utility.recognizers import RecognizerBackend, create_backend
+from main_utility.speaking import fetch_audio, get_cached_audio
+from main_utility.speech_pipeline import SentenceSplitter, MAX_PENDING_AUDIO
+from main_utility.storage import DEFAULT_LANGUAGE
+from main_utility.wake_word import WAKE_PHRASE, SLEEP_PHRASE
+from main_utility.conversation_engine import SESSION_TIMEOUT
+from main_utility.http_client import http_client
+from main_utility.reply_stream import ChatStream, in_thread, prepare_messages
+from main_utility.tracing import current_turn, new_turn_id, span, tracer
+from main_utility import prompts
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+SERVER_HOST = getattr(config, "SERVER_HOST", "127.0.0.1")
+SERVER_PORT = getattr(config, "SERVER_PORT", 8765)
+SERVER_THREADS = 64  # Blocking calls (recognizers, Cohere, ElevenLabs, database) of every session share these
+MAX_SESSIONS = 1000
+MAX_REQUEST_BYTES = 10 * 1024 * 1024  # ~5 minutes of 16 kHz mono WAV
+REQUEST_TIMEOUT = 30  # Seconds a client may take to send its request
+SWEEP_INTERVAL = 60  # Seconds between checks for sessions idle longer than SESSION_TIMEOUT
+LANGUAGES = ('en', 'hi')
+
+class ClientError(Exception):
+    """ A request the server refuses; answered with the given HTTP status. """
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    query: Dict[str, str]
+    headers: Dict[str, str]  # Lower-case names
+    body: bytes
+
+class ServerSession:
+    """
+    Per-client conversation state: awake flag, language and the cached history of the user's conversation.
+
+    Every user has one conversation (record_id = user_id) that continues across
+    sessions, and at most one live session at a time, so the session's history
+    cache is never written behind its back. The lock serializes the session's
+    turns; different sessions run concurrently.
+    """
+
+    def __init__(self, session_id: str, user_id: int, storage, writer: Optional[ChatWriter] = None,
+                 memory: Optional[MemoryIndex] = None):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.record_id = user_id
+        self.memory = memory
+        self.state = SessionState(storage, writer=writer, record_id=self.record_id, memory=memory, user_id=user_id)
+        self.context_builder = ContextBuilder(storage, summarize_conversation, record_id=self.record_id)
+        self.language = None
+        self.awake = False
+        self.last_active = time.monotonic()
+        self.turns = 0
+        self.loaded = False
+        self.lock = asyncio.Lock()
+
+    def load(self) -> None:
+        """ Reads the user's settings and conversation summary. Blocking; runs on a pool thread. """
+        self.language = self.state.language or DEFAULT_LANGUAGE
+        self.context_builder.load()
+        if self.memory is not None:
+            self.memory.start()
+        self.loaded = True
+
+    def close(self) -> None:
+        """ Stops the session's memory worker thread and saves its vectors. Blocking; runs on a pool thread. """
+        if self.memory is not None:
+            self.memory.close()
+
+class TurnStream:
+    """ Writes one turn's events to the client as newline-delimited JSON in HTTP chunks. """
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+
+    async def start(self) -> None:
+        self.writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                          b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+        await self.writer.drain()
+
+    async def send(self, event: dict) -> None:
+        line = json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n"
+        self.writer.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+        await self.writer.drain()
+
+    async def end(self) -> None:
+        self.writer.write(b"0\r\n\r\n")
+        await self.writer.drain()
+
+class ConversationServer:
+    """
+    Headless server that holds conversations with many clients at once.
+
+    Each request is one turn, tagged with a session ID in the path and a user ID in
+    the X-User-Id header:
+
+        POST   /sessions/<session_id>/turns   JSON {"text": ..., "language": optional} or an audio/wav body
+        DELETE /sessions/<session_id>         Ends the session
+        GET    /stats                         Session counts and traced stage latencies
+
+    A turn is answered with a chunked stream of JSON lines: "transcript" (audio
+    turns), "prompt", "text" for every sentence as soon as the LLM has produced it,
+    "audio" with the sentence's base64 MP3 (unless ?audio=0), and finally "done"
+    with the turn's timings. Sentences are rendered while later ones are still
+    being generated, exactly as on the desktop.
+
+    Sessions behave like the desktop assistant: they start asleep, wake on the wake
+    phrase and go back to sleep on the sleep phrase; sessions idle for longer than
+    SESSION_TIMEOUT are dropped. Every session runs on one asyncio event loop;
+    their blocking calls share one thread pool, the storage backend's connection
+    pool and the process-wide Cohere and ElevenLabs clients.
+
+    Args:
+        storage (Storage): Storage backend shared by every session.
+        host (str): Interface to listen on.
+        port (int): Port to listen on; 0 picks a free one (see `port` once ready).
+        write_behind (bool): Save turns on a background writer thread.
+        memory (bool): Give every session a long-term memory index.
+        chat_client: Cohere V2 client (or a compatible stand-in).
+        fetch: Returns encoded audio for (text, lang).
+        backend (RecognizerBackend, optional): Transcribes audio turns; by default the configured one.
+    """
+
+    def __init__(self, storage, host: str = SERVER_HOST, port: int = SERVER_PORT, write_behind: bool = False,
+                 memory: bool = True, chat_client=None, fetch: Callable[[str, str], Optional[bytes]] = fetch_audio,
+                 backend: Optional[RecognizerBackend] = None, max_sessions: int = MAX_SESSIONS):
+        self.storage = storage
+        self.host = host
+        self.port = port
+        self.chat_client = chat_client or co
+        self.fetch = fetch
+        self.backend = backend
+        self.max_sessions = max_sessions
+        self.use_memory = memory
+        self.writer = ChatWriter(storage) if write_behind else None
+        self.sessions: Dict[str, ServerSession] = {}
+        self.session_of_user: Dict[int, str] = {}
+        self.ready = threading.Event()  # Set once the server accepts connections
+        self.turns_served = 0
+        self.active_turns = 0
+        self.rejected = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped: Optional[asyncio.Event] = None
+
+    # ---- Control -------------------------------------------------------------
+
+    async def serve(self) -> None:
+        """ Accepts connections until stop() is called. """
+        self._loop = asyncio.get_running_loop()
+        self._loop.set_default_executor(ThreadPoolExecutor(SERVER_THREADS, thread_name_prefix="server"))
+        self._stopped = asyncio.Event()
+        if self.backend is None:
+            self.backend = create_backend()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        sweeper = asyncio.create_task(self._sweep())
+        logging.info(f"Conversation server listening on {self.host}:{self.port}.")
+        self.ready.set()
+        try:
+            await self._stopped.wait()
+        finally:
+            sweeper.cancel()
+            self._server.close()
+            await self._server.wait_closed()
+            await in_thread(self._shutdown)
+
+    def stop(self) -> None:
+        """ Asks a running server to stop. Safe to call from any thread. """
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+    def stats(self) -> dict:
+        """ Returns session, turn and outbound connection counters and the latency percentiles of every traced stage. """
+        return {
+            "sessions": len(self.sessions),
+            "active_turns": self.active_turns,
+            "turns_served": self.turns_served,
+            "rejected": self.rejected,
+            "http": http_client.stats(),
+            "stages": tracer.summary(),
+        }
+
+    # ---- HTTP ----------------------------------------------------------------
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await asyncio.wait_for(self._read_request(reader), REQUEST_TIMEOUT)
+            await self._route(request, writer)
+        except ClientError as e:
+            self.rejected += 1
+            await self._respond(writer, e.status, {"error": str(e)})
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass  # The client went away or never finished its request
+        except Exception:
+            logging.exception("Failed to handle a server request.")
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Request:
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        parts = request_line.split(" ")
+        if len(parts) != 3:
+            raise ClientError(400, "Malformed request line.")
+        method, target, _ = parts
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise ClientError(400, "Invalid Content-Length.")
+        if length > MAX_REQUEST_BYTES:
+            raise ClientError(413, f"Request body larger than {MAX_REQUEST_BYTES} bytes.")
+        body = await reader.readexactly(length) if length else b""
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        return Request(method.upper(), url.path.rstrip("/"), query, headers, body)
+
+    async def _route(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        parts = request.path.strip("/").split("/")
+        if parts == ["stats"] and request.method == "GET":
+            await self._respond(writer, 200, self.stats())
+        elif len(parts) == 3 and parts[0] == "sessions" and parts[2] == "turns" and request.method == "POST":
+            await self._turn(parts[1], request, writer)
+        elif len(parts) == 2 and parts[0] == "sessions" and request.method == "DELETE":
+            await self._end_session(parts[1], request)
+            await self._respond(writer, 204)
+        else:
+            raise ClientError(404, f"No route for {request.method} {request.path}.")
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, data: Optional[dict] = None) -> None:
+        body = json.dumps(data).encode("utf-8") if data is not None else b""
+        head = f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n"
+        if data is not None:
+            head += "Content-Type: application/json\r\n"
+        try:
+            writer.write(head.encode("latin-1") + b"\r\n" + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    # ---- Sessions ------------------------------------------------------------
+
+    def _session(self, session_id: str, request: Request) -> ServerSession:
+        user_id = self._user_id(request)
+        session = self.sessions.get(session_id)
+        if session is not None:
+            if session.user_id != user_id:
+                raise ClientError(403, "Session belongs to another user.")
+            return session
+        if user_id in self.session_of_user:
+            raise ClientError(409, f"User {user_id} already has session {self.session_of_user[user_id]}.")
+        if len(self.sessions) >= self.max_sessions:
+            raise ClientError(503, "Too many sessions.")
+        memory = MemoryIndex(self.storage, embed_texts, record_id=user_id) if self.use_memory else None
+        session = ServerSession(session_id, user_id, self.storage, writer=self.writer, memory=memory)
+        self.sessions[session_id] = session
+        self.session_of_user[user_id] = session_id
+        logging.info(f"Session {session_id} opened for user {user_id}; {len(self.sessions)} sessions.")
+        return session
+
+    async def _end_session(self, session_id: str, request: Request) -> None:
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise ClientError(404, f"No session {session_id}.")
+        if session.user_id != self._user_id(request):
+            raise ClientError(403, "Session belongs to another user.")
+        async with session.lock:
+            await self._drop(session)
+
+    async def _drop(self, session: ServerSession) -> None:
+        if self.sessions.get(session.session_id) is not session:
+            return
+        del self.sessions[session.session_id]
+        del self.session_of_user[session.user_id]
+        await in_thread(session.close)
+        logging.info(f"Session {session.session_id} closed after {session.turns} turns.")
+
+    async def _sweep(self) -> None:
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL)
+            now = time.monotonic()
+            for session in list(self.sessions.values()):
+                if now - session.last_active > SESSION_TIMEOUT and not session.lock.locked():
+                    logging.info(f"Session {session.session_id} expired due to inactivity.")
+                    await self._drop(session)
+
+    @staticmethod
+    def _user_id(request: Request) -> int:
+        try:
+            return int(request.headers["x-user-id"])
+        except (KeyError, ValueError):
+            raise ClientError(400, "An integer X-User-Id header is required.")
+
+    # ---- Turns ---------------------------------------------------------------
+
+    async def _turn(self, session_id: str, request: Request, writer: asyncio.StreamWriter) -> None:
+        received_at = time.monotonic()  # Stands in for the end of the user's speech
+        text, audio, language = self._parse_turn(request)
+        session = self._session(session_id, request)
+        with_audio = request.query.get("audio", "1") != "0"
+
+        async with session.lock:
+            if self.sessions.get(session_id) is not session:
+                raise ClientError(404, f"Session {session_id} has ended.")
+            turn_id = new_turn_id()
+            current_turn.set(turn_id)  # This connection's task only; copied into its pool threads
+            if not session.loaded:
+                await in_thread(session.load)
+            if language and language != session.language:
+                await in_thread(session.state.set_language, language)
+                session.language = language
+
+            stream = TurnStream(writer)
+            await stream.start()
+            self.active_turns += 1
+            try:
+                with span("server.turn"):
+                    prompt = None
+                    if audio is not None:
+                        text, prompt = await self._transcribe(audio)
+                        await stream.send({"event": "transcript", "text": text})
+                    done = await self._converse(session, text, prompt, with_audio, received_at, turn_id, stream)
+                await stream.send(done)
+            except ConnectionError:
+                raise
+            except Exception as e:
+                # The status line is already sent, so the failure is reported in the stream
+                logging.exception("An error occurred during the conversation handling.")
+                await stream.send({"event": "error", "turn_id": turn_id, "message": str(e) or type(e).__name__})
+            finally:
+                self.active_turns -= 1
+                self.turns_served += 1
+                session.turns += 1
+                session.last_active = time.monotonic()
+            await stream.end()
+
+    def _parse_turn(self, request: Request):
+        content_type = request.headers.get("content-type", "").split(";")[0].strip()
+        if content_type in ("audio/wav", "audio/x-wav"):
+            try:
+                with sr.AudioFile(io.BytesIO(request.body)) as source:
+                    audio = sr.Recognizer().record(source)
+            except (ValueError, EOFError) as e:
+                raise ClientError(400, f"Unreadable WAV audio: {e}")
+            return None, audio, request.query.get("language")
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            raise ClientError(400, "Body must be JSON or audio/wav.")
+        text = str(data.get("text") or "").strip().lower()
+        language = data.get("language")
+        if language is not None and language not in LANGUAGES:
+            raise ClientError(400, f"Unsupported language {language!r}.")
+        if not text:
+            raise ClientError(400, "A turn needs \"text\" or an audio/wav body.")
+        return text, None, language
+
+    async def _transcribe(self, audio: sr.AudioData):
+        with span("stage.stt"):
+            try:
+                result = await in_thread(self.backend.recognize, audio)
+                return result.text.lower(), None
+            except sr.UnknownValueError:
+                return "", prompts.NOT_UNDERSTOOD
+            except sr.RequestError:
+                logging.error("Speech recognition service is unavailable.")
+                return "", prompts.RECOGNITION_UNAVAILABLE
+
+    async def _converse(self, session: ServerSession, text: str, prompt: Optional[str], with_audio: bool,
+                        received_at: float, turn_id: str, stream: TurnStream) -> dict:
+        done = {"event": "done", "turn_id": turn_id}
+        if prompt and session.awake:
+            await self._prompt(session, prompt, with_audio, stream)
+        if not text:
+            return {**done, "awake": session.awake}
+
+        # Asleep, only the wake phrase is answered
+        if not session.awake:
+            if WAKE_PHRASE in text:
+                session.awake = True
+                await self._prompt(session, prompts.GREETING, with_audio, stream)
+            return {**done, "awake": session.awake}
+
+        if SLEEP_PHRASE in text:
+            session.awake = False
+            await self._prompt(session, prompts.GOODBYE, with_audio, stream)
+            return {**done, "awake": session.awake}
+
+        timings = await self._reply(session, text, with_audio, received_at, turn_id, stream)
+        return {**done, "awake": session.awake, **timings}
+
+    async def _prompt(self, session: ServerSession, text: str, with_audio: bool, stream: TurnStream) -> None:
+        event = {"event": "prompt", "text": text}
+        if with_audio:
+            audio = await in_thread(get_cached_audio, text, session.language)
+            if audio:
+                event["audio"] = base64.b64encode(audio).decode("ascii")
+        await stream.send(event)
+
+    async def _reply(self, session: ServerSession, user_input: str, with_audio: bool, received_at: float,
+                     turn_id: str, stream: TurnStream) -> dict:
+        messages = await prepare_messages(session.state, session.context_builder, session.memory, user_input,
+                                          session.language)
+
+        chat = ChatStream(self.chat_client, messages)
+        # Audio of sentence N is fetched while N+1 is generated; the sender keeps them in order
+        pending_audio = asyncio.Queue(MAX_PENDING_AUDIO)
+        timings = {"first_text_ms": None, "first_audio_ms": None}
+        sender = asyncio.create_task(self._send_audio(pending_audio, stream, received_at, timings))
+        sender.add_done_callback(lambda task: task.cancelled() or task.exception())  # Failures surface via emit()
+        splitter = SentenceSplitter()
+        parts = []
+        index = 0
+        interrupted = False
+
+        async def emit(sentence: str) -> None:
+            nonlocal index
+            await stream.send({"event": "text", "index": index, "text": sentence})
+            if with_audio:
+                fetch = asyncio.ensure_future(in_thread(self.fetch, sentence, session.language))
+                await pending_audio.put((index, fetch))
+            index += 1
+
+        try:
+            async for delta in chat:
+                if not parts:
+                    timings["first_text_ms"] = round((time.monotonic() - received_at) * 1000)
+                    tracer.record("llm.first_text", time.monotonic() - received_at)
+                parts.append(delta)
+                for sentence in splitter.feed(delta):
+                    await emit(sentence)
+            remainder = splitter.flush()
+            if remainder:
+                await emit(remainder)
+            await pending_audio.put(None)
+            await sender
+        except (ConnectionError, asyncio.CancelledError):
+            interrupted = True  # The client hung up; stop generating for it
+            raise
+        finally:
+            chat.close()
+            if not sender.done():
+                sender.cancel()
+            timings["total_ms"] = round((time.monotonic() - received_at) * 1000)
+            reply = "".join(parts)
+            if reply:
+                tracer.record("turn", time.monotonic() - received_at, interrupted=interrupted)
+                turn = ChatTurn(user_input, reply, record_id=session.record_id, language=session.language, metadata={
+                    **timings, "interrupted": interrupted, "turn_id": turn_id, "session_id": session.session_id,
+                })
+                try:
+                    await in_thread(session.state.save_turn, turn)
+                except Exception:
+                    logging.exception("Failed to save the chat turn.")
+        return timings
+
+    async def _send_audio(self, pending_audio: asyncio.Queue, stream: TurnStream, received_at: float,
+                          timings: dict) -> None:
+        while True:
+            item = await pending_audio.get()
+            if item is None:
+                return
+            index, fetch = item
+            with span("stage.tts"):
+                audio = await fetch
+            if not audio:
+                continue
+            if timings["first_audio_ms"] is None:
+                timings["first_audio_ms"] = round((time.monotonic() - received_at) * 1000)
+                tracer.record("first_audio", time.monotonic() - received_at)
+            await stream.send({"event": "audio", "index": index, "data": base64.b64encode(audio).decode("ascii")})
+
+    # ---- Helpers -------------------------------------------------------------
+
+    def _shutdown(self) -> None:
+        for session in list(self.sessions.values()):
+            session.close()
+        self.sessions.clear()
+        self.session_of_user.clear()
+        if self.writer is not None:
+            self.writer.close()  # Flush turns still waiting to be written
+        logging.info(f"Conversation server stopped after {self.turns_served} turns; stage timings: {tracer.summary()}")
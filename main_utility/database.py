@@ -1,8 +1,14 @@
-import mysql.connector
+import json
+import queue
+import time
 import logging
-from mysql.connector import Error
+import threading
+from contextlib import contextmanager
+import mysql.connector
+from mysql.connector import Error, errors
+from config import config
 from config.config import DB_HOST, DB_USER, DB_PASSWORD, DB_NAME
-from typing import Tuple, Optional
+from typing import Any, Callable
 
 # Configure logging
 logging.basicConfig(
@@ -10,40 +16,177 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-def setup_database() -> Tuple[Optional[mysql.connector.MySQLConnection], Optional[mysql.connector.cursor.MySQLCursor]]:
+DB_POOL_SIZE = getattr(config, "DB_POOL_SIZE", 5)
+POOL_NAME = "calmora"
+CHECKOUT_TIMEOUT = 10.0  # Seconds to wait for a free connection when the pool is exhausted
+RECONNECT_ATTEMPTS = 3
+RECONNECT_DELAY = 0.5  # Seconds between reconnect attempts
+CONNECTION_ERRORS = (errors.OperationalError, errors.InterfaceError)  # Lost or unreachable server
+
+class ConnectionPool:
     """
-    Sets up the database connection and ensures necessary tables and initial entries are created.
-    
-    Returns:
-        Tuple: Database connection and cursor if successful, (None, None) if there is an error.
+    Thread-safe pool of MySQL connections, checked out per call.
+
+    The pool opens its connections up front and keeps track of every one of them,
+    so close() can disconnect them all: idle connections right away, checked-out
+    ones as soon as they are returned. Returned connections have their session
+    reset, which rolls back uncommitted work.
+
+    Every checkout pings the connection and reconnects it if the server dropped it
+    (e.g. after wait_timeout), so callers never see a stale connection. Statements
+    run through run() are retried on a fresh connection if the connection is lost
+    mid-call, but only when the caller marks them idempotent; a transaction that
+    may already have been applied is reported instead of repeated.
+
+    Args:
+        size (int): Number of pooled connections.
+        name (str): Pool name, used in log messages.
     """
-    try:
-        db = mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME
-        )
-        
-        if db.is_connected():
-            logging.info("Connected to MySQL database")
-        
-        cursor = db.cursor()
-        initialize_tables(cursor)
-        ensure_initial_entries(cursor, db)
-        
-        return db, cursor
 
-    except Error as e:
-        logging.error("Error connecting to MySQL database: %s", e)
-        return None, None
+    def __init__(self, size: int = DB_POOL_SIZE, name: str = POOL_NAME, **connect_args):
+        self.name = name
+        self.size = size
+        self.checkouts = 0
+        self.reconnects = 0
+        self.retries = 0
+        self._connect_args = dict(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME, **connect_args)
+        self._idle = queue.Queue()
+        self._in_use = set()
+        self._closed = False
+        self._lock = threading.Lock()
+        try:
+            for _ in range(size):
+                self._idle.put(mysql.connector.connect(**self._connect_args))
+        except Error:
+            self.close()
+            raise
+        logging.info(f"MySQL connection pool '{name}' ready with {size} connections.")
+
+    @contextmanager
+    def connection(self):
+        """
+        Checks out a healthy connection and returns it to the pool afterwards.
+
+        Yields:
+            The pooled connection; uncommitted work is rolled back when it is returned.
+
+        Raises:
+            Error: If no connection becomes free within CHECKOUT_TIMEOUT or the server is unreachable.
+        """
+        db = self._checkout()
+        try:
+            yield db
+        finally:
+            self._release(db)
+
+    def run(self, work: Callable[[Any, Any], Any], idempotent: bool = False) -> Any:
+        """
+        Calls work(db, cursor) on a checked-out connection.
+
+        Args:
+            work: Does the statements and commits if it writes.
+            idempotent (bool): Whether work may safely run again after the connection was lost.
+
+        Returns:
+            Whatever work returns.
+        """
+        attempts = RECONNECT_ATTEMPTS if idempotent else 1
+        for attempt in range(1, attempts + 1):
+            try:
+                with self.connection() as db:
+                    cursor = db.cursor()
+                    try:
+                        return work(db, cursor)
+                    finally:
+                        cursor.close()
+            except CONNECTION_ERRORS as e:
+                if attempt == attempts:
+                    raise
+                with self._lock:
+                    self.retries += 1
+                logging.warning(f"Database connection lost ({e}); retrying ({attempt}/{attempts - 1}).")
+                time.sleep(RECONNECT_DELAY)
+
+    def fetch_all(self, query: str, params: tuple = ()) -> list:
+        """ Runs a read-only query, retrying on a lost connection, and returns every row. """
+        def fetch(db, cursor):
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+        return self.run(fetch, idempotent=True)
+
+    def close(self) -> None:
+        """ Disconnects every idle connection; connections still checked out are disconnected when returned. """
+        with self._lock:
+            self._closed = True
+            in_use = len(self._in_use)
+        while True:
+            try:
+                self._disconnect(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        logging.info(f"Connection pool '{self.name}' closed ({in_use} connections still in use); {self.stats()}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": self.size, "checkouts": self.checkouts, "reconnects": self.reconnects,
+                    "retries": self.retries}
+
+    def _checkout(self):
+        if self._closed:
+            raise errors.PoolError(f"Connection pool '{self.name}' is closed.")
+        try:
+            db = self._idle.get(timeout=CHECKOUT_TIMEOUT)
+        except queue.Empty:
+            raise errors.PoolError(f"No database connection became free within {CHECKOUT_TIMEOUT:.0f} seconds.")
+        with self._lock:
+            self._in_use.add(db)
 
-def initialize_tables(cursor: mysql.connector.cursor.MySQLCursor) -> None:
+        # Health check: a ping on a dropped connection reconnects it instead of failing the call
+        try:
+            db.ping(reconnect=False)
+        except CONNECTION_ERRORS:
+            try:
+                db.ping(reconnect=True, attempts=RECONNECT_ATTEMPTS, delay=RECONNECT_DELAY)
+            except Error:
+                self._release(db)
+                raise
+            with self._lock:
+                self.reconnects += 1
+            logging.info("Reconnected a stale pooled database connection.")
+        with self._lock:
+            self.checkouts += 1
+        return db
+
+    def _release(self, db) -> None:
+        with self._lock:
+            self._in_use.discard(db)
+            closed = self._closed
+        if closed:
+            self._disconnect(db)
+            return
+        try:
+            db.reset_session()  # Rolls back uncommitted work and clears session state
+        except Error as e:
+            # The next checkout's ping reconnects it
+            logging.warning("Failed to reset a pooled connection: %s", e)
+        self._idle.put(db)
+        if self._closed:
+            self.close()  # Closed while this one was being reset
+
+    @staticmethod
+    def _disconnect(db) -> None:
+        try:
+            db.close()
+        except Error:
+            pass  # Already gone
+
+def initialize_tables(pool: ConnectionPool) -> None:
     """
     Ensures that the necessary tables exist in the database.
     
     Args:
-        cursor: Database cursor to execute SQL queries.
+        pool (ConnectionPool): Pool to check out a connection from.
     """
     try:
         tables = {
@@ -53,6 +196,36 @@ def initialize_tables(cursor: mysql.connector.cursor.MySQLCursor) -> None:
                     history JSON
                 );
             """,
+            "chat_messages": """
+                CREATE TABLE IF NOT EXISTS chat_messages (
+                    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                    conversation_id INT NOT NULL,
+                    seq INT NOT NULL,
+                    role VARCHAR(16) NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+                    UNIQUE KEY idx_conversation_seq (conversation_id, seq)
+                );
+            """,
+            "chat_turns": """
+                CREATE TABLE IF NOT EXISTS chat_turns (
+                    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                    conversation_id INT NOT NULL,
+                    user_seq INT NOT NULL,
+                    language VARCHAR(2),
+                    metadata JSON,
+                    created_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+                    KEY idx_conversation_turn (conversation_id, user_seq)
+                );
+            """,
+            "chat_summaries": """
+                CREATE TABLE IF NOT EXISTS chat_summaries (
+                    conversation_id INT PRIMARY KEY,
+                    summary TEXT NOT NULL,
+                    through_seq INT NOT NULL,
+                    updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3)
+                );
+            """,
             "user_settings": """
                 CREATE TABLE IF NOT EXISTS user_settings (
                     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -61,21 +234,23 @@ def initialize_tables(cursor: mysql.connector.cursor.MySQLCursor) -> None:
             """,
         }
         
-        for table_name, create_statement in tables.items():
-            cursor.execute(create_statement)
-            logging.info(f"Ensured existence of table: {table_name}")
+        def create(db, cursor):
+            for table_name, create_statement in tables.items():
+                cursor.execute(create_statement)
+                logging.info(f"Ensured existence of table: {table_name}")
+
+        pool.run(create, idempotent=True)
             
     except Error as e:
         logging.error("Error creating tables: %s", e)
         raise
 
-def ensure_initial_entries(cursor: mysql.connector.cursor.MySQLCursor, db: mysql.connector.MySQLConnection) -> None:
+def ensure_initial_entries(pool: ConnectionPool) -> None:
     """
     Ensures that each required table has at least one initial entry.
     
     Args:
-        cursor: Database cursor to execute SQL queries.
-        db: Database connection object to commit transactions.
+        pool (ConnectionPool): Pool to check out a connection from.
     """
     try:
         initial_entries = {
@@ -83,14 +258,54 @@ def ensure_initial_entries(cursor: mysql.connector.cursor.MySQLCursor, db: mysql
             "user_settings": ("SELECT * FROM user_settings", "INSERT INTO user_settings (language) VALUES ('en')"),
         }
 
-        for table_name, (select_query, insert_query) in initial_entries.items():
-            cursor.execute(select_query)
-            rows = cursor.fetchall()
-            if not rows:
-                cursor.execute(insert_query)
-                db.commit()
-                logging.info(f"Inserted initial entry into {table_name}")
+        def insert_missing(db, cursor):
+            for table_name, (select_query, insert_query) in initial_entries.items():
+                cursor.execute(select_query)
+                rows = cursor.fetchall()
+                if not rows:
+                    cursor.execute(insert_query)
+                    db.commit()
+                    logging.info(f"Inserted initial entry into {table_name}")
+
+        # Re-running only inserts what is still missing
+        pool.run(insert_missing, idempotent=True)
                 
     except Error as e:
         logging.error("Error ensuring initial entries: %s", e)
-        raise
\ No newline at end of file
+        raise
+
+def migrate_chat_history(pool: ConnectionPool) -> None:
+    """
+    Copies conversations from the legacy chat_history JSON blobs into chat_messages.
+
+    A conversation is migrated only while it has no rows in chat_messages, so this runs
+    once per conversation. The blob is left in place as a backup.
+
+    Args:
+        pool (ConnectionPool): Pool to check out a connection from.
+    """
+    def migrate(db, cursor):
+        cursor.execute("SELECT id, history FROM chat_history")
+        for conversation_id, history in cursor.fetchall():
+            messages = json.loads(history) if history else []
+            if not messages:
+                continue
+
+            cursor.execute("SELECT 1 FROM chat_messages WHERE conversation_id = %s LIMIT 1", (conversation_id,))
+            if cursor.fetchone():
+                continue
+
+            cursor.executemany(
+                "INSERT INTO chat_messages (conversation_id, seq, role, content) VALUES (%s, %s, %s, %s)",
+                [(conversation_id, seq, message["role"], message["content"])
+                 for seq, message in enumerate(messages, start=1)]
+            )
+            db.commit()
+            logging.info(f"Migrated {len(messages)} messages of conversation {conversation_id} to chat_messages.")
+
+    try:
+        # Migrated conversations are skipped, so a retry picks up where the lost connection stopped
+        pool.run(migrate, idempotent=True)
+    except Error as e:
+        logging.error("Error migrating chat history: %s", e)
+        raise
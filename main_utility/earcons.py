@@ -0,0 +1,127 @@
+import array
+import logging
+import math
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+import pygame
+from config import config
+from main_utility import prompts
+from main_utility.speaking import speak
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# "earcons" plays short local tones for the listening, error and timeout prompts;
+# "spoken" says them with the TTS voice instead.
+PROMPT_VERBOSITY = getattr(config, "PROMPT_VERBOSITY", "earcons")
+EARCON_VOLUME = 0.25  # Quiet enough not to open a phrase on the microphone
+FADE_SECONDS = 0.005  # Ramps at each note edge, so tones start and stop without clicks
+
+# Notes as (frequency in Hz, seconds); a frequency of 0 is a pause
+EARCON_NOTES: Dict[str, Tuple[Tuple[float, float], ...]] = {
+    "listening": ((880, 0.06), (1320, 0.08)),
+    "not_understood": ((660, 0.08), (440, 0.12)),
+    "timeout": ((440, 0.15),),
+    "error": ((220, 0.1), (0, 0.05), (220, 0.1)),
+}
+
+PROMPT_EARCONS = {
+    prompts.LISTENING: "listening",
+    prompts.NOT_UNDERSTOOD: "not_understood",
+    prompts.LISTEN_TIMEOUT: "timeout",
+    prompts.MAX_RETRIES_REACHED: "timeout",
+    prompts.RECOGNITION_UNAVAILABLE: "error",
+    prompts.GENERIC_ERROR: "error",
+}
+
+def synthesize_tone(notes: Sequence[Tuple[float, float]], sample_rate: int, channels: int = 1,
+                    volume: float = EARCON_VOLUME) -> bytes:
+    """
+    Renders a sequence of sine notes as signed 16-bit PCM.
+
+    Args:
+        notes: (frequency in Hz, seconds) pairs; frequency 0 is silence.
+        sample_rate (int): Output sample rate.
+        channels (int): Interleaved output channels; every channel gets the same signal.
+        volume (float): Peak amplitude from 0 to 1.
+
+    Returns:
+        bytes: Raw PCM in native byte order, as pygame.mixer.Sound(buffer=...) expects.
+    """
+    samples = array.array('h')
+    peak = volume * 32767
+    fade = max(1, int(FADE_SECONDS * sample_rate))
+    for frequency, seconds in notes:
+        count = int(seconds * sample_rate)
+        for i in range(count):
+            envelope = min(1.0, i / fade, (count - 1 - i) / fade)
+            value = int(peak * envelope * math.sin(2 * math.pi * frequency * i / sample_rate)) if frequency else 0
+            samples.extend([value] * channels)
+    return samples.tobytes()
+
+class Earcons:
+    """
+    Short local audio cues kept in memory as pygame Sounds.
+
+    Tones are synthesized on first use in the mixer's own format, so playing one is a
+    single non-blocking Sound.play() with no network request, file or decoding.
+    """
+
+    def __init__(self, notes: Dict[str, Tuple[Tuple[float, float], ...]] = EARCON_NOTES, volume: float = EARCON_VOLUME):
+        self.notes = notes
+        self.volume = volume
+        self._sounds: Dict[str, pygame.mixer.Sound] = {}
+        self._lock = threading.Lock()
+        self.played = 0
+
+    def play(self, name: str) -> Optional[float]:
+        """
+        Starts an earcon and returns immediately.
+
+        Args:
+            name (str): Key of EARCON_NOTES.
+
+        Returns:
+            float: Length of the cue in seconds, or None if it could not be played.
+        """
+        try:
+            sound = self._sound(name)
+        except pygame.error as e:
+            logging.error(f"Cannot play earcon {name}: {e}")
+            return None
+        sound.play()
+        self.played += 1
+        return sound.get_length()
+
+    def _sound(self, name: str) -> pygame.mixer.Sound:
+        with self._lock:
+            sound = self._sounds.get(name)
+            if sound is None:
+                if not pygame.mixer.get_init():
+                    pygame.mixer.init()
+                sample_rate, _, channels = pygame.mixer.get_init()
+                pcm = synthesize_tone(self.notes[name], sample_rate, channels, self.volume)
+                sound = self._sounds[name] = pygame.mixer.Sound(buffer=pcm)
+            return sound
+
+earcons = Earcons()
+
+def is_spoken(text: str) -> bool:
+    """ True if the prompt is said with the TTS voice rather than played as an earcon. """
+    return PROMPT_VERBOSITY == "spoken" or text not in PROMPT_EARCONS
+
+def cue(text: str, lang: str = 'en') -> None:
+    """
+    Signals a fixed prompt: plays its earcon without blocking, or speaks it in "spoken" verbosity.
+
+    Args:
+        text (str): One of the prompts in main_utility.prompts.
+        lang (str): Language to speak the prompt in.
+    """
+    if is_spoken(text):
+        speak(text, lang, cache=True)
+    else:
+        earcons.play(PROMPT_EARCONS[text])
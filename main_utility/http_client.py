@@ -0,0 +1,182 @@
+import logging
+import random
+import threading
+import time
+from typing import Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NewConnectionError
+from config import config
+from main_utility.tracing import span
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+HTTP_POOL_SIZE = getattr(config, "HTTP_POOL_SIZE", 32)  # Keep-alive connections kept open per host
+HTTP_CONNECT_TIMEOUT = 3.05
+HTTP_READ_TIMEOUT = getattr(config, "HTTP_READ_TIMEOUT", 30)  # Longest silence allowed from the server, in seconds
+HTTP_RETRIES = 3
+RETRY_BACKOFF = 0.2  # Upper bound of the first retry delay; doubles with every attempt
+RETRY_BACKOFF_MAX = 4.0
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+# Connections opened by the current thread's request; urllib3 connects on the requesting thread
+_opened = threading.local()
+
+class _CountingConnection:
+    def connect(self):
+        _opened.count = getattr(_opened, "count", 0) + 1
+        super().connect()
+
+class _HTTPConnection(_CountingConnection, HTTPConnection):
+    pass
+
+class _HTTPSConnection(_CountingConnection, HTTPSConnection):
+    pass
+
+class _HTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _HTTPConnection
+
+class _HTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _HTTPSConnection
+
+class CountingAdapter(HTTPAdapter):
+    """ HTTPAdapter whose connections report when they are opened, so reuse can be measured per request. """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _HTTPConnectionPool, "https": _HTTPSConnectionPool}
+
+class HttpClient:
+    """
+    Process-wide HTTP client for the outbound API calls.
+
+    One requests.Session keeps connections alive in a per-host pool, so consecutive
+    requests to the same API skip the TCP and TLS handshakes. Every request gets a
+    connect and a read timeout, and connection errors, timeouts and 5xx responses
+    are retried with full-jitter exponential backoff. A request that is not
+    idempotent (a POST, by default) is only retried after a 5xx or a failure to
+    connect, since the server may have acted on it, e.g. billed a TTS render,
+    before a read timed out. Each request is traced as an
+    "http" span that records whether it reused a pooled connection; stats() sums
+    them up.
+
+    Args:
+        pool_size (int): Connections kept open per host.
+        timeout: (connect, read) timeouts in seconds.
+        retries (int): Retries after the first attempt.
+        backoff (float): Upper bound of the first retry delay in seconds.
+    """
+
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE,
+                 timeout: Tuple[float, float] = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+                 retries: int = HTTP_RETRIES, backoff: float = RETRY_BACKOFF):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = CountingAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.retries_made = 0
+        self.failures = 0
+
+    def request(self, method: str, url: str, idempotent: Optional[bool] = None, **kwargs) -> requests.Response:
+        """
+        Sends a request through the pooled session, retrying transient failures.
+
+        Takes the keyword arguments of requests.Session.request; timeout defaults to
+        the client's. A streamed response must be read to the end or closed, so its
+        connection goes back to the pool.
+
+        Args:
+            method (str): HTTP method.
+            url (str): Request URL.
+            idempotent (bool, optional): Whether the request may be sent again after it
+                might have reached the server; defaults to whether the method is idempotent.
+
+        Returns:
+            requests.Response: The first response that is not a retried 5xx, or the last one.
+
+        Raises:
+            requests.RequestException: If the last attempt failed without a response.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        for attempt in range(self.retries + 1):
+            _opened.count = 0
+            response, error = None, None
+            with span("http", method=method, attempt=attempt) as attributes:
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                    attributes["status"] = response.status_code
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = e
+                attributes["reused"] = _opened.count == 0
+            self._record(_opened.count, failed=error is not None)
+
+            if response is not None and (response.status_code not in RETRY_STATUS_CODES or attempt == self.retries):
+                return response
+            if attempt == self.retries or (error is not None and not idempotent and not _never_sent(error)):
+                raise error
+            if response is not None:
+                response.close()
+            delay = random.uniform(0, min(RETRY_BACKOFF_MAX, self.backoff * 2 ** attempt))
+            logging.warning(f"{method} {url} failed ({error or response.status_code}); "
+                            f"retrying in {delay * 1000:.0f} ms.")
+            with self._lock:
+                self.retries_made += 1
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> dict:
+        """ Returns request, connection reuse, retry and failure counters. """
+        with self._lock:
+            sent = self.reused_connections + self.new_connections
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused_connections": self.reused_connections,
+                "reuse_rate": round(self.reused_connections / sent, 3) if sent else None,
+                "retries": self.retries_made,
+                "failures": self.failures,
+            }
+
+    def close(self) -> None:
+        """ Closes every pooled connection. """
+        self.session.close()
+
+    def _record(self, opened: int, failed: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            if failed:
+                self.failures += 1
+            elif opened:
+                self.new_connections += 1
+            else:
+                self.reused_connections += 1
+
+def _never_sent(error: requests.RequestException) -> bool:
+    # True if the request failed before a connection was made, so the server never saw it
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+http_client = HttpClient()
@@ -1,6 +1,8 @@
 import logging
 from .speaking import speak
 from .listening import listen
+from .storage import DEFAULT_USER_ID
+from . import prompts
 
 # Configure logging
 logging.basicConfig(
@@ -10,59 +12,57 @@ logging.basicConfig(
 
 DEFAULT_LANGUAGE = 'en'
 
-def get_or_select_language(db, cursor) -> str:
+def get_or_select_language(storage, state=None) -> str:
     """
     Retrieves the user's preferred language from the database, or prompts for selection if not set.
     
     Args:
-        db: Database connection object.
-        cursor: Database cursor for executing SQL commands.
+        storage (Storage): Storage backend holding the setting.
+        state (SessionState, optional): Session cache to read and write the setting through.
         
     Returns:
         str: The selected or stored language code.
     """
-    user_language = get_user_settings(cursor)
+    user_language = state.language if state is not None else get_user_settings(storage)
     if not user_language:
         logging.info("No user language found; initiating language selection.")
         user_language = prompt_language_selection()
-        set_user_language(db, cursor, user_language)
+        if state is not None:
+            state.set_language(user_language)
+        else:
+            set_user_language(storage, user_language)
     else:
         logging.info(f"User language found: {user_language}")
     return user_language
 
-def get_user_settings(cursor) -> str:
+def get_user_settings(storage, user_id: int = DEFAULT_USER_ID) -> str:
     """
     Retrieves the user's preferred language from the database.
     
     Args:
-        cursor: Database cursor for executing SQL commands.
+        storage (Storage): Storage backend to read from.
+        user_id (int): User whose setting is read.
         
     Returns:
         str: Language code if found; None otherwise.
     """
     try:
-        cursor.execute("SELECT language FROM user_settings WHERE id = 1")
-        result = cursor.fetchone()
-        return result[0] if result else None
+        return storage.load_language(user_id)
     except Exception as e:
         logging.error("Error fetching user language: %s", e)
         return None
 
-def set_user_language(db, cursor, language: str) -> None:
+def set_user_language(storage, language: str, user_id: int = DEFAULT_USER_ID) -> None:
     """
     Sets or updates the user's preferred language in the database.
     
     Args:
-        db: Database connection object.
-        cursor: Database cursor for executing SQL commands.
+        storage (Storage): Storage backend to write to.
         language (str): Language code to set for the user.
+        user_id (int): User whose setting is written.
     """
     try:
-        cursor.execute("""
-            INSERT INTO user_settings (id, language) VALUES (1, %s)
-            ON DUPLICATE KEY UPDATE language = VALUES(language);
-        """, (language,))
-        db.commit()
+        storage.save_language(language, user_id)
         logging.info(f"User language set to: {language}")
     except Exception as e:
         logging.error("Error setting user language: %s", e)
@@ -74,30 +74,20 @@ def prompt_language_selection() -> str:
     Returns:
         str: The selected language code.
     """
-    languages = {
-        'english': ('en', "English selected!"),
-        'hindi': ('hi', "हिंदी चुनी गई!")
-    }
-
-    instructions = {
-        'en': "Select your language. For English, say English. For Hindi, say Hindi.",
-        'hi': "अपनी भाषा का चयन करें। अंग्रेजी के लिए, अंग्रेजी कहें। हिंदी के लिए, हिंदी कहें।"
-    }
-
     # Speak and print instructions in both languages
-    for lang_code, message in instructions.items():
-        speak(message, lang_code)
+    for lang_code, message in prompts.LANGUAGE_INSTRUCTIONS.items():
+        speak(message, lang_code, cache=True)
         print(message)
 
     while True:
         lang_response = listen(timeout=5, phrase_time_limit=5).lower()
         logging.info(f"User response for language selection: {lang_response}")
         
-        for lang, (code, message) in languages.items():
+        for lang, (code, message) in prompts.LANGUAGE_CONFIRMATIONS.items():
             if lang in lang_response:
                 logging.info(f"Language selected: {code}")
-                speak(message, code)
+                speak(message, code, cache=True)
                 return code
         
-        speak("Invalid language. Please try again.", DEFAULT_LANGUAGE)
+        speak(prompts.INVALID_LANGUAGE, DEFAULT_LANGUAGE, cache=True)
         logging.warning("Invalid language selection attempt.")
\ No newline at end of file
@@ -1,7 +1,13 @@
 import logging
+import time
 import speech_recognition as sr
-from main_utility.speaking import speak
-from typing import Optional
+from main_utility.speaking import prefetcher
+from main_utility.earcons import cue, is_spoken
+from main_utility.tracing import span, tracer
+from main_utility import prompts
+from main_utility.capture import BackgroundCapture
+from main_utility.recognizers import RecognizerBackend, GoogleBackend, create_backend
+from typing import Callable, Optional
 
 # Configure logging
 logging.basicConfig(
@@ -9,59 +15,257 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+CALIBRATION_DURATION = 0.5
+RECALIBRATION_INTERVAL = 600  # Seconds between scheduled ambient-noise calibrations
+NOISE_DRIFT_RATIO = 2.0  # Recalibrate when the adaptive threshold moves this far from the calibrated one
+
 def listen(timeout: Optional[int] = None, phrase_time_limit: int = 3, retries: int = 3) -> str:
     """
     Listens to the user's voice input and converts it to text using Google Speech Recognition API.
-    
+
     Args:
         timeout (int, optional): Maximum wait time for a phrase to be started.
         phrase_time_limit (int): Maximum length of a phrase (in seconds).
         retries (int): Number of attempts if recognition fails.
-        
+
     Returns:
         str: Recognized command in lowercase, or an empty string if recognition fails.
     """
+    validate_listen_arguments(timeout, phrase_time_limit, retries)
+    started_at = time.perf_counter()
+
+    recognizer = sr.Recognizer()
+    with sr.Microphone() as source:
+        # Adjust for ambient noise
+        recognizer.adjust_for_ambient_noise(source, duration=CALIBRATION_DURATION)
+        logging.info(f"Microphone ready after {(time.perf_counter() - started_at) * 1000:.0f} ms.")
+        return recognize_with_retries(
+            GoogleBackend(recognizer),
+            lambda: recognizer.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit),
+            retries
+        )
+
+def validate_listen_arguments(timeout: Optional[int], phrase_time_limit: int, retries: int) -> None:
+    """
+    Validates the arguments shared by every listen entry point.
+
+    Raises:
+        ValueError: If any of the limits is not positive.
+    """
     if timeout is not None and timeout <= 0:
         raise ValueError("Timeout must be a positive integer.")
     if phrase_time_limit <= 0:
         raise ValueError("Phrase time limit must be a positive integer.")
     if retries <= 0:
         raise ValueError("Retries must be a positive integer.")
-    
-    recognizer = sr.Recognizer()
-    with sr.Microphone() as source:
-        # Adjust for ambient noise
-        recognizer.adjust_for_ambient_noise(source, duration=0.5)
-        
-        for attempt in range(1, retries + 1):
-            logging.info(f"Listening attempt {attempt}/{retries}...")
-            speak("Listening...", 'en')
-            
-            try:
-                # Capture audio input within specified timeout and phrase limits
-                audio = recognizer.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit)
-                command = recognizer.recognize_google(audio)
-                logging.info(f"Recognized command: {command}")
-                print(f"You said: {command}")
-                return command.lower()
-            
-            except sr.UnknownValueError:
-                logging.warning("Speech recognition could not understand the audio.")
-                speak("Sorry, I didn't catch that. Please repeat.", 'en')
-                print("Sorry, I didn't catch that. Please repeat.")
-                
-            except sr.RequestError:
-                logging.error("Google Speech Recognition API is unavailable.")
-                speak("Sorry, the speech recognition service is currently unavailable.", 'en')
-                print("API unavailable.")
-                return ""
-                
-            except sr.WaitTimeoutError:
-                logging.warning("Listening timed out while waiting for speech.")
-                speak("Listening timed out. Please try again.", 'en')
-                print("Listening timed out.")
-        
-        logging.error("Maximum retries reached. Unable to recognize speech.")
-        speak("Sorry, I couldn't hear you. Please try again.", 'en')
-        print("Sorry, I couldn't hear you. Please try again.")
-        return ""
\ No newline at end of file
+
+def recognize_with_retries(backend: RecognizerBackend, capture_audio: Callable[[], sr.AudioData], retries: int,
+                           announce: bool = True) -> str:
+    """
+    Captures a phrase and recognizes it, retrying on failure.
+
+    Args:
+        backend (RecognizerBackend): Speech-to-text backend (or race of backends).
+        capture_audio: Returns the next phrase as AudioData, raising sr.WaitTimeoutError if none starts in time.
+        retries (int): Number of attempts if recognition fails.
+        announce (bool): Whether to cue "Listening..." before each attempt (an earcon unless prompts are spoken).
+
+    Returns:
+        str: Recognized command in lowercase, or an empty string if recognition fails.
+    """
+    # Every attempt starts with "Listening..." and ends in at most one of the fixed replies
+    prefetcher.expect((text, 'en') for text in (
+        prompts.LISTENING, prompts.NOT_UNDERSTOOD, prompts.LISTEN_TIMEOUT, prompts.MAX_RETRIES_REACHED
+    ) if is_spoken(text))
+    for attempt in range(1, retries + 1):
+        logging.info(f"Listening attempt {attempt}/{retries}...")
+        if announce:
+            cue(prompts.LISTENING)
+
+        try:
+            # Capture audio input within specified timeout and phrase limits
+            with span("listen"):
+                audio = capture_audio()
+            command = backend.recognize(audio).text
+            logging.info(f"Recognized command: {command}")
+            print(f"You said: {command}")
+            return command.lower()
+
+        except sr.UnknownValueError:
+            logging.warning("Speech recognition could not understand the audio.")
+            cue(prompts.NOT_UNDERSTOOD)
+            print("Sorry, I didn't catch that. Please repeat.")
+
+        except sr.RequestError:
+            logging.error("Speech recognition service is unavailable.")
+            cue(prompts.RECOGNITION_UNAVAILABLE)
+            print("API unavailable.")
+            return ""
+
+        except sr.WaitTimeoutError:
+            logging.warning("Listening timed out while waiting for speech.")
+            cue(prompts.LISTEN_TIMEOUT)
+            print("Listening timed out.")
+
+    logging.error("Maximum retries reached. Unable to recognize speech.")
+    cue(prompts.MAX_RETRIES_REACHED)
+    print("Sorry, I couldn't hear you. Please try again.")
+    return ""
+
+class ListeningSession:
+    """
+    Keeps the microphone open and the recognizer calibrated across many listen calls.
+
+    The ambient-noise calibration runs once when the session opens, then again only
+    every recalibration_interval seconds or when the recognizer's adaptive energy
+    threshold drifts more than drift_ratio away from the calibrated value.
+
+    If a BackgroundCapture is given, the session reads VAD-segmented utterances from
+    its queue instead, so speech captured while the assistant was busy is not lost.
+    phrase_time_limit is then enforced by the capture's own maximum utterance length.
+
+    Transcription goes through the given backend, by default the one configured in
+    SPEECH_BACKENDS (see main_utility/recognizers.py).
+
+    Usage:
+        with ListeningSession() as session:
+            command = session.listen(timeout=5, phrase_time_limit=5)
+    """
+
+    def __init__(self, device_index: Optional[int] = None, recalibration_interval: float = RECALIBRATION_INTERVAL,
+                 drift_ratio: float = NOISE_DRIFT_RATIO, capture: Optional[BackgroundCapture] = None,
+                 backend: Optional[RecognizerBackend] = None):
+        self.device_index = device_index
+        self.capture = capture
+        self.recalibration_interval = recalibration_interval
+        self.drift_ratio = drift_ratio
+        self.recognizer = sr.Recognizer()
+        self.backend = backend if backend is not None else create_backend(recognizer=self.recognizer)
+        self.microphone = None
+        self.source = None
+        self.calibrated_threshold = None
+        self.last_calibrated = 0.0
+        self.calibrations = 0
+        self.last_setup_latency = None
+        self.last_speech_started_at = None  # time.monotonic() when the last captured phrase started, if known
+        self.last_speech_ended_at = None  # time.monotonic() when the last captured phrase ended
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self) -> None:
+        """ Opens the microphone and runs the initial calibration. """
+        if self.capture is not None:
+            self.capture.start()
+            return
+        if self.source is not None:
+            return
+        self.microphone = sr.Microphone(device_index=self.device_index)
+        self.source = self.microphone.__enter__()
+        self.calibrate()
+        logging.info("Listening session opened.")
+
+    def close(self) -> None:
+        """ Releases the microphone. """
+        if self.capture is not None:
+            self.capture.stop()
+            return
+        if self.source is None:
+            return
+        self.microphone.__exit__(None, None, None)
+        self.microphone = None
+        self.source = None
+        logging.info("Listening session closed.")
+
+    def calibrate(self) -> None:
+        """ Measures the ambient noise floor and resets the energy threshold to it. """
+        self.recognizer.adjust_for_ambient_noise(self.source, duration=CALIBRATION_DURATION)
+        self.calibrated_threshold = self.recognizer.energy_threshold
+        self.last_calibrated = time.monotonic()
+        self.calibrations += 1
+        logging.info(f"Calibrated ambient noise; energy threshold {self.calibrated_threshold:.0f}.")
+
+    def needs_calibration(self) -> bool:
+        """
+        Checks whether the schedule or the noise floor calls for a new calibration.
+
+        Returns:
+            bool: True if calibrate() should run before the next capture.
+        """
+        if time.monotonic() - self.last_calibrated >= self.recalibration_interval:
+            return True
+        if not self.calibrated_threshold:
+            return True
+        drift = self.recognizer.energy_threshold / self.calibrated_threshold
+        return drift > self.drift_ratio or drift < 1 / self.drift_ratio
+
+    def listen(self, timeout: Optional[int] = None, phrase_time_limit: int = 3, retries: int = 3) -> str:
+        """
+        Listens to the user's voice input on the open microphone. Same contract as listen().
+
+        Args:
+            timeout (int, optional): Maximum wait time for a phrase to be started.
+            phrase_time_limit (int): Maximum length of a phrase (in seconds).
+            retries (int): Number of attempts if recognition fails.
+
+        Returns:
+            str: Recognized command in lowercase, or an empty string if recognition fails.
+        """
+        validate_listen_arguments(timeout, phrase_time_limit, retries)
+        started_at = time.perf_counter()
+
+        self.open()
+        if self.capture is not None:
+            self.last_setup_latency = time.perf_counter() - started_at
+            return recognize_with_retries(self.backend, lambda: self._next_utterance(timeout), retries, announce=False)
+
+        if self.needs_calibration():
+            self.calibrate()
+
+        self.last_setup_latency = time.perf_counter() - started_at
+        logging.info(f"Microphone ready after {self.last_setup_latency * 1000:.0f} ms.")
+        return recognize_with_retries(
+            self.backend, lambda: self._capture_phrase(timeout, phrase_time_limit), retries
+        )
+
+    def capture_audio(self, timeout: Optional[int] = None, phrase_time_limit: int = 3) -> sr.AudioData:
+        """
+        Captures the next phrase without transcribing it or speaking any prompt.
+
+        Args:
+            timeout (int, optional): Maximum wait time for a phrase to be started.
+            phrase_time_limit (int): Maximum length of a phrase (in seconds).
+
+        Returns:
+            sr.AudioData: The captured phrase; last_speech_started_at and last_speech_ended_at are updated.
+
+        Raises:
+            sr.WaitTimeoutError: If no phrase started in time.
+        """
+        self.open()
+        started_at = time.perf_counter()
+        if self.capture is not None:
+            audio = self._next_utterance(timeout)
+        else:
+            if self.needs_calibration():
+                self.calibrate()
+            audio = self._capture_phrase(timeout, phrase_time_limit)
+        # Only captured phrases are traced; a poll that timed out is not a listen
+        tracer.record("listen", time.perf_counter() - started_at)
+        return audio
+
+    def _next_utterance(self, timeout: Optional[int]) -> sr.AudioData:
+        utterance = self.capture.next_utterance(timeout)
+        self.last_speech_started_at = utterance.started_at
+        self.last_speech_ended_at = utterance.ended_at
+        return utterance.audio
+
+    def _capture_phrase(self, timeout: Optional[int], phrase_time_limit: int) -> sr.AudioData:
+        audio = self.recognizer.listen(self.source, timeout=timeout, phrase_time_limit=phrase_time_limit)
+        self.last_speech_started_at = None
+        self.last_speech_ended_at = time.monotonic()
+        return audio
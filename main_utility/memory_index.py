@@ -0,0 +1,407 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from config import config
+from main_utility.chatHistory import load_chat_range, CHAT_HISTORY_ID
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+MEMORY_DIR = os.path.join(os.path.expanduser("~"), ".calmora", "memory")
+MEMORY_TOP_K = getattr(config, "MEMORY_TOP_K", 3)
+MIN_MEMORY_SCORE = 0.35  # Cosine similarity below which a past message is not considered relevant
+MIN_MEMORY_CHARS = 20  # Shorter messages ("okay", "thanks") carry no memory worth recalling
+EMBED_BATCH = 96  # Texts per embedding request (Cohere's limit)
+SYNC_PAGE = 5000  # Messages read from storage per page while catching up
+QUERY_CACHE_SIZE = 256
+SAVE_EVERY = 50  # New vectors collected before the disk cache is rewritten
+IVF_TRAIN_SIZE = 20000  # An IVF index searches exactly until it holds this many vectors
+IVF_NPROBE = 8
+KMEANS_ITERATIONS = 10
+CLOSE_TIMEOUT = 30  # Seconds close() waits for the worker to finish the batch it is embedding
+_STOP = object()  # Queued by close(); ends the worker thread
+
+class VectorIndex:
+    """
+    Exact cosine-similarity index over unit-normalised float32 vectors.
+
+    Vectors live in one growable matrix, so a search is a single matrix-vector
+    product. Every vector carries an integer id (the message's seq).
+    """
+
+    def __init__(self, dim: int, capacity: int = 1024):
+        self.dim = dim
+        self._vectors = np.empty((capacity, dim), dtype=np.float32)
+        self._ids = np.empty(capacity, dtype=np.int64)
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:self.size]
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._ids[:self.size]
+
+    def add(self, ids, vectors: np.ndarray) -> None:
+        """
+        Adds vectors (normalised here) under the given ids.
+
+        Args:
+            ids: One integer id per vector.
+            vectors (np.ndarray): Matrix of shape (n, dim).
+        """
+        vectors = normalize(np.asarray(vectors, dtype=np.float32))
+        count = len(vectors)
+        if self.size + count > len(self._vectors):
+            capacity = max(self.size + count, 2 * len(self._vectors))
+            self._vectors = np.resize(self._vectors, (capacity, self.dim))
+            self._ids = np.resize(self._ids, capacity)
+        self._vectors[self.size:self.size + count] = vectors
+        self._ids[self.size:self.size + count] = ids
+        self.size += count
+
+    def search(self, query: np.ndarray, k: int, max_id: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Finds the k vectors most similar to the query.
+
+        Args:
+            query (np.ndarray): Vector of shape (dim,).
+            k (int): Number of results.
+            max_id (int, optional): Only return ids below this one.
+
+        Returns:
+            List[Tuple[int, float]]: (id, cosine similarity) pairs, most similar first.
+        """
+        return self._top_k(np.arange(self.size), normalize(query), k, max_id)
+
+    def _top_k(self, rows: np.ndarray, query: np.ndarray, k: int, max_id: Optional[int]) -> List[Tuple[int, float]]:
+        if not len(rows):
+            return []
+        vectors = self._vectors[:self.size] if len(rows) == self.size else self._vectors[rows]
+        scores = vectors @ query
+        ids = self._ids[rows]
+        if max_id is not None:
+            scores = np.where(ids < max_id, scores, -np.inf)
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(ids[i]), float(scores[i])) for i in best if np.isfinite(scores[i])]
+
+    def save(self, path: str, **extra) -> None:
+        """ Writes the vectors (as float16) and ids to an .npz file. """
+        np.savez(path, vectors=self.vectors.astype(np.float16), ids=self.ids, **extra)
+
+    def load(self, path: str) -> dict:
+        """ Replaces the contents with a file written by save() and returns its extra arrays. """
+        with np.load(path) as data:
+            self.size = 0
+            self.add(data["ids"], data["vectors"].astype(np.float32))
+            return {name: data[name] for name in data.files if name not in ("vectors", "ids")}
+
+class IVFIndex(VectorIndex):
+    """
+    Inverted-file index: vectors are grouped around k-means centroids and a search
+    only scores the groups of the nprobe centroids nearest to the query.
+
+    Below train_size vectors it searches exactly. Once trained, new vectors are
+    assigned to their nearest centroid incrementally; the centroids are retrained
+    when the index has grown fourfold since the last training.
+    """
+
+    def __init__(self, dim: int, nprobe: int = IVF_NPROBE, train_size: int = IVF_TRAIN_SIZE, capacity: int = 1024):
+        super().__init__(dim, capacity)
+        self.nprobe = nprobe
+        self.train_size = train_size
+        self.centroids: Optional[np.ndarray] = None
+        self._lists: List[List[int]] = []
+        self._list_arrays: Dict[int, np.ndarray] = {}
+        self._trained_at = 0
+
+    def add(self, ids, vectors: np.ndarray) -> None:
+        start = self.size
+        super().add(ids, vectors)
+        if self.centroids is None or self.size >= 4 * self._trained_at:
+            if self.size >= self.train_size:
+                self.train()
+            return
+        assignments = np.argmax(self._vectors[start:self.size] @ self.centroids.T, axis=1)
+        for row, cluster in zip(range(start, self.size), assignments):
+            self._lists[cluster].append(row)
+            self._list_arrays.pop(cluster, None)
+
+    def train(self, seed: int = 0) -> None:
+        """ Clusters the stored vectors with spherical k-means and rebuilds the inverted lists. """
+        clusters = max(1, int(np.sqrt(self.size)))
+        rng = np.random.default_rng(seed)
+        sample = self.vectors[rng.choice(self.size, min(self.size, clusters * 32), replace=False)]
+        centroids = sample[rng.choice(len(sample), clusters, replace=False)]
+        for _ in range(KMEANS_ITERATIONS):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]  # Keep centroids that attracted no vectors
+            centroids = normalize(sums)
+
+        self.centroids = centroids
+        assignments = np.concatenate([np.argmax(self._vectors[start:start + 65536] @ centroids.T, axis=1)
+                                      for start in range(0, self.size, 65536)])
+        order = np.argsort(assignments, kind="stable")
+        boundaries = np.searchsorted(assignments[order], np.arange(1, clusters))
+        self._lists = [rows.tolist() for rows in np.split(order, boundaries)]
+        self._list_arrays = {}
+        self._trained_at = self.size
+        logging.info(f"Memory index trained: {clusters} clusters over {self.size} vectors.")
+
+    def search(self, query: np.ndarray, k: int, max_id: Optional[int] = None) -> List[Tuple[int, float]]:
+        if self.centroids is None:
+            return super().search(query, k, max_id)
+        query = normalize(query)
+        probes = np.argsort(-(self.centroids @ query))[:self.nprobe]
+        rows = np.concatenate([self._list_array(cluster) for cluster in probes])
+        return self._top_k(rows, query, k, max_id)
+
+    def _list_array(self, cluster: int) -> np.ndarray:
+        array = self._list_arrays.get(cluster)
+        if array is None:
+            array = self._list_arrays[cluster] = np.array(self._lists[cluster], dtype=np.int64)
+        return array
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """ Scales vectors (or a single vector) to unit length. """
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-10)
+
+class MemoryIndex:
+    """
+    Semantic long-term memory over a conversation's past messages.
+
+    Messages are embedded in batches on a background thread, as they are written,
+    and kept in an IVFIndex. The vectors are cached on disk, so only messages
+    written since the last run are embedded at startup. search() returns the past
+    messages most relevant to the user's latest input.
+
+    Args:
+        storage (Storage): Storage backend holding the messages.
+        embed: Called as embed(texts, input_type) with input_type "search_document"
+            or "search_query"; returns a float matrix with one row per text.
+        record_id (int): Conversation ID.
+    """
+
+    def __init__(self, storage, embed: Callable[[List[str], str], np.ndarray], record_id: int = CHAT_HISTORY_ID,
+                 cache_dir: str = MEMORY_DIR):
+        self.storage = storage
+        self.embed = embed
+        self.record_id = record_id
+        self.cache_path = os.path.join(cache_dir, f"conversation_{record_id}.npz")
+        self.index: Optional[IVFIndex] = None
+        self.texts: Dict[int, Tuple[str, str]] = {}
+        self.indexed_through = 0
+        self.embedded = 0
+        self.embed_requests = 0
+        self.query_cache_hits = 0
+        self._unsaved = 0
+        self._query_cache = OrderedDict()
+        self._pending = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="memory-index", daemon=True)
+
+    def start(self) -> "MemoryIndex":
+        self._thread.start()
+        return self
+
+    def add(self, messages: List[Dict]) -> None:
+        """ Queues newly written messages (each with "seq", "role" and "content") for indexing. """
+        self._pending.put(messages)
+
+    def refresh(self) -> None:
+        """ Queues a catch-up read of every message written since the last indexed one. """
+        self._pending.put(None)
+
+    def embed_query(self, text: str) -> Optional[np.ndarray]:
+        """
+        Embeds a search text ahead of search(), e.g. while the rest of the request is prepared.
+
+        Returns:
+            np.ndarray: The query vector, or None if the index is empty or the request failed.
+        """
+        with self._lock:
+            if self.index is None or not len(self.index):
+                return None
+        try:
+            return self._embed_query(text)
+        except Exception:
+            logging.exception("Failed to embed the memory query.")
+            return None
+
+    def search(self, text: str, k: int = MEMORY_TOP_K, before_seq: Optional[int] = None,
+               query: Optional[np.ndarray] = None) -> List[Dict]:
+        """
+        Finds the past messages most relevant to a text.
+
+        Args:
+            text (str): The user's latest input.
+            k (int): Maximum number of messages to return.
+            before_seq (int, optional): Only consider messages older than this one, e.g. the
+                first message already sent verbatim.
+            query (np.ndarray, optional): The text's vector from embed_query(); embedded here if not given.
+
+        Returns:
+            List[Dict]: Messages with "seq", "role", "content" and "score", most relevant first.
+        """
+        started_at = time.perf_counter()
+        if query is None:
+            query = self.embed_query(text)
+        with self._lock:
+            if query is None or self.index is None or not len(self.index):
+                return []
+            hits = self.index.search(query, k, max_id=before_seq)
+            # Texts of cached vectors are filled in while the index catches up at startup
+            results = [{"seq": seq, "role": self.texts[seq][0], "content": self.texts[seq][1], "score": score}
+                       for seq, score in hits if score >= MIN_MEMORY_SCORE and seq in self.texts]
+        logging.info(f"Recalled {len(results)} memories in {(time.perf_counter() - started_at) * 1000:.0f} ms.")
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"indexed": len(self.index) if self.index is not None else 0, "embedded": self.embedded,
+                    "embed_requests": self.embed_requests, "query_cache_hits": self.query_cache_hits}
+
+    def _embed_query(self, text: str) -> np.ndarray:
+        with self._lock:
+            if text in self._query_cache:
+                self._query_cache.move_to_end(text)
+                self.query_cache_hits += 1
+                return self._query_cache[text]
+        vector = np.asarray(self.embed([text], "search_query"), dtype=np.float32)[0]
+        with self._lock:
+            self._query_cache[text] = vector
+            if len(self._query_cache) > QUERY_CACHE_SIZE:
+                self._query_cache.popitem(last=False)
+        return vector
+
+    def close(self) -> None:
+        """
+        Stops the worker thread and writes vectors that are not in the disk cache yet.
+
+        Messages queued before the call are still indexed. The cache is written by the
+        worker itself, so it never races a save in progress.
+        """
+        if not self._thread.is_alive():
+            self._save_cache()  # Never started, or already stopped
+            return
+        self._pending.put(_STOP)
+        self._thread.join(CLOSE_TIMEOUT)
+        if self._thread.is_alive():
+            logging.warning("Memory index worker did not stop in time; its vectors may not be cached.")
+
+    def _run(self) -> None:
+        try:
+            self._load_cache()
+            self._catch_up()
+            self._save_cache()
+        except Exception:
+            logging.exception("Failed to build the memory index.")
+        while True:
+            messages = self._pending.get()
+            if messages is _STOP:
+                break
+            try:
+                if messages is None:
+                    self._catch_up()
+                else:
+                    # Drain whatever else is waiting, so a burst is embedded in one request
+                    while not self._pending.empty():
+                        more = self._pending.get_nowait()
+                        if more is None or more is _STOP:
+                            self._pending.put(more)
+                            break
+                        messages = messages + more
+                    self._index([m for m in messages if m["seq"] > self.indexed_through])
+                if self._unsaved >= SAVE_EVERY:
+                    self._save_cache()
+            except Exception:
+                logging.exception("Failed to update the memory index.")
+        try:
+            self._save_cache()
+        except Exception:
+            logging.exception("Failed to save the memory cache.")
+
+    def _catch_up(self) -> None:
+        # Rows are read page by page; only those past the cached vectors are embedded
+        after_seq = 0
+        unindexed = []
+        while True:
+            page = load_chat_range(self.storage, self.record_id, after_seq, 2 ** 31 - 1, SYNC_PAGE)
+            if not page:
+                break
+            for message in page:
+                if message["seq"] <= self.indexed_through:
+                    with self._lock:
+                        self.texts[message["seq"]] = (message["role"], message["content"])
+                else:
+                    unindexed.append(message)
+            after_seq = page[-1]["seq"]
+
+        if after_seq < self.indexed_through:
+            # The cache describes messages the storage no longer has
+            logging.warning("Memory cache is ahead of the stored history; rebuilding it.")
+            with self._lock:
+                self.index, self.indexed_through, self.texts = None, 0, {}
+            self._catch_up()
+            return
+        self._index(unindexed)
+
+    def _index(self, messages: List[Dict]) -> None:
+        if not messages:
+            return
+        memorable = [m for m in messages if len(m["content"]) >= MIN_MEMORY_CHARS]
+        for start in range(0, len(memorable), EMBED_BATCH):
+            batch = memorable[start:start + EMBED_BATCH]
+            vectors = np.asarray(self.embed([m["content"] for m in batch], "search_document"), dtype=np.float32)
+            with self._lock:
+                if self.index is None:
+                    self.index = IVFIndex(vectors.shape[1])
+                self.index.add([m["seq"] for m in batch], vectors)
+                for message in batch:
+                    self.texts[message["seq"]] = (message["role"], message["content"])
+                self.embedded += len(batch)
+                self.embed_requests += 1
+                self._unsaved += len(batch)
+        with self._lock:
+            self.indexed_through = max(self.indexed_through, messages[-1]["seq"])
+        logging.info(f"Indexed {len(memorable)} messages into long-term memory (through {self.indexed_through}).")
+
+    def _load_cache(self) -> None:
+        if not os.path.exists(self.cache_path):
+            return
+        with np.load(self.cache_path) as data:
+            dim = data["vectors"].shape[1]
+        index = IVFIndex(dim)
+        extra = index.load(self.cache_path)
+        with self._lock:
+            self.index = index
+            self.indexed_through = int(extra["indexed_through"])
+        logging.info(f"Loaded {len(index)} cached memory vectors (through message {self.indexed_through}).")
+
+    def _save_cache(self) -> None:
+        with self._lock:
+            if self.index is None or not self._unsaved:
+                return
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            temp_path = self.cache_path + ".tmp.npz"
+            self.index.save(temp_path, indexed_through=np.int64(self.indexed_through))
+            self._unsaved = 0
+        os.replace(temp_path, self.cache_path)
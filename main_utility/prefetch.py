@@ -0,0 +1,167 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Iterable, NamedTuple, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+PREFETCH_BUFFER_SIZE = 6  # Decoded phrases kept ready to play
+
+class PreparedAudio(NamedTuple):
+    """ A phrase rendered and decoded ahead of time. """
+    text: str
+    lang: str
+    data: bytes
+    sound: Any  # pygame.mixer.Sound, or whatever the decode callable returns
+    prepared_at: float
+
+class PrefetchScheduler:
+    """
+    Renders and decodes the phrases the assistant is likely to say next, before it says them.
+
+    Callers announce what they expect with expect(): the scheduler fetches those
+    phrases on a background thread (the TTS cache answers most of them without a
+    request), decodes them and keeps the results in a small LRU buffer, so take()
+    hands over a clip that can start playing immediately. A new expect() cancels
+    queued prefetches that are no longer predicted; a fetch already in flight is
+    finished (its audio still lands in the TTS cache) but not decoded.
+
+    Args:
+        fetch: Returns encoded audio for (text, lang), or None.
+        decode: Turns encoded audio into a playable object; may raise.
+        buffer_size (int): Maximum number of decoded phrases kept ready.
+    """
+
+    def __init__(self, fetch: Callable[[str, str], Optional[bytes]], decode: Callable[[bytes], Any],
+                 buffer_size: int = PREFETCH_BUFFER_SIZE):
+        self.fetch = fetch
+        self.decode = decode
+        self.buffer_size = buffer_size
+        self._ready: "OrderedDict[Tuple[str, str], PreparedAudio]" = OrderedDict()
+        self._pending: deque = deque()
+        self._expected = set()
+        self._used = set()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+        self.cancelled = 0
+        self.unused = 0  # Prefetched phrases evicted before anyone played them
+
+    def expect(self, phrases: Iterable[Tuple[str, str]]) -> None:
+        """
+        Replaces the set of phrases predicted to be spoken next.
+
+        Args:
+            phrases: (text, lang) pairs, most likely first.
+        """
+        phrases = list(dict.fromkeys(phrases))[:self.buffer_size]
+        with self._condition:
+            if self._closed:
+                return
+            self._expected = set(phrases)
+            kept = [phrase for phrase in self._pending if phrase in self._expected]
+            self.cancelled += len(self._pending) - len(kept)
+            self._pending = deque(kept)
+            for phrase in phrases:
+                if phrase in self._ready:
+                    self._ready.move_to_end(phrase)
+                elif phrase not in self._pending:
+                    self._pending.append(phrase)
+            self._start()
+            self._condition.notify()
+
+    def take(self, text: str, lang: str) -> Optional[PreparedAudio]:
+        """
+        Returns the prepared clip for a phrase, if it is ready.
+
+        Args:
+            text (str): Phrase to be spoken.
+            lang (str): Language code of the voice.
+
+        Returns:
+            PreparedAudio: The ready clip (it stays buffered for reuse), or None.
+        """
+        with self._condition:
+            prepared = self._ready.get((text, lang))
+            if prepared is None:
+                self.misses += 1
+                return None
+            self._ready.move_to_end((text, lang))
+            self._used.add((text, lang))
+            self.hits += 1
+            return prepared
+
+    def stats(self) -> dict:
+        """ Returns hit/miss and prefetch counters. """
+        with self._condition:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "prefetched": self.prefetched,
+                "cancelled": self.cancelled,
+                "unused": self.unused,
+                "ready": len(self._ready),
+                "pending": len(self._pending),
+            }
+
+    def close(self) -> None:
+        """ Stops the background thread and drops every prepared clip. """
+        with self._condition:
+            self._closed = True
+            self.cancelled += len(self._pending)
+            self._pending.clear()
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._ready.clear()
+
+    def _start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="tts-prefetch", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                phrase = self._pending.popleft()
+            self._prepare(*phrase)
+
+    def _prepare(self, text: str, lang: str) -> None:
+        try:
+            data = self.fetch(text, lang)
+        except Exception:
+            logging.exception("Prefetching speech failed.")
+            return
+        if not data:
+            return
+        with self._condition:
+            if (text, lang) not in self._expected:
+                self.cancelled += 1
+                return
+        try:
+            sound = self.decode(data)
+        except Exception as e:
+            logging.error(f"Failed to decode prefetched speech {text!r}: {e}")
+            return
+        with self._condition:
+            self._ready[(text, lang)] = PreparedAudio(text, lang, data, sound, time.monotonic())
+            self._ready.move_to_end((text, lang))
+            self.prefetched += 1
+            while len(self._ready) > self.buffer_size:
+                evicted, _ = self._ready.popitem(last=False)
+                if evicted not in self._used:
+                    self.unused += 1
+                self._used.discard(evicted)
@@ -0,0 +1,40 @@
+# Fixed phrases spoken by the assistant. Keeping them in one place lets the TTS
+# cache pre-render every one of them at startup.
+
+LISTENING = "Listening..."
+NOT_UNDERSTOOD = "Sorry, I didn't catch that. Please repeat."
+RECOGNITION_UNAVAILABLE = "Sorry, the speech recognition service is currently unavailable."
+LISTEN_TIMEOUT = "Listening timed out. Please try again."
+MAX_RETRIES_REACHED = "Sorry, I couldn't hear you. Please try again."
+
+GREETING = "Hello! How can I assist you today?"
+GOODBYE = "Goodbye!"
+SESSION_EXPIRED = "Session expired. You can wake me up again anytime!"
+GENERIC_ERROR = "Sorry, something went wrong. Please try again."
+
+LANGUAGE_INSTRUCTIONS = {
+    'en': "Select your language. For English, say English. For Hindi, say Hindi.",
+    'hi': "अपनी भाषा का चयन करें। अंग्रेजी के लिए, अंग्रेजी कहें। हिंदी के लिए, हिंदी कहें।"
+}
+
+LANGUAGE_CONFIRMATIONS = {
+    'english': ('en', "English selected!"),
+    'hindi': ('hi', "हिंदी चुनी गई!")
+}
+
+INVALID_LANGUAGE = "Invalid language. Please try again."
+
+SUPPORTED_LANGUAGES = ('en', 'hi')
+
+# (text, language) pairs to pre-render. Conversation prompts are spoken in the
+# user's language voice, so they are rendered for every supported language.
+STATIC_PHRASES = [
+    *((text, 'en') for text in (
+        LISTENING, NOT_UNDERSTOOD, RECOGNITION_UNAVAILABLE, LISTEN_TIMEOUT, MAX_RETRIES_REACHED, INVALID_LANGUAGE
+    )),
+    *((text, lang) for lang in SUPPORTED_LANGUAGES for text in (
+        GREETING, GOODBYE, SESSION_EXPIRED, GENERIC_ERROR
+    )),
+    *((text, lang) for lang, text in LANGUAGE_INSTRUCTIONS.items()),
+    *((text, code) for code, text in LANGUAGE_CONFIRMATIONS.values()),
+]
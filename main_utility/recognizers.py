@@ -0,0 +1,280 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from typing import Dict, List, NamedTuple, Optional, Sequence
+import speech_recognition as sr
+from config import config
+from main_utility.tracing import tracer
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+SPEECH_BACKENDS = getattr(config, "SPEECH_BACKENDS", ["google"])
+VOSK_MODEL_PATH = getattr(config, "VOSK_MODEL_PATH", "model")
+MIN_CONFIDENCE = 0.6  # Racing accepts the first result at least this confident
+RACE_TIMEOUT = 10.0
+
+class RecognitionResult(NamedTuple):
+    """ Transcript produced by a recognizer backend. """
+    text: str
+    confidence: Optional[float]  # None when the engine did not report one
+    backend: str
+    latency: float
+
+class BackendStats:
+    """ Running latency and error counters of one backend. """
+
+    def __init__(self):
+        self.calls = 0
+        self.successes = 0
+        self.no_speech = 0
+        self.errors = 0
+        self.wins = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, outcome: str) -> None:
+        with self._lock:
+            self.calls += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            if outcome == "success":
+                self.successes += 1
+            elif outcome == "no_speech":
+                self.no_speech += 1
+            else:
+                self.errors += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "successes": self.successes,
+                "no_speech": self.no_speech,
+                "errors": self.errors,
+                "wins": self.wins,
+                "mean_latency": self.total_latency / self.calls if self.calls else None,
+                "max_latency": self.max_latency,
+            }
+
+class RecognizerBackend(ABC):
+    """
+    Speech-to-text engine behind a common interface.
+
+    Subclasses implement _recognize(audio), returning (text, confidence) with
+    confidence None when the engine reports none, and raise sr.UnknownValueError
+    when no speech was understood or sr.RequestError when the engine itself failed.
+    """
+
+    name = "backend"
+
+    def __init__(self):
+        self.stats = BackendStats()
+
+    def recognize(self, audio: sr.AudioData) -> RecognitionResult:
+        """
+        Transcribes audio and records latency and outcome.
+
+        Args:
+            audio (sr.AudioData): Captured phrase.
+
+        Returns:
+            RecognitionResult: Transcript with confidence.
+
+        Raises:
+            sr.UnknownValueError: If the speech could not be understood.
+            sr.RequestError: If the engine failed or is unavailable.
+        """
+        started_at = time.perf_counter()
+        outcome = "error"
+        try:
+            text, confidence = self._recognize(audio)
+            outcome = "success"
+        except sr.UnknownValueError:
+            outcome = "no_speech"
+            raise
+        except sr.RequestError:
+            raise
+        except Exception as e:
+            raise sr.RequestError(f"{self.name} failed: {e}") from e
+        finally:
+            latency = time.perf_counter() - started_at
+            self.stats.record(latency, outcome)
+            tracer.record(f"stt.{self.name}", latency, outcome=outcome)
+        return RecognitionResult(text, confidence, self.name, latency)
+
+    @abstractmethod
+    def _recognize(self, audio: sr.AudioData):
+        """ Returns (text, confidence) for the audio. """
+
+class GoogleBackend(RecognizerBackend):
+    """ Google Web Speech API through speech_recognition. """
+
+    name = "google"
+
+    def __init__(self, recognizer: Optional[sr.Recognizer] = None, language: str = "en-US"):
+        super().__init__()
+        self.recognizer = recognizer or sr.Recognizer()
+        self.language = language
+
+    def _recognize(self, audio: sr.AudioData):
+        result = self.recognizer.recognize_google(audio, language=self.language, show_all=True)
+        alternatives = result.get("alternative") if isinstance(result, dict) else None
+        if not alternatives:
+            raise sr.UnknownValueError()
+        best = alternatives[0]
+        # Google only reports confidence for the top alternative, and not always
+        return best["transcript"], best.get("confidence")
+
+class VoskBackend(RecognizerBackend):
+    """
+    Offline recognition with Vosk. Requires the optional `vosk` package and a model
+    directory (see https://alphacephei.com/vosk/models).
+    """
+
+    name = "vosk"
+
+    def __init__(self, model_path: str = VOSK_MODEL_PATH):
+        super().__init__()
+        try:
+            import vosk
+        except ImportError as e:
+            raise ImportError("The vosk backend needs the 'vosk' package: pip install vosk") from e
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        self.model = vosk.Model(model_path)
+
+    def _recognize(self, audio: sr.AudioData):
+        sample_rate = 16000
+        recognizer = self._vosk.KaldiRecognizer(self.model, sample_rate)
+        recognizer.SetWords(True)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=sample_rate, convert_width=2))
+        result = json.loads(recognizer.FinalResult())
+
+        text = result.get("text", "")
+        if not text:
+            raise sr.UnknownValueError()
+        words = result.get("result") or []
+        confidence = sum(word["conf"] for word in words) / len(words) if words else None
+        return text, confidence
+
+class RacingRecognizer(RecognizerBackend):
+    """
+    Sends the same audio to several backends at once and takes the first confident answer.
+
+    A result without a reported confidence never wins early. If no backend reaches
+    min_confidence, the most confident result received before the timeout wins;
+    results without a confidence rank below every reported one. Slower backends
+    keep running in the background so their latency and errors still show up in
+    their stats.
+    """
+
+    name = "race"
+
+    def __init__(self, backends: Sequence[RecognizerBackend], min_confidence: float = MIN_CONFIDENCE,
+                 timeout: float = RACE_TIMEOUT):
+        super().__init__()
+        if not backends:
+            raise ValueError("RacingRecognizer needs at least one backend.")
+        self.backends = list(backends)
+        self.min_confidence = min_confidence
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=len(self.backends) * 2, thread_name_prefix="stt-race")
+
+    def _recognize(self, audio: sr.AudioData):
+        result = self.race(audio)
+        return result.text, result.confidence
+
+    def race(self, audio: sr.AudioData) -> RecognitionResult:
+        """
+        Runs every backend on the audio concurrently.
+
+        Returns:
+            RecognitionResult: The winning result, naming the backend that produced it.
+
+        Raises:
+            sr.UnknownValueError: If every backend finished without understanding speech.
+            sr.RequestError: If every backend failed or none answered in time.
+        """
+        # Each backend runs in a copy of the caller's context, so its spans carry the caller's turn ID
+        futures = {self._executor.submit(contextvars.copy_context().run, backend.recognize, audio): backend
+                   for backend in self.backends}
+        best: Optional[RecognitionResult] = None
+        understood_nothing = 0
+
+        try:
+            for future in as_completed(futures, timeout=self.timeout):
+                try:
+                    result = future.result()
+                except sr.UnknownValueError:
+                    understood_nothing += 1
+                    continue
+                except sr.RequestError as e:
+                    logging.warning(f"Recognizer {futures[future].name} failed: {e}")
+                    continue
+
+                if result.confidence is not None and result.confidence >= self.min_confidence:
+                    best = result
+                    break
+                if result.confidence is None:
+                    if best is None:
+                        best = result
+                elif best is None or best.confidence is None or result.confidence > best.confidence:
+                    best = result
+        except FuturesTimeout:
+            logging.warning("Recognizer race timed out.")
+
+        if best is None:
+            if understood_nothing:
+                raise sr.UnknownValueError()
+            raise sr.RequestError("No speech recognition backend produced a result.")
+
+        next(backend for backend in self.backends if backend.name == best.backend).stats.wins += 1
+        confidence = f"{best.confidence:.2f}" if best.confidence is not None else "not reported"
+        logging.info(f"Recognizer race won by {best.backend} in {best.latency * 1000:.0f} ms "
+                     f"(confidence {confidence}).")
+        return best
+
+    def backend_stats(self) -> Dict[str, dict]:
+        """ Returns the stats of every raced backend, keyed by backend name. """
+        return {backend.name: backend.stats.as_dict() for backend in self.backends}
+
+BACKEND_FACTORIES = {
+    "google": GoogleBackend,
+    "vosk": VoskBackend,
+}
+
+def create_backend(names: List[str] = SPEECH_BACKENDS, recognizer: Optional[sr.Recognizer] = None) -> RecognizerBackend:
+    """
+    Builds the configured recognizer: a single backend, or a race between several.
+
+    Args:
+        names (list): Backend names from BACKEND_FACTORIES, e.g. ["google", "vosk"].
+        recognizer (sr.Recognizer, optional): Recognizer instance for the Google backend.
+
+    Returns:
+        RecognizerBackend: The backend to transcribe with.
+    """
+    backends = []
+    for name in names:
+        if name not in BACKEND_FACTORIES:
+            raise ValueError(f"Unknown speech backend: {name}")
+        try:
+            backend = GoogleBackend(recognizer) if name == "google" else BACKEND_FACTORIES[name]()
+        except Exception as e:
+            logging.error(f"Speech backend {name} unavailable: {e}")
+            continue
+        backends.append(backend)
+
+    if not backends:
+        logging.warning("No configured speech backend could be loaded; using Google.")
+        return GoogleBackend(recognizer)
+    return backends[0] if len(backends) == 1 else RacingRecognizer(backends)
@@ -0,0 +1,126 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+import time
+from typing import List
+from utils.AI_Response import build_messages, stream_chat_text
+from main_utility.tracing import span
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+MEMORY_QUERY_TIMEOUT = 0.3  # Seconds a reply waits for the memory query embedding before going without memories
+
+async def in_thread(function, *args, **kwargs):
+    """
+    Runs a blocking call on the running loop's default executor.
+
+    The call runs in a copy of the caller's context, so spans in the thread carry
+    the caller's turn ID.
+    """
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        None, functools.partial(context.run, function, *args, **kwargs)
+    )
+
+async def prepare_messages(state, context_builder, memory, user_input: str, language: str) -> List[dict]:
+    """
+    Builds the chat request for a reply: the context window over the cached history,
+    the conversation summary and the past messages recalled from long-term memory.
+
+    The memory query is embedded while the history loads. If the embedding has not
+    arrived MEMORY_QUERY_TIMEOUT after it was started, the reply goes without
+    memories; the request still finishes in the background and fills the query cache.
+
+    Args:
+        state (SessionState): Session whose history is sent.
+        context_builder (ContextBuilder): Fits the history into the context window.
+        memory (MemoryIndex, optional): Long-term memory; None sends no memories.
+        user_input (str): The user's latest input.
+        language (str): Reply language.
+
+    Returns:
+        List[dict]: Messages for stream_chat_text().
+    """
+    with span("context"):
+        query = None
+        if memory is not None:
+            started_at = time.monotonic()
+            query = asyncio.ensure_future(in_thread(memory.embed_query, user_input))
+        history = await in_thread(state.history)
+        context = context_builder.build(history)
+        memories = []
+        if query is not None:
+            try:
+                remaining = max(0.0, started_at + MEMORY_QUERY_TIMEOUT - time.monotonic())
+                vector = await asyncio.wait_for(asyncio.shield(query), remaining)
+            except asyncio.TimeoutError:
+                logging.info(f"Memory query not embedded within {MEMORY_QUERY_TIMEOUT * 1000:.0f} ms; "
+                             f"replying without memories.")
+                vector = None
+            if vector is not None:
+                memories = await in_thread(memory.search, user_input, before_seq=context.first_seq, query=vector)
+        return build_messages(user_input, context.messages, language, context.summary, memories)
+
+class ChatStream:
+    """
+    Streams the text deltas of a chat reply from a pool thread into the event loop.
+
+    Iterate with `async for`; a failure of the request is raised from the iteration.
+    close() (or leaving the `with` block) abandons the reply: the producer closes the
+    HTTP response at its next delta, so the rest of the reply is not generated for
+    nothing, and its outcome is retrieved in the background.
+
+    Args:
+        chat_client: Cohere V2 client (or a compatible stand-in).
+        messages (List[dict]): Chat request, e.g. from prepare_messages().
+    """
+
+    def __init__(self, chat_client, messages: List[dict]):
+        self._loop = asyncio.get_running_loop()
+        self._deltas = asyncio.Queue()
+        self._cancel = threading.Event()
+        self._producer = self._loop.run_in_executor(None, contextvars.copy_context().run, self._produce,
+                                                    chat_client, messages)
+
+    def __enter__(self) -> "ChatStream":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __aiter__(self) -> "ChatStream":
+        return self
+
+    async def __anext__(self) -> str:
+        delta = await self._deltas.get()
+        if delta is None:
+            raise StopAsyncIteration
+        if isinstance(delta, Exception):
+            raise delta
+        return delta
+
+    def close(self) -> None:
+        self._cancel.set()
+        if not self._producer.done():
+            self._producer.add_done_callback(lambda future: future.exception())
+
+    def _produce(self, chat_client, messages: List[dict]) -> None:
+        # Runs on a pool thread and hands every text delta to the event loop
+        stream = stream_chat_text(chat_client, messages)
+        try:
+            for text in stream:
+                if self._cancel.is_set():
+                    logging.info("Reply cancelled; closing the chat stream.")
+                    break
+                self._loop.call_soon_threadsafe(self._deltas.put_nowait, text)
+        except Exception as e:
+            self._loop.call_soon_threadsafe(self._deltas.put_nowait, e)
+        finally:
+            stream.close()  # Releases the HTTP response
+            self._loop.call_soon_threadsafe(self._deltas.put_nowait, None)
@@ -0,0 +1,147 @@
+import logging
+import threading
+from typing import Dict, List, Optional
+from main_utility.chatHistory import ChatTurn, ChatWriter, load_chat_history, save_chat_turn, CHAT_HISTORY_ID, HISTORY_LIMIT
+from main_utility.language import get_user_settings, set_user_language
+from main_utility.storage import DEFAULT_USER_ID
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+class CacheStats:
+    """ Hit and miss counters of one cached entry. """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def as_dict(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else None}
+
+class SessionState:
+    """
+    In-process write-through cache of a conversation's history and the user settings.
+
+    This process is the only writer, so after the first load every read is served
+    from memory: saving a turn appends it to the cached history in place and then
+    writes it through to the database (inline, or via a ChatWriter). invalidate()
+    drops cached entries so the next read goes back to the database; a failed
+    write-through does this automatically.
+
+    Args:
+        storage (Storage): Storage backend for loads and inline writes.
+        writer (ChatWriter, optional): Write-behind writer for turns.
+        memory (MemoryIndex, optional): Long-term memory to index saved messages into.
+        record_id (int): Conversation ID.
+        history_limit (int): Most recent messages kept in memory.
+        user_id (int): User whose settings are cached.
+    """
+
+    def __init__(self, storage, writer: Optional[ChatWriter] = None, record_id: int = CHAT_HISTORY_ID,
+                 history_limit: int = HISTORY_LIMIT, memory=None, user_id: int = DEFAULT_USER_ID):
+        self.storage = storage
+        self.writer = writer
+        self.memory = memory
+        self.record_id = record_id
+        self.user_id = user_id
+        self.history_limit = history_limit
+        self.stats: Dict[str, CacheStats] = {"history": CacheStats(), "settings": CacheStats()}
+        self._history: Optional[List[Dict]] = None
+        self._language: Optional[str] = None
+        self._settings_loaded = False
+        self._lock = threading.Lock()
+
+    def history(self) -> List[Dict]:
+        """
+        Returns the recent messages, oldest first, each with "seq", "role" and "content".
+
+        The list is a copy; it does not change when later turns are saved.
+        """
+        with self._lock:
+            if self._history is None:
+                self.stats["history"].misses += 1
+                self._history = load_chat_history(self.storage, record_id=self.record_id,
+                                                  limit=self.history_limit, with_seq=True)
+            else:
+                self.stats["history"].hits += 1
+            return list(self._history)
+
+    def save_turn(self, turn: ChatTurn) -> None:
+        """
+        Appends a turn to the cached history and writes it through to the database.
+
+        With a writer the turn is saved in the background; if that save fails, the
+        cached history and the memory index are reloaded as for a failed inline save.
+
+        Args:
+            turn (ChatTurn): The exchange to save.
+        """
+        added = None
+        with self._lock:
+            if self._history is not None:
+                last_seq = self._history[-1]["seq"] if self._history else 0
+                added = [
+                    {"seq": last_seq + 1, "role": "user", "content": turn.user_content},
+                    {"seq": last_seq + 2, "role": "assistant", "content": turn.assistant_content},
+                ]
+                self._history.extend(added)
+                del self._history[:-self.history_limit]
+
+        if self.writer is not None:
+            self.writer.submit(turn, on_failure=self._write_failed)
+        elif not save_chat_turn(turn, self.storage):
+            # The cache no longer matches the database; reload on the next read
+            self.invalidate("history")
+            added = None
+
+        if self.memory is not None:
+            if added is not None:
+                self.memory.add(added)
+            else:
+                self.memory.refresh()
+
+    def _write_failed(self, turn: ChatTurn) -> None:
+        # Runs on the writer thread; the cache and the index hold a turn the database does not
+        logging.warning(f"Write-behind save failed for record {turn.record_id}; reloading history and memory.")
+        self.invalidate("history")
+        if self.memory is not None:
+            self.memory.refresh()
+
+    @property
+    def language(self) -> Optional[str]:
+        """ The user's preferred language code, or None if it was never set. """
+        with self._lock:
+            if not self._settings_loaded:
+                self.stats["settings"].misses += 1
+                self._language = get_user_settings(self.storage, self.user_id)
+                self._settings_loaded = True
+            else:
+                self.stats["settings"].hits += 1
+            return self._language
+
+    def set_language(self, language: str) -> None:
+        """ Updates the cached language and writes it through to the database. """
+        with self._lock:
+            self._language = language
+            self._settings_loaded = True
+        set_user_language(self.storage, language, self.user_id)
+
+    def invalidate(self, entry: Optional[str] = None) -> None:
+        """
+        Drops a cached entry ("history" or "settings"), or every entry if none is given.
+        """
+        with self._lock:
+            if entry in (None, "history"):
+                self._history = None
+            if entry in (None, "settings"):
+                self._language = None
+                self._settings_loaded = False
+        logging.info(f"Session cache invalidated: {entry or 'all'}.")
+
+    def cache_stats(self) -> Dict[str, dict]:
+        """ Returns the hit and miss counters of every cached entry. """
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
@@ -1,10 +1,19 @@
 import logging
+import queue
+import threading
 import pygame
-import tempfile
 import requests
 import time
-import os
-from config.config import GET_ELEVENLAB_API_KEY, BRITTENY_HART_VOICE_ID, REVA_HINDI_VOICE_ID
+from dataclasses import dataclass
+from typing import Optional
+from main_utility.audio_frames import FrameSplitter, probe_stream
+from main_utility.audio_buffers import BufferReader, audio_buffers
+from main_utility.tts_cache import tts_cache, make_cache_key
+from main_utility.prefetch import PrefetchScheduler
+from main_utility.api_keys import key_manager, ElevenLabsKeysExhausted, REJECTED_STATUS_CODES, ELEVENLABS_BASE_URL
+from main_utility.http_client import http_client
+from main_utility.tracing import span, traced
+from config.config import BRITTENY_HART_VOICE_ID, REVA_HINDI_VOICE_ID
 
 # Configure logging
 logging.basicConfig(
@@ -12,41 +21,172 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-def speak(text: str, lang: str = 'en', is_stream: bool = False) -> None:
+STREAM_CHUNK_SIZE = 1024
+STREAM_BUFFER_CHUNKS = 64  # Bounded hand-off between the network thread and the player
+STREAM_FIRST_SEGMENT_BYTES = 4 * 1024  # ~0.25s at 128 kbps, played as soon as it arrives
+STREAM_SEGMENT_BYTES = 16 * 1024
+PLAYBACK_POLL_INTERVAL = 0.02  # How often blocking playback checks whether the clip has ended
+
+@dataclass
+class PlaybackStats:
+    """ Timings collected while streaming an audio response. """
+    bytes_received: int = 0
+    segments: int = 0
+    underruns: int = 0
+    time_to_first_byte: Optional[float] = None
+    time_to_first_audio: Optional[float] = None
+    total_time: float = 0.0
+
+def speak(text: str, lang: str = 'en', is_stream: bool = False, cache: bool = False) -> None:
     """
     Sends text to ElevenLabs TTS API and plays the returned audio.
     
     Args:
         text (str): The text to be converted to speech.
         lang (str): Language code, 'en' for English or 'hi' for Hindi.
-        is_stream (bool): Whether to stream the audio.
+        is_stream (bool): Whether to stream the audio, starting playback before the download completes.
+        cache (bool): Whether to serve the audio from the phrase cache. Use for fixed prompts only.
     """
-    api_key = GET_ELEVENLAB_API_KEY()
-    url = generate_url(lang, is_stream)
-    headers = create_headers(api_key)
-    data = create_payload(text)
+    if cache:
+        prepared = prefetcher.take(text, lang)
+        if prepared is not None:
+            play_sound(prepared.sound)  # Already fetched and decoded in the background
+            return
+        audio = get_cached_audio(text, lang)
+        if audio:
+            play_audio_bytes(audio)
+        return
 
-    response = requests.post(url, headers=headers, json=data, stream=True)
+    started_at = time.perf_counter()
+    url = generate_url(lang, is_stream)
+    try:
+        response = request_tts(url, text, stream=True)
+    except (ElevenLabsKeysExhausted, requests.RequestException) as e:
+        logging.error("Cannot speak: %s", e)
+        return
 
-    if response.status_code == 200:
+    with response:  # Hands the connection back to the pool even if playback stops early
+        if response.status_code != 200:
+            logging.error("Failed to get audio response: %s %s", response.status_code, response.text)
+            return
         logging.info("Received audio response from API.")
-        try:
-            temp_file_path = save_audio_to_temp_file(response)
-            if validate_audio_file(temp_file_path):
-                play_audio(temp_file_path)
-            else:
-                logging.error("Audio file validation failed.")
-        finally:
-            cleanup_temp_file(temp_file_path)
-    else:
+        if is_stream:
+            stream_audio(response, started_at)
+            return
+        with audio_buffers.borrow() as buffer:
+            try:
+                read_response_into(response, buffer)
+            except requests.RequestException as e:
+                logging.error("Audio download failed: %s", e)
+                return
+            if validate_audio(buffer):
+                play_audio_bytes(buffer)
+
+def get_cached_audio(text: str, lang: str) -> Optional[bytes]:
+    """
+    Returns the rendered audio for a phrase, fetching and caching it on a miss.
+
+    Args:
+        text (str): The text to be converted to speech.
+        lang (str): Language code, 'en' for English or 'hi' for Hindi.
+
+    Returns:
+        bytes: Encoded audio, or None if it could not be fetched.
+    """
+    key = make_cache_key(get_voice_id(lang), create_payload(text))
+    audio = tts_cache.get(key)
+    if audio is None:
+        audio = fetch_audio(text, lang)
+        if audio:
+            tts_cache.put(key, audio)
+    return audio
+
+def prewarm_cache(phrases) -> None:
+    """
+    Renders every phrase that is not cached yet, so later requests for it need no network.
+
+    Args:
+        phrases: Iterable of (text, lang) pairs.
+    """
+    fetched = 0
+    for text, lang in phrases:
+        key = make_cache_key(get_voice_id(lang), create_payload(text))
+        if key in tts_cache:
+            continue
+        audio = fetch_audio(text, lang)
+        if audio:
+            tts_cache.put(key, audio)
+            fetched += 1
+    logging.info(f"TTS cache pre-warmed; {fetched} phrases fetched.")
+
+@traced("tts.fetch")
+def fetch_audio(text: str, lang: str) -> Optional[bytes]:
+    """
+    Downloads the complete rendered audio for a text without playing it.
+
+    Args:
+        text (str): The text to be converted to speech.
+        lang (str): Language code, 'en' for English or 'hi' for Hindi.
+
+    Returns:
+        bytes: Encoded audio, or None if the request failed.
+    """
+    try:
+        response = request_tts(generate_url(lang, False), text)
+    except (ElevenLabsKeysExhausted, requests.RequestException) as e:
+        logging.error("Cannot fetch audio: %s", e)
+        return None
+
+    if response.status_code != 200:
         logging.error("Failed to get audio response: %s %s", response.status_code, response.text)
+        return None
+    if not validate_audio(response.content):
+        return None  # Not cached, so a bad response is not replayed later
+    return response.content
+
+def request_tts(url: str, text: str, stream: bool = False):
+    """
+    Posts a TTS request, rotating to the next API key if the current one is rejected.
+
+    Args:
+        url (str): TTS endpoint from generate_url.
+        text (str): The text to be converted to speech.
+        stream (bool): Whether to leave the response body unread for streaming.
+
+    Returns:
+        Response object of the last attempt.
+
+    Raises:
+        ElevenLabsKeysExhausted: If every key is rejected or out of quota.
+        requests.RequestException: If the API could not be reached, even after retries.
+    """
+    payload = create_payload(text)
+    for _ in range(key_manager.key_count):
+        api_key = key_manager.get_key()
+        with span("tts.request", chars=len(text)) as attributes:
+            response = http_client.post(url, headers=create_headers(api_key), json=payload, stream=stream)
+            attributes["status"] = response.status_code
+        if response.status_code in REJECTED_STATUS_CODES:
+            response.close()
+            key_manager.report_rejection(api_key, response.status_code)
+            continue
+        if response.status_code == 200:
+            key_manager.record_usage(api_key, len(text))
+        return response
+    raise ElevenLabsKeysExhausted("Every ElevenLabs API key was rejected.")
+
+def get_voice_id(lang: str) -> str:
+    """
+    Returns the ElevenLabs voice used for a language.
+    """
+    return BRITTENY_HART_VOICE_ID if lang == "en" else REVA_HINDI_VOICE_ID
 
 def generate_url(lang: str, is_stream: bool) -> str:
     """
     Generates the appropriate ElevenLabs API URL based on language and streaming choice.
     """
-    voice_id = BRITTENY_HART_VOICE_ID if lang == "en" else REVA_HINDI_VOICE_ID
-    url = f'https://api.elevenlabs.io/v1/text-to-speech/{voice_id}'
+    voice_id = get_voice_id(lang)
+    url = f'{ELEVENLABS_BASE_URL}/v1/text-to-speech/{voice_id}'
     if is_stream:
         url += "/stream"
     logging.info(f"Using URL: {url}")
@@ -75,69 +215,215 @@ def create_payload(text: str) -> dict:
         }
     }
 
-def save_audio_to_temp_file(response) -> str:
+@traced("tts.download")
+def read_response_into(response, buffer: bytearray) -> None:
     """
-    Saves the streamed audio response to a temporary file.
-    
+    Reads a streamed audio response into a memory buffer.
+
     Args:
-        response: Response object from the API request.
-        
-    Returns:
-        str: Path to the saved temporary file.
+        response: Response object from the API request, opened with stream=True.
+        buffer (bytearray): Buffer to append the audio to, usually borrowed from audio_buffers.
     """
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as temp_file:
-        temp_file_path = temp_file.name
-        logging.info(f"Saving audio to temp file: {temp_file_path}")
-        for chunk in response.iter_content(chunk_size=1024):
-            if chunk:
-                temp_file.write(chunk)
-    return temp_file_path
+    for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE * 16):
+        buffer.extend(chunk)
+    logging.info(f"Received {len(buffer)} bytes of audio.")
 
-def validate_audio_file(file_path: str) -> bool:
+def validate_audio(data) -> bool:
     """
-    Validates the audio file by checking its size.
-    
+    Validates audio by walking its MPEG frame headers.
+
     Args:
-        file_path (str): Path to the audio file.
-        
+        data: Bytes-like object holding the encoded audio.
+
     Returns:
-        bool: True if file is valid, False otherwise.
+        bool: True if the data is a well-formed MP3 stream, False otherwise.
     """
-    file_size = os.path.getsize(file_path)
-    if file_size < 1024:
-        logging.error("Error: MP3 file is too small and likely invalid.")
+    info = probe_stream(data)
+    if info is None:
+        logging.error(f"Audio validation failed: {len(data)} bytes without a valid chain of MP3 frames.")
         return False
-    logging.info("Audio file validated successfully.")
+    logging.info(f"Audio validated: {info.frames} frames, {info.duration:.2f}s.")
     return True
 
-def play_audio(file_path: str) -> None:
+@traced("playback")
+def play_audio_bytes(data) -> None:
     """
-    Plays the audio file using pygame.
-    
+    Plays encoded audio held in memory using pygame.
+
+    The mixer reads the data in place, so a pooled buffer can be passed without
+    copying it; it must not change until this returns.
+
     Args:
-        file_path (str): Path to the audio file to play.
+        data: Bytes-like object holding encoded MP3 audio.
     """
     if not pygame.mixer.get_init():
         pygame.mixer.init()
-        
-    pygame.mixer.music.load(file_path)
-    pygame.mixer.music.play()
-    
-    logging.info("Playing audio.")
-    while pygame.mixer.music.get_busy():
-        time.sleep(0.1)
 
-def cleanup_temp_file(file_path: str) -> None:
+    reader = BufferReader(data)
+    try:
+        pygame.mixer.music.load(reader, "mp3")
+        pygame.mixer.music.play()
+        logging.info("Playing audio from memory.")
+        while pygame.mixer.music.get_busy():
+            time.sleep(PLAYBACK_POLL_INTERVAL)
+    finally:
+        pygame.mixer.music.unload()  # Releases the reader before the buffer can be reused
+        reader.close()
+
+def decode_audio(data: bytes) -> pygame.mixer.Sound:
     """
-    Cleans up the temporary audio file after playback.
-    
+    Decodes encoded audio into a pygame Sound that starts playing without further work.
+
     Args:
-        file_path (str): Path to the temporary file.
-    """
-    if file_path and os.path.exists(file_path):
-        try:
-            pygame.mixer.music.unload()  # Ensure Pygame is done with the file
-            os.remove(file_path)
-            logging.info(f"Temporary file {file_path} deleted.")
-        except Exception as e:
-            logging.error(f"Failed to delete temporary file {file_path}: {e}")
\ No newline at end of file
+        data (bytes): Encoded MP3 audio.
+
+    Returns:
+        pygame.mixer.Sound: The decoded clip.
+
+    Raises:
+        pygame.error: If the data cannot be decoded.
+    """
+    if not pygame.mixer.get_init():
+        pygame.mixer.init()
+    with BufferReader(data) as reader:
+        return pygame.mixer.Sound(file=reader)
+
+@traced("playback")
+def play_sound(sound: pygame.mixer.Sound) -> None:
+    """
+    Plays a decoded clip and waits until it has finished.
+
+    Args:
+        sound (pygame.mixer.Sound): Clip from decode_audio.
+    """
+    channel = sound.play()
+    if channel is None:
+        logging.error("No free mixer channel to play audio.")
+        return
+    logging.info("Playing prefetched audio.")
+    while channel.get_busy():
+        time.sleep(PLAYBACK_POLL_INTERVAL)
+
+def stop_playback() -> None:
+    """ Stops whatever is playing; a blocked play_audio_bytes call returns right away. """
+    if pygame.mixer.get_init():
+        pygame.mixer.music.stop()
+        pygame.mixer.stop()
+
+@traced("tts.stream")
+def stream_audio(response, started_at: Optional[float] = None) -> PlaybackStats:
+    """
+    Plays a streamed audio response while it is still downloading.
+
+    A producer thread copies response chunks into a bounded queue. This thread splits
+    them into whole MP3 frames, decodes small groups of frames and queues them on a
+    mixer channel, so the first audio plays once the first few KB have arrived.
+
+    Args:
+        response: Streaming response object from the API request.
+        started_at (float, optional): perf_counter() timestamp the request was started at.
+
+    Returns:
+        PlaybackStats: Byte counts and timings for the playback.
+    """
+    started_at = started_at if started_at is not None else time.perf_counter()
+    stats = PlaybackStats()
+    chunks = queue.Queue(maxsize=STREAM_BUFFER_CHUNKS)
+    stop_event = threading.Event()
+    producer = threading.Thread(target=_produce_chunks, args=(response, chunks, stop_event), daemon=True)
+    producer.start()
+
+    if not pygame.mixer.get_init():
+        pygame.mixer.init()
+    channel = pygame.mixer.find_channel(True)
+
+    splitter = FrameSplitter()
+    segment = bytearray()
+    segment_target = STREAM_FIRST_SEGMENT_BYTES
+
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                break
+            if isinstance(chunk, Exception):
+                logging.error("Audio stream interrupted: %s", chunk)
+                break
+
+            if stats.time_to_first_byte is None:
+                stats.time_to_first_byte = time.perf_counter() - started_at
+            stats.bytes_received += len(chunk)
+
+            for frame in splitter.feed(chunk):
+                segment.extend(frame)
+            if len(segment) >= segment_target:
+                _play_segment(channel, segment, stats, started_at)
+                segment = bytearray()
+                segment_target = STREAM_SEGMENT_BYTES
+
+        if segment:
+            _play_segment(channel, segment, stats, started_at)
+
+        while channel.get_busy():
+            time.sleep(0.05)
+    finally:
+        stop_event.set()
+        response.close()
+        producer.join(timeout=1)
+
+    stats.total_time = time.perf_counter() - started_at
+    if stats.time_to_first_audio is None:
+        logging.error("Audio stream contained no playable frames.")
+    else:
+        logging.info(
+            "Streamed %d bytes in %d segments; time to first audio %.0f ms, total %.0f ms, %d underruns.",
+            stats.bytes_received, stats.segments, stats.time_to_first_audio * 1000,
+            stats.total_time * 1000, stats.underruns
+        )
+    return stats
+
+def _produce_chunks(response, chunks: queue.Queue, stop_event: threading.Event) -> None:
+    """
+    Copies response chunks into the playback queue until the stream ends or playback stops.
+    """
+    def put(item) -> bool:
+        while not stop_event.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+            if chunk and not put(chunk):
+                return
+        put(None)
+    except Exception as e:
+        put(e)
+
+def _play_segment(channel, segment: bytearray, stats: PlaybackStats, started_at: float) -> None:
+    """
+    Decodes a group of MP3 frames and queues it behind the audio already playing.
+    """
+    with BufferReader(segment) as reader:
+        sound = pygame.mixer.Sound(file=reader)
+
+    # A channel holds one playing and one queued sound; wait for the queue slot to free up
+    while channel.get_queue() is not None:
+        time.sleep(0.01)
+
+    if channel.get_busy():
+        channel.queue(sound)
+    else:
+        if stats.segments:
+            stats.underruns += 1
+        channel.play(sound)
+
+    if stats.time_to_first_audio is None:
+        stats.time_to_first_audio = time.perf_counter() - started_at
+    stats.segments += 1
+
+# Likely next prompts, fetched and decoded in the background; see expect() callers
+prefetcher = PrefetchScheduler(get_cached_audio, decode_audio)
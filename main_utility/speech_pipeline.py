@@ -0,0 +1,186 @@
+import logging
+import queue
+import re
+import threading
+import time
+from typing import Callable, List, Optional
+from main_utility.speaking import fetch_audio, play_audio_bytes
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+MAX_PENDING_AUDIO = 3  # Sentences fetched ahead of playback
+MIN_SENTENCE_CHARS = 12  # Shorter fragments are merged into the next sentence
+
+# Sentence end: terminal punctuation (including the Devanagari danda) followed by whitespace
+SENTENCE_END = re.compile(r'(?<=[.!?।])["\')\]]*\s+|\n+')
+ABBREVIATIONS = ("mr.", "mrs.", "ms.", "dr.", "e.g.", "i.e.", "etc.", "vs.")
+
+class SentenceSplitter:
+    """
+    Splits incrementally arriving text into sentences.
+
+    A sentence is emitted as soon as its terminating punctuation and the following
+    whitespace have arrived, so the first sentence can be spoken while the rest of
+    the reply is still being generated.
+    """
+
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """
+        Adds text and returns every sentence it completed.
+
+        Args:
+            text (str): Next piece of the reply.
+
+        Returns:
+            List[str]: Completed sentences, in order.
+        """
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in SENTENCE_END.finditer(self._buffer):
+            candidate = self._buffer[start:match.start()].strip()
+            if len(candidate) < self.min_chars or candidate.lower().endswith(ABBREVIATIONS):
+                continue
+            sentences.append(candidate)
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        """ Returns whatever text is left once the stream has ended. """
+        remainder = self._buffer.strip()
+        self._buffer = ""
+        return remainder or None
+
+class SpeechPipeline:
+    """
+    Speaks a reply sentence by sentence while it is still being generated.
+
+    feed() splits the incoming text into sentences. A fetch thread renders each
+    sentence to audio, and a playback thread plays the rendered sentences in order,
+    so sentence N+1 is downloaded while sentence N plays. At most max_pending
+    rendered sentences wait for playback.
+
+    Time to first audio is measured from started_at, normally the moment the user
+    stopped speaking (time.monotonic()).
+    """
+
+    def __init__(self, lang: str, started_at: Optional[float] = None,
+                 fetch: Callable[[str, str], Optional[bytes]] = fetch_audio,
+                 play: Callable[[bytes], None] = play_audio_bytes, max_pending: int = MAX_PENDING_AUDIO):
+        self.lang = lang
+        self.started_at = started_at if started_at is not None else time.monotonic()
+        self.fetch = fetch
+        self.play = play
+        self.splitter = SentenceSplitter()
+        self.sentences = queue.Queue()
+        self.audio = queue.Queue(maxsize=max_pending)
+        self.parts: List[str] = []
+        self.sentence_count = 0
+        self.time_to_first_text = None
+        self.time_to_first_audio = None
+        self.total_time = None
+        self._cancelled = threading.Event()
+        self._fetch_thread = threading.Thread(target=self._fetch_loop, name="tts-fetch", daemon=True)
+        self._play_thread = threading.Thread(target=self._play_loop, name="tts-play", daemon=True)
+
+    @property
+    def text(self) -> str:
+        """ The complete text fed so far. """
+        return "".join(self.parts)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def start(self) -> "SpeechPipeline":
+        self._fetch_thread.start()
+        self._play_thread.start()
+        return self
+
+    def feed(self, text: str) -> None:
+        """
+        Adds a piece of generated text, queueing every sentence it completes.
+
+        Args:
+            text (str): Next piece of the reply.
+        """
+        if not text or self.cancelled:
+            return
+        if self.time_to_first_text is None:
+            self.time_to_first_text = time.monotonic() - self.started_at
+        self.parts.append(text)
+        for sentence in self.splitter.feed(text):
+            self._queue_sentence(sentence)
+
+    def finish(self) -> None:
+        """ Queues the remaining text and waits until everything has been spoken. """
+        remainder = self.splitter.flush()
+        if remainder:
+            self._queue_sentence(remainder)
+        self.sentences.put(None)
+        self._fetch_thread.join()
+        self._play_thread.join()
+
+        self.total_time = time.monotonic() - self.started_at
+        if self.time_to_first_audio is not None:
+            logging.info(
+                f"Spoke {self.sentence_count} sentences; end of speech to first text "
+                f"{(self.time_to_first_text or 0) * 1000:.0f} ms, to first audio {self.time_to_first_audio * 1000:.0f} ms, "
+                f"total {self.total_time * 1000:.0f} ms."
+            )
+
+    def cancel(self) -> None:
+        """ Stops fetching and playing any sentence that has not started yet. """
+        self._cancelled.set()
+        self.sentences.put(None)
+
+    def _queue_sentence(self, sentence: str) -> None:
+        self.sentence_count += 1
+        self.sentences.put(sentence)
+
+    def _fetch_loop(self) -> None:
+        try:
+            while not self.cancelled:
+                sentence = self.sentences.get()
+                if sentence is None:
+                    break
+                audio = self.fetch(sentence, self.lang)
+                if audio:
+                    self._put_audio(audio)
+        except Exception:
+            logging.exception("Failed to fetch speech audio.")
+        finally:
+            self._put_audio(None, force=True)
+
+    def _put_audio(self, audio: Optional[bytes], force: bool = False) -> None:
+        while force or not self.cancelled:
+            try:
+                self.audio.put(audio, timeout=0.1)
+                return
+            except queue.Full:
+                if force and self.cancelled:
+                    return
+
+    def _play_loop(self) -> None:
+        while not self.cancelled:
+            try:
+                audio = self.audio.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if audio is None:
+                return
+            if self.time_to_first_audio is None:
+                self.time_to_first_audio = time.monotonic() - self.started_at
+            try:
+                self.play(audio)
+            except Exception:
+                logging.exception("Failed to play speech audio.")
@@ -0,0 +1,362 @@
+import json
+from abc import ABC, abstractmethod
+import logging
+import os
+import sqlite3
+import threading
+from typing import List, Optional, Tuple
+from config import config
+from main_utility.chatHistory import ChatTurn, MESSAGES_TABLE, TURNS_TABLE, SUMMARIES_TABLE
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+STORAGE_BACKEND = getattr(config, "STORAGE_BACKEND", "mysql")
+SQLITE_PATH = getattr(config, "SQLITE_PATH", os.path.join(os.path.expanduser("~"), ".calmora", "calmora.db"))
+SQLITE_BUSY_TIMEOUT_MS = 5000  # How long a writer waits for another thread's write lock
+DEFAULT_LANGUAGE = 'en'
+DEFAULT_USER_ID = 1  # The single user of a desktop install; the server keys settings by its own user IDs
+
+Row = Tuple[int, str, str]  # (seq, role, content)
+
+class Storage(ABC):
+    """
+    Persistence of conversations and user settings, independent of the database engine.
+
+    Implementations must be safe to call from several threads at once (the
+    conversation, the chat writer and the summary thread), and must implement every
+    abstract method; an incomplete backend cannot be instantiated.
+    """
+
+    name = "storage"
+
+    @abstractmethod
+    def setup(self) -> None:
+        """ Creates missing tables and initial entries. """
+
+    @abstractmethod
+    def load_messages(self, record_id: int, limit: Optional[int], before_seq: Optional[int]) -> List[Row]:
+        """ Returns the most recent messages (below before_seq, if given), oldest first. """
+
+    @abstractmethod
+    def load_message_range(self, record_id: int, after_seq: int, before_seq: int, limit: int) -> List[Row]:
+        """ Returns the oldest messages between two sequence numbers (exclusive), oldest first. """
+
+    @abstractmethod
+    def append_message(self, record_id: int, role: str, content: str) -> None:
+        """ Appends one message with the next sequence number. """
+
+    @abstractmethod
+    def save_turn(self, turn: ChatTurn) -> None:
+        """ Saves both messages of a turn and its metadata in one transaction. """
+
+    @abstractmethod
+    def load_summary(self, record_id: int) -> Optional[Tuple[str, int]]:
+        """ Returns (summary, through_seq), or None if the conversation has no summary. """
+
+    @abstractmethod
+    def save_summary(self, record_id: int, summary: str, through_seq: int) -> None:
+        """ Replaces the conversation's summary, which covers messages up to through_seq. """
+
+    @abstractmethod
+    def load_language(self, user_id: int = DEFAULT_USER_ID) -> Optional[str]:
+        """ Returns the user's language code, or None if it was never saved. """
+
+    @abstractmethod
+    def save_language(self, language: str, user_id: int = DEFAULT_USER_ID) -> None:
+        """ Saves the user's language code. """
+
+    def close(self) -> None:
+        """ Releases every connection. """
+
+class MySQLStorage(Storage):
+    """
+    Storage on a MySQL server, through a ConnectionPool.
+
+    Reads and upserts are retried on a lost connection; saving a turn is not,
+    because its commit may already have been applied.
+    """
+
+    name = "mysql"
+
+    def __init__(self, pool=None):
+        # Imported here so the SQLite backend runs without mysql-connector installed
+        from main_utility.database import ConnectionPool
+        self.pool = pool or ConnectionPool()
+
+    def setup(self) -> None:
+        from main_utility.database import initialize_tables, ensure_initial_entries, migrate_chat_history
+        initialize_tables(self.pool)
+        ensure_initial_entries(self.pool)
+        migrate_chat_history(self.pool)
+
+    def load_messages(self, record_id: int, limit: Optional[int], before_seq: Optional[int]) -> List[Row]:
+        query = f"SELECT seq, role, content FROM {MESSAGES_TABLE} WHERE conversation_id = %s"
+        params = [record_id]
+        if before_seq is not None:
+            query += " AND seq < %s"
+            params.append(before_seq)
+        query += " ORDER BY seq DESC"
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(limit)
+        return list(reversed(self.pool.fetch_all(query, tuple(params))))
+
+    def load_message_range(self, record_id: int, after_seq: int, before_seq: int, limit: int) -> List[Row]:
+        return self.pool.fetch_all(
+            f"SELECT seq, role, content FROM {MESSAGES_TABLE} WHERE conversation_id = %s AND seq > %s AND seq < %s "
+            f"ORDER BY seq LIMIT %s",
+            (record_id, after_seq, before_seq, limit)
+        )
+
+    def append_message(self, record_id: int, role: str, content: str) -> None:
+        def append(db, cursor):
+            # The next sequence number comes from the (conversation_id, seq) index, not a table scan
+            cursor.execute(f"""
+                INSERT INTO {MESSAGES_TABLE} (conversation_id, seq, role, content)
+                SELECT %s, COALESCE(MAX(seq), 0) + 1, %s, %s FROM {MESSAGES_TABLE} WHERE conversation_id = %s;
+            """, (record_id, role, content, record_id))
+            db.commit()
+
+        self.pool.run(append)
+
+    def save_turn(self, turn: ChatTurn) -> None:
+        def insert(db, cursor):
+            # Lock the conversation's newest row so concurrent writers cannot take the same seq
+            cursor.execute(
+                f"SELECT COALESCE(MAX(seq), 0) FROM {MESSAGES_TABLE} WHERE conversation_id = %s FOR UPDATE",
+                (turn.record_id,)
+            )
+            last_seq = cursor.fetchone()[0]
+
+            cursor.executemany(
+                f"INSERT INTO {MESSAGES_TABLE} (conversation_id, seq, role, content) VALUES (%s, %s, %s, %s)",
+                [
+                    (turn.record_id, last_seq + 1, "user", turn.user_content),
+                    (turn.record_id, last_seq + 2, "assistant", turn.assistant_content),
+                ]
+            )
+            cursor.execute(
+                f"INSERT INTO {TURNS_TABLE} (conversation_id, user_seq, language, metadata) VALUES (%s, %s, %s, %s)",
+                (turn.record_id, last_seq + 1, turn.language, json.dumps(turn.metadata) if turn.metadata else None)
+            )
+            db.commit()
+
+        # Uncommitted work is rolled back when the connection returns to the pool
+        self.pool.run(insert)
+
+    def load_summary(self, record_id: int) -> Optional[Tuple[str, int]]:
+        rows = self.pool.fetch_all(
+            f"SELECT summary, through_seq FROM {SUMMARIES_TABLE} WHERE conversation_id = %s", (record_id,)
+        )
+        return rows[0] if rows else None
+
+    def save_summary(self, record_id: int, summary: str, through_seq: int) -> None:
+        def upsert(db, cursor):
+            cursor.execute(f"""
+                INSERT INTO {SUMMARIES_TABLE} (conversation_id, summary, through_seq) VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE summary = VALUES(summary), through_seq = VALUES(through_seq);
+            """, (record_id, summary, through_seq))
+            db.commit()
+
+        # An upsert of the same values can safely run twice
+        self.pool.run(upsert, idempotent=True)
+
+    def load_language(self, user_id: int = DEFAULT_USER_ID) -> Optional[str]:
+        rows = self.pool.fetch_all("SELECT language FROM user_settings WHERE id = %s", (user_id,))
+        return rows[0][0] if rows else None
+
+    def save_language(self, language: str, user_id: int = DEFAULT_USER_ID) -> None:
+        def upsert(db, cursor):
+            cursor.execute("""
+                INSERT INTO user_settings (id, language) VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE language = VALUES(language);
+            """, (user_id, language))
+            db.commit()
+
+        self.pool.run(upsert, idempotent=True)
+
+    def close(self) -> None:
+        self.pool.close()
+
+class SQLiteStorage(Storage):
+    """
+    Embedded storage in a local SQLite file, for a single-user desktop install.
+
+    The database runs in WAL mode, so the conversation thread keeps reading while
+    the writer or summary thread commits. Each thread gets its own connection, and
+    every statement is a constant string, so sqlite3's per-connection statement
+    cache prepares each one only once.
+
+    Args:
+        path (str): Database file. ":memory:" is rejected: every thread would get its own
+            empty database.
+    """
+
+    name = "sqlite"
+
+    SCHEMA = (
+        f"""CREATE TABLE IF NOT EXISTS {MESSAGES_TABLE} (
+            id INTEGER PRIMARY KEY,
+            conversation_id INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+            UNIQUE (conversation_id, seq)
+        )""",
+        f"""CREATE TABLE IF NOT EXISTS {TURNS_TABLE} (
+            id INTEGER PRIMARY KEY,
+            conversation_id INTEGER NOT NULL,
+            user_seq INTEGER NOT NULL,
+            language TEXT,
+            metadata TEXT,
+            created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+        )""",
+        f"CREATE INDEX IF NOT EXISTS idx_conversation_turn ON {TURNS_TABLE} (conversation_id, user_seq)",
+        f"""CREATE TABLE IF NOT EXISTS {SUMMARIES_TABLE} (
+            conversation_id INTEGER PRIMARY KEY,
+            summary TEXT NOT NULL,
+            through_seq INTEGER NOT NULL,
+            updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+        )""",
+        """CREATE TABLE IF NOT EXISTS user_settings (
+            id INTEGER PRIMARY KEY,
+            language TEXT NOT NULL
+        )""",
+    )
+
+    LOAD_RECENT = (f"SELECT seq, role, content FROM {MESSAGES_TABLE} WHERE conversation_id = ? "
+                   f"ORDER BY seq DESC LIMIT ?")
+    LOAD_RECENT_BEFORE = (f"SELECT seq, role, content FROM {MESSAGES_TABLE} WHERE conversation_id = ? AND seq < ? "
+                          f"ORDER BY seq DESC LIMIT ?")
+    LOAD_RANGE = (f"SELECT seq, role, content FROM {MESSAGES_TABLE} WHERE conversation_id = ? AND seq > ? AND seq < ? "
+                  f"ORDER BY seq LIMIT ?")
+    LAST_SEQ = f"SELECT COALESCE(MAX(seq), 0) FROM {MESSAGES_TABLE} WHERE conversation_id = ?"
+    INSERT_MESSAGE = f"INSERT INTO {MESSAGES_TABLE} (conversation_id, seq, role, content) VALUES (?, ?, ?, ?)"
+    INSERT_TURN = f"INSERT INTO {TURNS_TABLE} (conversation_id, user_seq, language, metadata) VALUES (?, ?, ?, ?)"
+    LOAD_SUMMARY = f"SELECT summary, through_seq FROM {SUMMARIES_TABLE} WHERE conversation_id = ?"
+    SAVE_SUMMARY = (f"INSERT INTO {SUMMARIES_TABLE} (conversation_id, summary, through_seq) VALUES (?, ?, ?) "
+                    f"ON CONFLICT (conversation_id) DO UPDATE SET summary = excluded.summary, "
+                    f"through_seq = excluded.through_seq, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')")
+    LOAD_LANGUAGE = "SELECT language FROM user_settings WHERE id = ?"
+    SAVE_LANGUAGE = ("INSERT INTO user_settings (id, language) VALUES (?, ?) "
+                     "ON CONFLICT (id) DO UPDATE SET language = excluded.language")
+
+    def __init__(self, path: str = SQLITE_PATH):
+        if path == ":memory:":
+            raise ValueError("SQLiteStorage needs a database file shared by its per-thread connections; "
+                             "use a temporary file (or benchmarks.fakes.MemoryStorage) instead.")
+        self.path = os.path.expanduser(path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+            db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                                 timeout=SQLITE_BUSY_TIMEOUT_MS / 1000, cached_statements=128)
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")  # Durable at checkpoints; a crash loses at most the last commits
+            self._local.db = db
+            with self._lock:
+                self._connections.append(db)
+        return db
+
+    def setup(self) -> None:
+        db = self._connection()
+        for statement in self.SCHEMA:
+            db.execute(statement)
+        db.execute("INSERT OR IGNORE INTO user_settings (id, language) VALUES (?, ?)", (DEFAULT_USER_ID, DEFAULT_LANGUAGE))
+        logging.info(f"SQLite storage ready at {self.path}")
+
+    def load_messages(self, record_id: int, limit: Optional[int], before_seq: Optional[int]) -> List[Row]:
+        limit = -1 if limit is None else limit  # A negative LIMIT means no limit in SQLite
+        if before_seq is None:
+            rows = self._connection().execute(self.LOAD_RECENT, (record_id, limit)).fetchall()
+        else:
+            rows = self._connection().execute(self.LOAD_RECENT_BEFORE, (record_id, before_seq, limit)).fetchall()
+        rows.reverse()
+        return rows
+
+    def load_message_range(self, record_id: int, after_seq: int, before_seq: int, limit: int) -> List[Row]:
+        return self._connection().execute(self.LOAD_RANGE, (record_id, after_seq, before_seq, limit)).fetchall()
+
+    def append_message(self, record_id: int, role: str, content: str) -> None:
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            last_seq = db.execute(self.LAST_SEQ, (record_id,)).fetchone()[0]
+            db.execute(self.INSERT_MESSAGE, (record_id, last_seq + 1, role, content))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def save_turn(self, turn: ChatTurn) -> None:
+        db = self._connection()
+        # BEGIN IMMEDIATE takes the write lock up front, so no other writer can take the same seq
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            last_seq = db.execute(self.LAST_SEQ, (turn.record_id,)).fetchone()[0]
+            db.executemany(self.INSERT_MESSAGE, [
+                (turn.record_id, last_seq + 1, "user", turn.user_content),
+                (turn.record_id, last_seq + 2, "assistant", turn.assistant_content),
+            ])
+            db.execute(self.INSERT_TURN, (turn.record_id, last_seq + 1, turn.language,
+                                          json.dumps(turn.metadata) if turn.metadata else None))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def load_summary(self, record_id: int) -> Optional[Tuple[str, int]]:
+        return self._connection().execute(self.LOAD_SUMMARY, (record_id,)).fetchone()
+
+    def save_summary(self, record_id: int, summary: str, through_seq: int) -> None:
+        self._connection().execute(self.SAVE_SUMMARY, (record_id, summary, through_seq))
+
+    def load_language(self, user_id: int = DEFAULT_USER_ID) -> Optional[str]:
+        row = self._connection().execute(self.LOAD_LANGUAGE, (user_id,)).fetchone()
+        return row[0] if row else None
+
+    def save_language(self, language: str, user_id: int = DEFAULT_USER_ID) -> None:
+        self._connection().execute(self.SAVE_LANGUAGE, (user_id, language))
+
+    def close(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for db in connections:
+            db.close()
+        self._local = threading.local()
+
+STORAGE_BACKENDS = {
+    "mysql": MySQLStorage,
+    "sqlite": SQLiteStorage,
+}
+
+def open_storage(backend: str = STORAGE_BACKEND) -> Optional[Storage]:
+    """
+    Opens the configured storage backend and prepares its schema.
+
+    Args:
+        backend (str): "mysql" or "sqlite".
+
+    Returns:
+        Storage: The ready storage, or None if it could not be opened.
+    """
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    try:
+        storage = STORAGE_BACKENDS[backend]()
+        storage.setup()
+        return storage
+    except Exception as e:
+        logging.error("Error opening %s storage: %s", backend, e)
+        return None
@@ -0,0 +1,189 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+from config import config
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Every span is appended to this JSONL file by a background thread; set TRACE_FILE = None to disable the export.
+TRACE_FILE = getattr(config, "TRACE_FILE", os.path.join(os.path.expanduser("~"), ".calmora", "traces.jsonl"))
+TRACE_FILE_MAX_BYTES = 50 * 1024 * 1024  # The file is rotated to .1 beyond this size
+HISTOGRAM_SAMPLES = 2048  # Most recent durations kept per stage for the percentiles
+EXPORT_QUEUE_SIZE = 10000  # Spans waiting to be written; further spans are counted as dropped
+EXPORT_INTERVAL = 1.0
+
+current_turn: contextvars.ContextVar = contextvars.ContextVar("current_turn", default=None)
+
+class Histogram:
+    """
+    Duration samples of one stage.
+
+    Recording is an append to a bounded deque; percentiles are computed when a
+    summary is requested, over the most recent max_samples durations.
+    """
+
+    def __init__(self, max_samples: int = HISTOGRAM_SAMPLES):
+        self.samples = deque(maxlen=max_samples)
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def summary(self) -> dict:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {"count": 0}
+
+        def percentile(q: float) -> float:
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 1),
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(ordered[-1] * 1000, 1),
+        }
+
+class Tracer:
+    """
+    Lightweight span recorder: per-stage histograms plus an optional JSONL export.
+
+    A span is a timed block of one stage. Its duration goes into the stage's
+    histogram, and if export is enabled it is queued, together with the current
+    turn ID and any attributes, for a background thread that appends it to the
+    trace file. The only work on the traced thread is two clock reads, a deque
+    append and a non-blocking queue put.
+
+    Args:
+        path (str, optional): JSONL file to export spans to; None keeps them in memory only.
+    """
+
+    def __init__(self, path: Optional[str] = TRACE_FILE):
+        self.path = os.path.expanduser(path) if path else None
+        self.histograms: Dict[str, Histogram] = {}
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._export = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+        self._thread = None
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[dict]:
+        """
+        Times the enclosed block as one span of stage `name`.
+
+        Yields:
+            dict: The span's attributes; the block may add to them.
+        """
+        started_at = time.perf_counter()
+        error = None
+        try:
+            yield attributes
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            if error is not None:
+                attributes["error"] = error
+            self.record(name, time.perf_counter() - started_at, **attributes)
+
+    def traced(self, name: str):
+        """ Decorator that runs every call of the function in a span. """
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, name: str, seconds: float, **attributes) -> None:
+        """ Records a duration measured elsewhere as a span of stage `name`. """
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.record(seconds)
+        if self.path is None:
+            return
+        entry = {"ts": round(time.time(), 3), "turn": current_turn.get(), "span": name,
+                 "ms": round(seconds * 1000, 2), **attributes}
+        try:
+            self._export.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self._thread is None:
+            self._start()
+
+    def summary(self) -> Dict[str, dict]:
+        """ Returns count, mean and p50/p95/p99 latency of every stage seen so far. """
+        with self._lock:
+            return {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._export_loop, name="trace-export", daemon=True)
+                self._thread.start()
+
+    def _export_loop(self) -> None:
+        while True:
+            entries = [self._export.get()]
+            time.sleep(EXPORT_INTERVAL)  # Let spans accumulate so each write is one batch
+            while True:
+                try:
+                    entries.append(self._export.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(entries)
+            except OSError as e:
+                logging.error(f"Failed to export {len(entries)} trace spans: {e}")
+
+    def _write(self, entries) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if os.path.exists(self.path) and os.path.getsize(self.path) > TRACE_FILE_MAX_BYTES:
+            os.replace(self.path, f"{self.path}.1")
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries))
+
+def new_turn_id() -> str:
+    """ Returns a short random ID for one user turn. """
+    return uuid.uuid4().hex[:12]
+
+@contextmanager
+def turn(turn_id: Optional[str] = None) -> Iterator[str]:
+    """
+    Tags every span recorded in the enclosed block (and in contexts copied from it) with a turn ID.
+
+    Yields:
+        str: The turn ID.
+    """
+    turn_id = turn_id or new_turn_id()
+    token = current_turn.set(turn_id)
+    try:
+        yield turn_id
+    finally:
+        current_turn.reset(token)
+
+tracer = Tracer()
+span = tracer.span
+traced = tracer.traced
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+TTS_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".calmora", "tts_cache")
+MAX_MEMORY_BYTES = 8 * 1024 * 1024
+MAX_DISK_BYTES = 64 * 1024 * 1024
+
+def make_cache_key(voice_id: str, payload: dict) -> str:
+    """
+    Builds a content address for a TTS request.
+
+    Args:
+        voice_id (str): ElevenLabs voice the audio is rendered with.
+        payload (dict): Request payload from create_payload (text, model_id, voice_settings).
+
+    Returns:
+        str: Hex SHA-256 digest identifying the rendered audio.
+    """
+    material = json.dumps({"voice_id": voice_id, **payload}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+class AudioCache:
+    """
+    Two-tier cache of rendered TTS audio.
+
+    Entries live in an in-memory LRU capped at max_memory_bytes, backed by a
+    directory of files capped at max_disk_bytes. Disk entries are evicted
+    least-recently-used first, using the file modification time as the clock.
+    """
+
+    def __init__(self, cache_dir: str = TTS_CACHE_DIR, max_memory_bytes: int = MAX_MEMORY_BYTES,
+                 max_disk_bytes: int = MAX_DISK_BYTES):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = None
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Looks up audio by key, promoting disk hits into memory.
+
+        Args:
+            key (str): Cache key from make_cache_key.
+
+        Returns:
+            bytes: The cached audio, or None on a miss.
+        """
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return data
+
+        data = self._read_disk(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, data)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """
+        Stores audio in both tiers.
+
+        Args:
+            key (str): Cache key from make_cache_key.
+            data (bytes): Encoded audio to cache.
+        """
+        with self._lock:
+            self._remember(key, data)
+        self._write_disk(key, data)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            if key in self._memory:
+                return True
+        return os.path.exists(self._disk_path(key))
+
+    def stats(self) -> dict:
+        """ Returns hit/miss counters and tier sizes. """
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_memory_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.mp3")
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # Mark as recently used for eviction
+            return data
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logging.error(f"Failed to read cached audio {path}: {e}")
+            return None
+
+    def _write_disk(self, key: str, data: bytes) -> None:
+        path = self._disk_path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            existed = os.path.exists(path)
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+            with self._lock:
+                if self._disk_bytes is not None and not existed:
+                    self._disk_bytes += len(data)
+            self._trim_disk()
+        except OSError as e:
+            logging.error(f"Failed to write cached audio {path}: {e}")
+
+    def _trim_disk(self) -> None:
+        with self._lock:
+            if self._disk_bytes is not None and self._disk_bytes <= self.max_disk_bytes:
+                return
+
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith(".mp3"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+
+            for _, size, path in sorted(entries):
+                if total <= self.max_disk_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError as e:
+                    logging.error(f"Failed to evict cached audio {path}: {e}")
+            self._disk_bytes = total
+
+tts_cache = AudioCache()
@@ -0,0 +1,262 @@
+import glob
+import logging
+import os
+import queue
+import time
+import wave
+from typing import Dict, List, NamedTuple, Optional
+import numpy as np
+import speech_recognition as sr
+from main_utility.capture import UtteranceSegmenter, SAMPLE_WIDTH
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+KEYWORDS_DIR = os.path.join(os.path.expanduser("~"), ".calmora", "keywords")
+WAKE_PHRASE = "wake up"
+SLEEP_PHRASE = "sleep"
+
+WINDOW_SECONDS = 0.025
+HOP_SECONDS = 0.010
+FFT_SIZE = 512
+MEL_FILTERS = 26
+MFCC_COEFFICIENTS = 13
+PRE_EMPHASIS = 0.97
+DETECTION_THRESHOLD = 0.35  # Maximum normalised DTW distance that counts as a match
+SEGMENT_END_FRAMES = 10  # Keywords are short, so segments close after ~300 ms of silence
+LENGTH_TOLERANCE = 2.0  # Skip segments shorter or longer than this factor of every template
+DETECTION_QUEUE_SIZE = 16
+
+_filterbank_cache: Dict[tuple, np.ndarray] = {}
+
+def mel_filterbank(sample_rate: int, fft_size: int = FFT_SIZE, filters: int = MEL_FILTERS) -> np.ndarray:
+    """
+    Builds (and caches) a triangular mel filterbank.
+
+    Returns:
+        np.ndarray: Matrix of shape (filters, fft_size // 2 + 1).
+    """
+    key = (sample_rate, fft_size, filters)
+    if key in _filterbank_cache:
+        return _filterbank_cache[key]
+
+    to_mel = lambda hz: 2595 * np.log10(1 + hz / 700)
+    to_hz = lambda mel: 700 * (10 ** (mel / 2595) - 1)
+    mel_points = np.linspace(to_mel(0), to_mel(sample_rate / 2), filters + 2)
+    bins = np.floor((fft_size + 1) * to_hz(mel_points) / sample_rate).astype(int)
+
+    bank = np.zeros((filters, fft_size // 2 + 1))
+    for i in range(1, filters + 1):
+        left, center, right = bins[i - 1], bins[i], bins[i + 1]
+        if center > left:
+            bank[i - 1, left:center] = (np.arange(left, center) - left) / (center - left)
+        if right > center:
+            bank[i - 1, center:right] = (right - np.arange(center, right)) / (right - center)
+    _filterbank_cache[key] = bank
+    return bank
+
+def mfcc(pcm: bytes, sample_rate: int) -> np.ndarray:
+    """
+    Computes mean-normalised MFCC features of 16-bit mono PCM audio.
+
+    Args:
+        pcm (bytes): Raw little-endian 16-bit samples.
+        sample_rate (int): Sample rate of the audio.
+
+    Returns:
+        np.ndarray: Feature matrix of shape (frames, MFCC_COEFFICIENTS).
+    """
+    signal = np.frombuffer(pcm, dtype='<i2').astype(np.float32)
+    signal = np.append(signal[:1], signal[1:] - PRE_EMPHASIS * signal[:-1])
+
+    window = int(WINDOW_SECONDS * sample_rate)
+    hop = int(HOP_SECONDS * sample_rate)
+    if len(signal) < window:
+        signal = np.pad(signal, (0, window - len(signal)))
+    frame_count = 1 + (len(signal) - window) // hop
+    indices = np.arange(window)[None, :] + hop * np.arange(frame_count)[:, None]
+    frames = signal[indices] * np.hamming(window)
+
+    power = np.abs(np.fft.rfft(frames, FFT_SIZE)) ** 2 / FFT_SIZE
+    energies = np.log(power @ mel_filterbank(sample_rate).T + 1e-10)
+
+    # DCT-II of the log mel energies, keeping the first MFCC_COEFFICIENTS
+    n = np.arange(MEL_FILTERS)
+    basis = np.cos(np.pi * np.arange(MFCC_COEFFICIENTS)[:, None] * (2 * n + 1) / (2 * MEL_FILTERS))
+    features = energies @ basis.T
+    return features - features.mean(axis=0)
+
+def dtw_distance(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Dynamic time warping distance between two feature sequences, normalised by path length.
+
+    Args:
+        a (np.ndarray): Features of shape (n, d).
+        b (np.ndarray): Features of shape (m, d).
+
+    Returns:
+        float: Average cosine distance along the best alignment path.
+    """
+    a_norm = a / (np.linalg.norm(a, axis=1, keepdims=True) + 1e-10)
+    b_norm = b / (np.linalg.norm(b, axis=1, keepdims=True) + 1e-10)
+    cost = 1 - a_norm @ b_norm.T
+
+    n, m = cost.shape
+    accumulated = np.full(m + 1, np.inf)
+    accumulated[0] = 0.0
+    for i in range(n):
+        previous = accumulated.copy()
+        accumulated[0] = np.inf
+        for j in range(1, m + 1):
+            accumulated[j] = cost[i, j - 1] + min(previous[j], previous[j - 1], accumulated[j - 1])
+    return float(accumulated[m] / (n + m))
+
+def read_wav_pcm(path: str):
+    """
+    Reads a 16-bit mono WAV file.
+
+    Returns:
+        tuple: (pcm bytes, sample rate)
+    """
+    with wave.open(path, 'rb') as wav:
+        if wav.getnchannels() != 1 or wav.getsampwidth() != SAMPLE_WIDTH:
+            raise ValueError(f"{path} must be 16-bit mono PCM.")
+        return wav.readframes(wav.getnframes()), wav.getframerate()
+
+class Detection(NamedTuple):
+    """ A keyword spotted in the capture stream. """
+    label: str
+    distance: float
+    audio: sr.AudioData
+    detected_at: float
+
+class KeywordSpotter:
+    """
+    On-device keyword spotter using MFCC features and DTW template matching.
+
+    Each keyword is enrolled from a few short recordings of the user saying it.
+    The spotter listens to capture frames, cuts speech segments with a short
+    silence hangover and compares only segments of plausible length against the
+    templates, so CPU use during silence is close to zero.
+
+    Attach to a BackgroundCapture with capture.add_frame_listener(spotter.process_frame).
+    """
+
+    def __init__(self, sample_rate: int, threshold: float = DETECTION_THRESHOLD):
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.templates: Dict[str, List[np.ndarray]] = {}
+        self.detections = queue.Queue(maxsize=DETECTION_QUEUE_SIZE)
+        self.segments_checked = 0
+        self._segmenter = UtteranceSegmenter(end_frames=SEGMENT_END_FRAMES, max_frames=100)
+
+    @property
+    def enrolled(self) -> bool:
+        return bool(self.templates)
+
+    def enroll(self, label: str, pcm: bytes) -> None:
+        """
+        Adds a recording of a keyword as a template.
+
+        Args:
+            label (str): Keyword the recording contains, e.g. "wake up".
+            pcm (bytes): 16-bit mono PCM at the spotter's sample rate.
+        """
+        self.templates.setdefault(label, []).append(mfcc(pcm, self.sample_rate))
+
+    def load_templates(self, directory: str = KEYWORDS_DIR) -> int:
+        """
+        Enrolls every WAV file found under directory/<label>/, e.g. keywords/wake up/1.wav.
+
+        Returns:
+            int: Number of templates loaded.
+        """
+        loaded = 0
+        for path in sorted(glob.glob(os.path.join(directory, "*", "*.wav"))):
+            label = os.path.basename(os.path.dirname(path))
+            pcm, sample_rate = read_wav_pcm(path)
+            if sample_rate != self.sample_rate:
+                logging.warning(f"Skipping keyword template {path}: sample rate {sample_rate} != {self.sample_rate}.")
+                continue
+            self.enroll(label, pcm)
+            loaded += 1
+        logging.info(f"Loaded {loaded} keyword templates from {directory}.")
+        return loaded
+
+    def process_frame(self, frame: bytes, is_speech: bool) -> None:
+        """ Frame listener for BackgroundCapture. """
+        pcm = self._segmenter.feed(frame, is_speech)
+        if pcm:
+            detection = self.match(pcm)
+            if detection:
+                try:
+                    self.detections.put_nowait(detection)
+                except queue.Full:
+                    logging.warning("Keyword detection queue full; dropping detection.")
+
+    def match(self, pcm: bytes) -> Optional[Detection]:
+        """
+        Compares a speech segment against every template.
+
+        Args:
+            pcm (bytes): 16-bit mono PCM of one speech segment.
+
+        Returns:
+            Detection: The best matching keyword, or None if nothing is close enough.
+        """
+        if not self.templates:
+            return None
+        features = None
+        best_label, best_distance = None, np.inf
+
+        segment_frames = (len(pcm) // SAMPLE_WIDTH) / (HOP_SECONDS * self.sample_rate)
+
+        for label, templates in self.templates.items():
+            for template in templates:
+                if not len(template) / LENGTH_TOLERANCE <= segment_frames <= len(template) * LENGTH_TOLERANCE:
+                    continue
+                if features is None:
+                    features = mfcc(pcm, self.sample_rate)
+                    self.segments_checked += 1
+                distance = dtw_distance(features, template)
+                if distance < best_distance:
+                    best_label, best_distance = label, distance
+
+        if best_label is None or best_distance > self.threshold:
+            return None
+        logging.info(f"Keyword '{best_label}' spotted (distance {best_distance:.3f}).")
+        return Detection(best_label, best_distance, sr.AudioData(pcm, self.sample_rate, SAMPLE_WIDTH), time.monotonic())
+
+    def clear(self) -> None:
+        """ Discards every pending detection. """
+        while True:
+            try:
+                self.detections.get_nowait()
+            except queue.Empty:
+                return
+
+    def wait_for(self, label: str, timeout: Optional[float] = None) -> Optional[Detection]:
+        """
+        Waits for a detection of the given keyword, discarding other keywords.
+
+        Args:
+            label (str): Keyword to wait for.
+            timeout (float, optional): Maximum wait time in seconds.
+
+        Returns:
+            Detection: The detection, or None on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            try:
+                detection = self.detections.get(timeout=remaining)
+            except queue.Empty:
+                return None
+            if detection.label == label:
+                return detection
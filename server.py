@@ -0,0 +1,37 @@
+"""
+Runs Calmora headless, as a conversation server for many concurrent clients.
+
+Usage:
+    python server.py [--host 127.0.0.1] [--port 8765] [--write-behind] [--no-memory]
+
+See main_utility/conversation_server.py for the protocol.
+"""
+import argparse
+import asyncio
+import logging
+from contextlib import closing
+from main_utility.conversation_server import ConversationServer, SERVER_HOST, SERVER_PORT
+from main_utility.storage import open_storage
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--write-behind", action="store_true", help="save turns on a background writer thread")
+    parser.add_argument("--no-memory", action="store_true", help="disable long-term memory search")
+    args = parser.parse_args()
+
+    storage = open_storage()
+    if storage is None:
+        logging.error("Failed to open the database.")
+        return
+    with closing(storage):
+        server = ConversationServer(storage, host=args.host, port=args.port, write_behind=args.write_behind,
+                                    memory=not args.no_memory)
+        try:
+            asyncio.run(server.serve())
+        except KeyboardInterrupt:
+            logging.info("Conversation server interrupted.")
+
+if __name__ == "__main__":
+    main()
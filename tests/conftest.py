@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# Everything the app keeps under ~/.calmora goes to a throwaway home
+os.environ["HOME"] = tempfile.mkdtemp(prefix="calmora-tests-")
+
+from config import use_example_config
+
+use_example_config()  # Tests run without config/config.py and never use its credentials
@@ -0,0 +1,58 @@
+import pytest
+from mysql.connector import errors
+from main_utility import database
+
+class FakeConnection:
+    def __init__(self, **connect_args):
+        self.open = True
+        self.resets = 0
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        pass
+
+    def reset_session(self):
+        self.resets += 1
+
+    def close(self):
+        self.open = False
+
+@pytest.fixture
+def pool(monkeypatch):
+    connections = []
+
+    def connect(**connect_args):
+        connections.append(FakeConnection(**connect_args))
+        return connections[-1]
+
+    monkeypatch.setattr(database.mysql.connector, "connect", connect)
+    pool = database.ConnectionPool(size=2)
+    pool.opened = connections
+    return pool
+
+def test_returned_connections_are_reset_and_reused(pool):
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first.resets == 1
+    assert {first, second} <= set(pool.opened) and len(pool.opened) == 2
+    assert pool.stats()["checkouts"] == 2
+
+def test_close_disconnects_idle_and_returned_connections(pool):
+    with pool.connection() as in_use:
+        pool.close()
+        assert [db.open for db in pool.opened if db is not in_use] == [False]
+        assert in_use.open
+    assert not in_use.open
+
+    with pytest.raises(errors.PoolError):
+        with pool.connection():
+            pass
+
+def test_exhausted_pool_times_out(pool, monkeypatch):
+    monkeypatch.setattr(database, "CHECKOUT_TIMEOUT", 0.05)
+    with pool.connection(), pool.connection():
+        with pytest.raises(errors.PoolError):
+            with pool.connection():
+                pass
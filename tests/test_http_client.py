@@ -0,0 +1,51 @@
+import socket
+import threading
+import pytest
+import requests
+from main_utility.http_client import HttpClient
+
+@pytest.fixture
+def silent_server():
+    """ Accepts connections and never answers, so every request times out reading. """
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+    accepted = []
+
+    def accept():
+        try:
+            while True:
+                accepted.append(server.accept()[0])
+        except OSError:
+            pass
+
+    threading.Thread(target=accept, daemon=True).start()
+    yield f"http://127.0.0.1:{server.getsockname()[1]}/"
+    server.close()
+    for connection in accepted:
+        connection.close()
+
+def closed_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+def test_post_is_not_resent_after_a_read_timeout(silent_server):
+    client = HttpClient(timeout=(1, 0.1), backoff=0.001)
+    with pytest.raises(requests.ReadTimeout):
+        client.post(silent_server, json={})
+    assert client.stats()["requests"] == 1
+
+def test_post_is_retried_when_the_connection_is_refused():
+    client = HttpClient(timeout=(1, 0.1), backoff=0.001)
+    with pytest.raises(requests.ConnectionError):
+        client.post(f"http://127.0.0.1:{closed_port()}/", json={})
+    assert client.stats()["requests"] == client.retries + 1
+
+def test_idempotent_requests_are_retried_after_a_read_timeout(silent_server):
+    client = HttpClient(timeout=(1, 0.1), backoff=0.001)
+    with pytest.raises(requests.ReadTimeout):
+        client.get(silent_server)
+    with pytest.raises(requests.ReadTimeout):
+        client.post(silent_server, json={}, idempotent=True)
+    assert client.stats()["requests"] == 2 * (client.retries + 1)
@@ -0,0 +1,52 @@
+import time
+import pytest
+import speech_recognition as sr
+from main_utility.recognizers import RacingRecognizer, RecognizerBackend
+
+AUDIO = sr.AudioData(b"\0" * 320, 16000, 2)
+
+class ScriptedBackend(RecognizerBackend):
+    def __init__(self, name: str, delay: float, confidence=None, error=None):
+        super().__init__()
+        self.name = name
+        self.delay = delay
+        self.confidence = confidence
+        self.error = error
+
+    def _recognize(self, audio: sr.AudioData):
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return f"heard by {self.name}", self.confidence
+
+def test_backend_must_implement_recognize():
+    class Incomplete(RecognizerBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+def test_first_confident_result_wins():
+    race = RacingRecognizer([ScriptedBackend("slow", 0.3, 0.95), ScriptedBackend("fast", 0.01, 0.9)])
+    assert race.race(AUDIO).backend == "fast"
+
+def test_result_without_confidence_does_not_win_early():
+    race = RacingRecognizer([ScriptedBackend("google", 0.01, None), ScriptedBackend("vosk", 0.1, 0.9)])
+    assert race.race(AUDIO).backend == "vosk"
+
+def test_unconfident_results_rank_below_reported_confidence():
+    race = RacingRecognizer([ScriptedBackend("google", 0.01, None), ScriptedBackend("vosk", 0.1, 0.3)])
+    assert race.race(AUDIO).backend == "vosk"
+
+def test_zero_confidence_still_ranks_above_no_confidence():
+    race = RacingRecognizer([ScriptedBackend("google", 0.01, None), ScriptedBackend("vosk", 0.1, 0.0)])
+    assert race.race(AUDIO).backend == "vosk"
+
+    race = RacingRecognizer([ScriptedBackend("google", 0.01, None), ScriptedBackend("vosk", 0.1, None)])
+    assert race.race(AUDIO).backend == "google"
+
+def test_race_raises_when_no_backend_understood_speech():
+    race = RacingRecognizer([ScriptedBackend("a", 0.01, error=sr.UnknownValueError()),
+                             ScriptedBackend("b", 0.01, error=sr.RequestError("offline"))])
+    with pytest.raises(sr.UnknownValueError):
+        race.race(AUDIO)
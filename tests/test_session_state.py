@@ -0,0 +1,42 @@
+import pytest
+from main_utility.chatHistory import ChatTurn, ChatWriter
+from main_utility.session_state import SessionState
+from main_utility.storage import SQLiteStorage
+
+class FailingStorage(SQLiteStorage):
+    """ SQLite storage whose turn writes always fail. """
+
+    def save_turn(self, turn):
+        raise RuntimeError("disk full")
+
+class RecordingMemory:
+    def __init__(self):
+        self.added = []
+        self.refreshes = 0
+
+    def add(self, messages):
+        self.added.extend(messages)
+
+    def refresh(self):
+        self.refreshes += 1
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = FailingStorage(str(tmp_path / "calmora.db"))
+    storage.setup()
+    yield storage
+    storage.close()
+
+def test_failed_write_behind_save_reloads_history_and_memory(storage):
+    storage.append_message(1, "user", "earlier")
+    writer = ChatWriter(storage)
+    memory = RecordingMemory()
+    state = SessionState(storage, writer=writer, record_id=1, memory=memory)
+    assert [message["content"] for message in state.history()] == ["earlier"]
+
+    state.save_turn(ChatTurn("how are you", "i'm here for you", record_id=1))
+    writer.close()
+
+    assert writer.failed == 1
+    assert memory.refreshes == 1
+    assert [message["content"] for message in state.history()] == ["earlier"]
@@ -0,0 +1,100 @@
+import sqlite3
+import threading
+import pytest
+from main_utility.chatHistory import ChatTurn
+from main_utility.storage import Storage, SQLiteStorage, DEFAULT_LANGUAGE, DEFAULT_USER_ID
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "calmora.db"))
+    storage.setup()
+    yield storage
+    storage.close()
+
+def test_setup_is_idempotent_and_sets_default_language(storage):
+    storage.setup()
+    assert storage.load_language() == DEFAULT_LANGUAGE
+
+def test_append_message_numbers_messages_per_conversation(storage):
+    storage.append_message(1, "user", "hello")
+    storage.append_message(1, "assistant", "hi there")
+    storage.append_message(2, "user", "another conversation")
+
+    assert storage.load_messages(1, None, None) == [(1, "user", "hello"), (2, "assistant", "hi there")]
+    assert storage.load_messages(2, None, None) == [(1, "user", "another conversation")]
+
+def test_save_turn_writes_both_messages_and_metadata(storage):
+    storage.append_message(1, "user", "earlier")
+    storage.save_turn(ChatTurn("how are you", "i'm here for you", record_id=1, language="en",
+                               metadata={"total_ms": 1200}))
+
+    assert storage.load_messages(1, None, None)[1:] == [(2, "user", "how are you"), (3, "assistant", "i'm here for you")]
+    with sqlite3.connect(storage.path) as db:
+        assert db.execute("SELECT user_seq, language, metadata FROM chat_turns").fetchall() == \
+            [(2, "en", '{"total_ms": 1200}')]
+
+def test_load_messages_returns_the_most_recent_oldest_first(storage):
+    for number in range(1, 11):
+        storage.append_message(1, "user", f"message {number}")
+
+    assert [row[0] for row in storage.load_messages(1, 3, None)] == [8, 9, 10]
+    assert [row[0] for row in storage.load_messages(1, 3, 5)] == [2, 3, 4]
+    assert [row[0] for row in storage.load_messages(1, None, 3)] == [1, 2]
+
+def test_load_message_range_is_exclusive_and_limited(storage):
+    for number in range(1, 11):
+        storage.append_message(1, "user", f"message {number}")
+
+    assert [row[0] for row in storage.load_message_range(1, 2, 7, 100)] == [3, 4, 5, 6]
+    assert [row[0] for row in storage.load_message_range(1, 2, 7, 2)] == [3, 4]
+    assert storage.load_message_range(2, 0, 100, 10) == []
+
+def test_summary_round_trip_and_replace(storage):
+    assert storage.load_summary(1) is None
+    storage.save_summary(1, "Talked about work.", 4)
+    storage.save_summary(1, "Talked about work and sleep.", 8)
+
+    assert tuple(storage.load_summary(1)) == ("Talked about work and sleep.", 8)
+    assert storage.load_summary(2) is None
+
+def test_language_is_kept_per_user(storage):
+    storage.save_language("hi")
+    storage.save_language("en", user_id=42)
+
+    assert storage.load_language() == "hi"
+    assert storage.load_language(user_id=42) == "en"
+    assert storage.load_language(user_id=7) is None
+
+def test_concurrent_turns_get_distinct_sequence_numbers(storage):
+    def save(worker: int) -> None:
+        for number in range(10):
+            storage.save_turn(ChatTurn(f"question {worker}.{number}", "answer", record_id=1))
+
+    threads = [threading.Thread(target=save, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [row[0] for row in storage.load_messages(1, None, None)] == list(range(1, 81))
+
+def test_writes_are_visible_to_other_threads(storage):
+    storage.save_language("hi", user_id=DEFAULT_USER_ID)
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(storage.load_language()))
+    thread.start()
+    thread.join()
+
+    assert seen == ["hi"]
+
+def test_in_memory_database_is_rejected():
+    with pytest.raises(ValueError):
+        SQLiteStorage(":memory:")
+
+def test_incomplete_backend_cannot_be_instantiated():
+    class Incomplete(Storage):
+        def setup(self) -> None:
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
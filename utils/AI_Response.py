@@ -1,11 +1,23 @@
 import cohere
+import time
+from config import config
 from config.config import COHERE_API
-co = cohere.ClientV2(api_key=COHERE_API)
-from main_utility.chatHistory import add_chat_entry
+co = cohere.ClientV2(api_key=COHERE_API, base_url=getattr(config, "COHERE_BASE_URL", None))
+from main_utility.chatHistory import ChatTurn, save_chat_turn
 from main_utility.speaking import speak
+from main_utility.speech_pipeline import SpeechPipeline
+from main_utility.tracing import span, traced, tracer, turn
 import json
 import requests
 
+COHERE_MODEL = "command-r-plus-08-2024"
+EMBED_MODEL = "embed-multilingual-light-v3.0"  # Handles English and Hindi; 384 dimensions
+
+summaryInstruction = """
+    You maintain a short memory of an ongoing supportive conversation. Merge the new messages into the
+    existing summary. Keep the user's feelings, important life details, people, events and anything they
+    asked to be remembered. Write at most 150 words in the third person, in the language of the conversation."""
+
 englishSystemMessage = f"""
     Objective:
     You are a friendly and empathetic chatbot designed to support users who may feel lonely, sad, or overwhelmed. Your role is to create a safe space where they can express their feelings without judgment. Provide emotional support and encouragement without giving long or overly detailed answers. Keep your responses short, natural, and human-like, focusing on emotional connection, not logic or facts.
@@ -136,48 +148,184 @@ hindiSystemMessage = f"""
     उपयोगकर्ता: “मुझे लगता है कि मैं पर्याप्त अच्छा नहीं हूँ।”
     AI: “कभी-कभी ऐसा महसूस करना सामान्य है। याद रखें, आप जैसे हैं वैसे ही पर्याप्त हैं।”"""
 
-def getting_dynamic_response(user_input, chat_history, user_language, db, cursor):
+@turn()  # Every call is a new turn; its spans share one turn ID
+def getting_dynamic_response(user_input, chat_history, user_language, storage,
+                             pipelined=True, speech_ended_at=None, client=None, writer=None, summary=None, state=None, memories=None):
     """
     Generate a dynamic response from the chatbot, given user input, language, and chat history.
     Uses cohere's chat API and speaks the response aloud.
 
+    In pipelined mode the reply is streamed, and every sentence is spoken as soon as it
+    is complete while the rest is still being generated.
+
     Parameters:
     - user_input (str): Text input from the user.
     - chat_history (list): Previous conversation history with roles and messages.
     - user_language (str): Language preference for the response ('en' for English or 'hi' for Hindi).
-    - db: Database connection object for storing chat history.
-    - cursor: Database cursor for executing SQL operations.
+    - storage (Storage): Storage backend for chat history.
+    - pipelined (bool): Stream the reply and speak it sentence by sentence.
+    - speech_ended_at (float): time.monotonic() when the user stopped speaking; time to first audio is measured from it.
+    - client: Cohere client to use, defaults to the module client.
+    - writer (ChatWriter): Write-behind writer; if given, the turn is saved on its thread instead of inline.
+    - summary (str): Rolling summary of the conversation older than chat_history.
+    - state (SessionState): Session cache; if given, the turn is saved through it (and its writer, if any).
+    - memories (list): Relevant older messages recalled from long-term memory.
+
+    Returns:
+    - str: The response text, or None if no response was generated.
     """
-    
-    # Select appropriate system message based on the user's language preference
-    system_message = englishSystemMessage if user_language == 'en' else hindiSystemMessage
+    client = client or co
+    speech_ended_at = speech_ended_at or time.monotonic()
+    metadata = {}
+    messages = build_messages(user_input, chat_history, user_language, summary, memories)
 
     try:
-        # Request a response from the cohere chat model
-        res = co.chat(
-            model="command-r-plus-08-2024",
-            messages=[
-                {"role": "system", "content": system_message},
-                *chat_history,
-                {"role": "user", "content": user_input},
-            ],
-        )
-        
-        # Retrieve the generated response text
-        response_text = res.message.content[0].text if res and res.message and res.message.content else None
-        
+        if pipelined:
+            pipeline = SpeechPipeline(user_language, started_at=speech_ended_at)
+            response_text = stream_and_speak(client, messages, user_language, pipeline=pipeline)
+            metadata = {
+                "first_text_ms": round(pipeline.time_to_first_text * 1000) if pipeline.time_to_first_text else None,
+                "first_audio_ms": round(pipeline.time_to_first_audio * 1000) if pipeline.time_to_first_audio else None,
+                "sentences": pipeline.sentence_count,
+            }
+        else:
+            # Request a response from the cohere chat model
+            with span("llm"):
+                res = client.chat(model=COHERE_MODEL, messages=messages)
+
+            # Retrieve the generated response text
+            response_text = res.message.content[0].text if res and res.message and res.message.content else None
+            if response_text:
+                speak(response_text, user_language, is_stream=True)
+
         if response_text:
-            # Log and speak the response
+            # Log the response
             print("Mikasha:", response_text)
-            speak(response_text, user_language, is_stream=True)
-            
-            # Save both user input and chatbot response to the database
-            add_chat_entry("user", user_input, db, cursor, table="chat_history", record_id=1)
-            add_chat_entry("assistant", response_text, db, cursor, table="chat_history", record_id=1)
+
+            # Save both user input and chatbot response to the database in one transaction
+            metadata["total_ms"] = round((time.monotonic() - speech_ended_at) * 1000)
+            turn = ChatTurn(user_input, response_text, record_id=1, language=user_language, metadata=metadata)
+            if state is not None:
+                state.save_turn(turn)
+            elif writer is not None:
+                writer.submit(turn)
+            else:
+                save_chat_turn(turn, storage)
         else:
             # Log an error if no valid response is returned
             print("Error: No response generated from the chat model.")
+        return response_text
 
     except Exception as e:
         # Catch and log any exceptions for debugging purposes
-        print(f"Error in generating response: {e}")
\ No newline at end of file
+        print(f"Error in generating response: {e}")
+        return None
+
+def build_messages(user_input, chat_history, user_language, summary=None, memories=None):
+    """
+    Builds the chat request: system message, recent history and the user's input.
+
+    Parameters:
+    - user_input (str): Text input from the user.
+    - chat_history (list): Recent messages sent verbatim.
+    - user_language (str): 'en' or 'hi'; selects the system message.
+    - summary (str): Rolling summary of the conversation older than chat_history.
+    - memories (list): Relevant older messages recalled from long-term memory.
+
+    Returns:
+    - list: Messages for the chat API.
+    """
+    # Select appropriate system message based on the user's language preference
+    system_message = englishSystemMessage if user_language == 'en' else hindiSystemMessage
+    if summary:
+        system_message += f"\n\n    Summary of your earlier conversations with this user:\n    {summary}"
+    if memories:
+        recalled = "\n".join(f"    - {memory['role']}: {memory['content']}" for memory in memories)
+        system_message += f"\n\n    Earlier messages that may be relevant to what the user just said:\n{recalled}"
+    return [
+        {"role": "system", "content": system_message},
+        *chat_history,
+        {"role": "user", "content": user_input},
+    ]
+
+@traced("llm.summary")
+def summarize_conversation(previous_summary, messages, client=None):
+    """
+    Folds older messages into the rolling conversation summary.
+
+    Parameters:
+    - previous_summary (str): Summary of everything before these messages, may be empty.
+    - messages (list): Messages to fold in, oldest first.
+    - client: Cohere client to use, defaults to the module client.
+
+    Returns:
+    - str: The updated summary, or None if the model returned nothing.
+    """
+    client = client or co
+    transcript = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+    res = client.chat(
+        model=COHERE_MODEL,
+        messages=[
+            {"role": "system", "content": summaryInstruction},
+            {"role": "user", "content": f"Existing summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"},
+        ],
+    )
+    return res.message.content[0].text if res and res.message and res.message.content else None
+
+@traced("embed")
+def embed_texts(texts, input_type, client=None):
+    """
+    Embeds texts with cohere's multilingual embedding model.
+
+    Parameters:
+    - texts (list): Up to 96 texts.
+    - input_type (str): "search_document" for stored messages, "search_query" for the user's input.
+    - client: Cohere client to use, defaults to the module client.
+
+    Returns:
+    - list: One embedding (list of floats) per text.
+    """
+    client = client or co
+    res = client.embed(model=EMBED_MODEL, texts=texts, input_type=input_type, embedding_types=["float"])
+    return res.embeddings.float_
+
+def stream_chat_text(client, messages):
+    """
+    Streams a chat completion and yields the text deltas as they arrive.
+
+    Parameters:
+    - client: Cohere V2 client (or a compatible stand-in).
+    - messages (list): Chat messages to send.
+    """
+    started_at = time.perf_counter()
+    first_token = True
+    with span("llm"):
+        for event in client.chat_stream(model=COHERE_MODEL, messages=messages):
+            if event.type == "content-delta":
+                if first_token:
+                    tracer.record("llm.first_token", time.perf_counter() - started_at)
+                    first_token = False
+                yield event.delta.message.content.text
+
+def stream_and_speak(client, messages, user_language, speech_ended_at=None, pipeline=None):
+    """
+    Streams the reply into a SpeechPipeline, so speaking starts with the first sentence.
+
+    Parameters:
+    - client: Cohere V2 client (or a compatible stand-in).
+    - messages (list): Chat messages to send.
+    - user_language (str): Language to speak the reply in.
+    - speech_ended_at (float): time.monotonic() when the user stopped speaking.
+    - pipeline (SpeechPipeline): Pipeline to speak through, built with the defaults if omitted.
+
+    Returns:
+    - str: The complete reply text.
+    """
+    pipeline = pipeline or SpeechPipeline(user_language, started_at=speech_ended_at or time.monotonic())
+    pipeline.start()
+    try:
+        for text in stream_chat_text(client, messages):
+            pipeline.feed(text)
+    finally:
+        pipeline.finish()
+    return pipeline.text or None